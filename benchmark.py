@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from berekening import STANDAARD_INVOER, bereken_eenheidstarieven, bereken_gegevens, bereken_scenario_kolommen, historische_data, maand_labels, specificaties
+from rapportcache import InhoudCache
+
+# Benchmarks van de rekenkern, een volledige headless run van de app en het PDF-rapport bij een
+# groeiende historie. De resultaten gaan naar een JSON-bestand, zodat versies vergeleken kunnen worden:
+#
+#   python benchmark.py -o voor.json
+#   python benchmark.py -o na.json --vergelijk voor.json
+#
+# Zonder -o komen de resultaten in benchmark.json in de tijdelijke map van het systeem.
+# Tijden zijn de snelste en de mediaan van een aantal herhalingen; het piekgeheugen (Python-allocaties
+# via tracemalloc) wordt in een aparte run gemeten, omdat tracemalloc de code zelf vertraagt.
+
+STANDAARD_AANTALLEN = (3, 36, 120, 600)
+
+PERSONEEL = (STANDAARD_INVOER["aantal_installeurs"], STANDAARD_INVOER["aantal_verkopers"], STANDAARD_INVOER["fulltime_verkopers"])
+
+MAP = os.path.dirname(os.path.abspath(__file__))
+
+# Kolommen die in de historie als negatieve kosten staan (berekening.KOSTEN_NEGATIEF)
+KOSTENKOLOMMEN = (
+    "kostprijs_laadpalen",
+    "kostprijs_zonnepanelen",
+    "personeelskosten",
+    "it_kosten",
+    "solar_kosten",
+    "contributie_kosten",
+    "afschrijving_kosten",
+    "autokosten",
+)
+
+# Maandlabels hebben een jaar in twee cijfers vanaf 2000, dus een historie vanaf jan-00 kan hoogstens
+# 100 jaar lang zijn
+MAX_MAANDEN = 1200
+
+
+# Opeenvolgende maandlabels vanaf jan-00, zodat ook een lange historie op volgorde blijft
+def synthetische_maanden(aantal):
+    if aantal > MAX_MAANDEN:
+        raise ValueError(f"Een synthetische historie heeft hoogstens {MAX_MAANDEN} maanden")
+    return maand_labels("jan-00", aantal)
+
+
+# Historie met dezelfde kolommen en tekens als historische_data (kosten negatief, zoals
+# Opslag.initialiseer de startdata opslaat), berekend uit willekeurige maar plausibele invoer
+def synthetische_historie(aantal, seed=0):
+    rng = np.random.default_rng(seed)
+    marketing_budget = rng.integers(0, 10, aantal) * 1000
+    kolommen = bereken_scenario_kolommen(
+        rng.integers(10, 60, aantal),
+        rng.integers(1, 6, aantal),
+        rng.uniform(20, 45, aantal),
+        rng.uniform(20, 45, aantal),
+        rng.integers(1, 5, aantal),
+        rng.integers(0, 4, aantal),
+        rng.integers(0, 3, aantal),
+        marketing_budget,
+    )
+    for naam in KOSTENKOLOMMEN:
+        kolommen[naam] = -np.abs(kolommen[naam])
+    kolommen["resultaat"] = kolommen["brutomarge"] + sum(kolommen[naam] for naam in KOSTENKOLOMMEN if "kostprijs" not in naam) - marketing_budget
+    data = {"maand": synthetische_maanden(aantal)}
+    for naam in historische_data:
+        if naam in ("laadpalen", "zonnepanelen"):
+            data[naam] = kolommen[naam].astype(int)
+        elif naam != "maand":
+            data[naam] = np.round(kolommen[naam], 2)
+    return pd.DataFrame(data)
+
+
+# Specificaties per maand met de opbouw van de bestaande specificaties: elke categorie gevolgd door
+# haar regels, met bedragen rond die van de echte maanden
+def synthetische_specificaties(maanden, seed=0):
+    rng = np.random.default_rng(seed)
+    voorbeelden = list(specificaties.values())
+    categorieen = {"Personeelskosten", "IT Kosten", "Contributies/ Lidmaatschappen", "Afschrijvingen"}
+    resultaat = {}
+    for index, maand in enumerate(maanden):
+        voorbeeld = voorbeelden[index % len(voorbeelden)]
+        specificatie = {}
+        categorie = None
+        for omschrijving, bedrag in voorbeeld.items():
+            if omschrijving in categorieen:
+                categorie = omschrijving
+                specificatie[categorie] = 0.0
+            else:
+                bedrag = round(bedrag * rng.uniform(0.8, 1.2), 2)
+                specificatie[omschrijving] = bedrag
+                specificatie[categorie] = round(specificatie[categorie] + bedrag, 2)
+        resultaat[maand] = specificatie
+    return resultaat
+
+
+def _meet_geheugen(functie):
+    tracemalloc.start()
+    try:
+        functie()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Voer één meting uit: tijden over een aantal herhalingen plus (optioneel) een run voor het piekgeheugen.
+# voorbereiding wordt vóór elke run aangeroepen en geeft de te meten functie terug, zodat bijvoorbeeld
+# een nieuw PDF-object of lege caches niet in de tijd meetellen.
+def meet(naam, aantal_maanden, voorbereiding, herhalingen, geheugen=True, pdf=False):
+    tijden = []
+    uitkomst = None
+    for _ in range(herhalingen):
+        functie = voorbereiding()
+        begin = time.perf_counter()
+        uitkomst = functie()
+        tijden.append(time.perf_counter() - begin)
+    meting = {
+        "meting": naam,
+        "maanden": aantal_maanden,
+        "herhalingen": herhalingen,
+        "seconden_min": min(tijden),
+        "seconden_mediaan": statistics.median(tijden),
+        "piek_geheugen_bytes": _meet_geheugen(voorbereiding()) if geheugen else None,
+    }
+    if pdf:
+        meting["pdf_bytes"] = len(uitkomst)
+    print(f"{naam:<32} {aantal_maanden:>5} maanden  {meting['seconden_min'] * 1000:>10.2f} ms"
+          + (f"  {meting['piek_geheugen_bytes'] / 1024 / 1024:>8.2f} MB" if geheugen else ""), file=sys.stderr)
+    return meting
+
+
+def _pdf():
+    from rapport import PDF, voeg_lettertype_toe
+
+    pdf = PDF()
+    voeg_lettertype_toe(pdf)
+    pdf.add_page()
+    return pdf
+
+
+def benchmark_berekening(data, herhalingen):
+    invoer = list(STANDAARD_INVOER.values())
+
+    def voorbereiding():
+        def bereken():
+            tarieven = bereken_eenheidstarieven(data)
+            for _ in range(1000):
+                bereken_gegevens(*invoer, "jul-24", tarieven=tarieven)
+        return bereken
+
+    return [meet("bereken_gegevens_1000x", len(data), voorbereiding, herhalingen)]
+
+
+def benchmark_pdf(data, specificaties_per_maand, herhalingen):
+    def tabel():
+        pdf = _pdf()
+        return lambda: pdf.add_table(data)
+
+    def specificaties_toevoegen():
+        pdf = _pdf()
+        return lambda: pdf.add_specifications(specificaties_per_maand)
+
+    def rapport_koud():
+        from rapport import genereer_rapport
+
+        caches = {"grafieken": InhoudCache(), "rapporten": InhoudCache()}
+        return lambda: genereer_rapport(data, specificaties_per_maand, *PERSONEEL, caches=caches)
+
+    # Met gevulde grafiekencache maar zonder rapportcache: alles behalve het renderen van de grafieken
+    grafieken_cache = InhoudCache(512 * 1024 * 1024)
+
+    def rapport_grafieken_warm():
+        from rapport import genereer_rapport
+
+        if not len(grafieken_cache):
+            genereer_rapport(data, specificaties_per_maand, *PERSONEEL, caches={"grafieken": grafieken_cache, "rapporten": InhoudCache()})
+        caches = {"grafieken": grafieken_cache, "rapporten": InhoudCache()}
+        return lambda: genereer_rapport(data, specificaties_per_maand, *PERSONEEL, caches=caches)
+
+    return [
+        meet("PDF.add_table", len(data), tabel, herhalingen),
+        meet("PDF.add_specifications", len(data), specificaties_toevoegen, herhalingen),
+        meet("genereer_rapport", len(data), rapport_koud, herhalingen, pdf=True),
+        meet("genereer_rapport_grafieken_warm", len(data), rapport_grafieken_warm, herhalingen, pdf=True),
+    ]
+
+
+# Volledige run van configurator.py zonder browser (Streamlit AppTest) tegen een database met de
+# synthetische historie: de eerste run van een sessie en een rerun zoals na het verschuiven van een schuifregelaar
+def benchmark_app(data, specificaties_per_maand, herhalingen):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    from opslag import Opslag
+
+    metingen = []
+    with tempfile.TemporaryDirectory() as map:
+        pad = os.path.join(map, "benchmark.db")
+        Opslag(pad).initialiseer(data, specificaties_per_maand)
+        vorige_database = os.environ.get("CONFIGURATOR_DATABASE")
+        os.environ["CONFIGURATOR_DATABASE"] = pad
+        try:
+            def eerste_run():
+                st.cache_data.clear()
+                st.cache_resource.clear()
+                app = AppTest.from_file(os.path.join(MAP, "configurator.py"), default_timeout=600)
+                return lambda: app.run()
+
+            def rerun():
+                app = AppTest.from_file(os.path.join(MAP, "configurator.py"), default_timeout=600).run()
+                return lambda: app.run()
+
+            metingen.append(meet("app_eerste_run", len(data), eerste_run, herhalingen, geheugen=False))
+            metingen.append(meet("app_rerun", len(data), rerun, herhalingen, geheugen=False))
+        finally:
+            st.cache_resource.clear()
+            if vorige_database is None:
+                os.environ.pop("CONFIGURATOR_DATABASE", None)
+            else:
+                os.environ["CONFIGURATOR_DATABASE"] = vorige_database
+    return metingen
+
+
+def _git_versie():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=MAP, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Vergelijk met een eerder resultatenbestand: verhouding van de snelste tijd en het piekgeheugen per meting
+def vergelijk(resultaten, vorige):
+    eerder = {(meting["meting"], meting["maanden"]): meting for meting in vorige["metingen"]}
+    print(f"\nVergelijking met {vorige.get('versie') or 'vorige run'} (nu / eerder):")
+    for meting in resultaten["metingen"]:
+        oud = eerder.get((meting["meting"], meting["maanden"]))
+        if oud is None:
+            continue
+        regel = f"{meting['meting']:<32} {meting['maanden']:>5} maanden  tijd x{meting['seconden_min'] / oud['seconden_min']:.2f}"
+        if meting.get("piek_geheugen_bytes") and oud.get("piek_geheugen_bytes"):
+            regel += f"  geheugen x{meting['piek_geheugen_bytes'] / oud['piek_geheugen_bytes']:.2f}"
+        print(regel)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark van berekening, app en PDF-rapport bij een groeiende historie.")
+    parser.add_argument("-o", "--uitvoer", default=os.path.join(tempfile.gettempdir(), "benchmark.json"), help="JSON-bestand voor de resultaten")
+    parser.add_argument("--maanden", type=int, nargs="+", default=list(STANDAARD_AANTALLEN), help="lengtes van de synthetische historie")
+    parser.add_argument("--herhalingen", type=int, default=3, help="aantal herhalingen per meting")
+    parser.add_argument("--onderdelen", nargs="+", choices=["berekening", "app", "pdf"], default=["berekening", "app", "pdf"])
+    parser.add_argument("--vergelijk", help="eerder resultatenbestand om mee te vergelijken")
+    args = parser.parse_args(argv)
+    if max(args.maanden) > MAX_MAANDEN:
+        parser.error(f"--maanden mag hoogstens {MAX_MAANDEN} zijn")
+
+    resultaten = {
+        "versie": _git_versie(),
+        "tijdstip": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_aantal": os.cpu_count(),
+        "metingen": [],
+    }
+    for aantal in args.maanden:
+        data = synthetische_historie(aantal)
+        specificaties_per_maand = synthetische_specificaties(list(data["maand"]))
+        if "berekening" in args.onderdelen:
+            resultaten["metingen"] += benchmark_berekening(data, args.herhalingen)
+        if "app" in args.onderdelen:
+            resultaten["metingen"] += benchmark_app(data, specificaties_per_maand, args.herhalingen)
+        if "pdf" in args.onderdelen:
+            resultaten["metingen"] += benchmark_pdf(data, specificaties_per_maand, args.herhalingen)
+
+    with open(args.uitvoer, "w", encoding="utf-8") as bestand:
+        json.dump(resultaten, bestand, ensure_ascii=False, indent=2)
+        bestand.write("\n")
+    print(f"Resultaten in {args.uitvoer}", file=sys.stderr)
+    if args.vergelijk:
+        with open(args.vergelijk, encoding="utf-8") as bestand:
+            vergelijk(resultaten, json.load(bestand))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
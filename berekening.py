@@ -0,0 +1,392 @@
+import numpy as np
+
+from kostenmodel import standaard_model
+
+# Rekenkern van de configurator: historische gegevens en alle berekeningen, zonder Streamlit,
+# plot- of PDF-bibliotheken. Pandas wordt alleen geladen door functies die een DataFrame teruggeven.
+
+# Maandlabels zoals "jul-24" (afkorting en jaar in twee cijfers, vanaf 2000), gebruikt door de historie,
+# de grootboekimport, de prognose en de vestigingen
+MAAND_AFKORTINGEN = ["jan", "feb", "mrt", "apr", "mei", "jun", "jul", "aug", "sep", "okt", "nov", "dec"]
+
+# Volgnummer van een maandlabel (jaar * 12 + maand), om maanden te kunnen tellen
+def maandnummer(label):
+    try:
+        afkorting, jaar = str(label).strip().lower().split("-")
+        return (2000 + int(jaar)) * 12 + MAAND_AFKORTINGEN.index(afkorting)
+    except ValueError:
+        raise ValueError(f"Onbekende maand: {label!r} (verwacht bijv. jul-24)") from None
+
+def maandlabel(nummer):
+    return f"{MAAND_AFKORTINGEN[nummer % 12]}-{nummer // 12 % 100:02d}"
+
+def maand_labels(startmaand, aantal_maanden):
+    begin = maandnummer(startmaand)
+    return [maandlabel(nummer) for nummer in range(begin, begin + aantal_maanden)]
+
+def volgende_maand(label):
+    return maandlabel(maandnummer(label) + 1)
+
+# Gegevens
+historische_data = {
+    "maand": ["apr-24", "mei-24", "jun-24"],
+    "laadpalen": [17, 32, 22],
+    "zonnepanelen": [1, 1, 2],
+    "omzet": [47815.08, 77623.70, 70814.06],
+    "kostprijs": [-31635.08, -53237.07, -48733.60],
+    "brutomarge": [16180.00, 24386.63, 22080.46],
+    "omzet_laadpalen": [39006.93, 72205.14, 53114.71],
+    "kostprijs_laadpalen": [-27304.85, -51170.81, -42461.63],
+    "brutomarge_laadpalen": [11702.08, 21034.33, 10653.08],
+    "omzet_zonnepanelen": [8808.15, 5418.56, 17699.35],
+    "kostprijs_zonnepanelen": [-4330.23, -2066.26, -6271.97],
+    "brutomarge_zonnepanelen": [4477.92, 3352.30, 11427.38],
+    "personeelskosten": [-16315.00, -16315.00, -16315.00],
+    "it_kosten": [-311.29, -284.03, -391.83],
+    "solar_kosten": [-704.50, -704.50, -704.50],
+    "contributie_kosten": [-154.74, -154.74, -154.74],
+    "afschrijving_kosten": [-3631.45, -3449.16, -3348.98],
+    "autokosten": [-500, -500, -500],
+    "resultaat": [-4936.98, 3479.20, 1165.41]
+}
+
+specificaties = {
+    "apr-24": {
+        "Personeelskosten": -16315.00,
+        "Loonjournaalpost": -16315.00,
+        "IT Kosten": -311.29,
+        "Acknowledge cloud dienst": -56.25,
+        "ACK CSP 14-02-24": -51.3,
+        "ACK SLA 37,60 PER WERKPLEK": -112.8,
+        "Ack Back Up storage": -44.79,
+        "BUBBLE": -13.52,
+        "SLA Licenties 2024-03": -23.44,
+        "kpn": -9.19,
+        "Contributies/ Lidmaatschappen": -859.24,
+        "2Solar software licentie": -704.5,
+        "Contributie installatiebedrijf": -154.74,
+        "Afschrijvingen": -3631.45,
+        "5231 afschrijving service auto": -2000.00,
+        "Afschrijving combo": -881.45,
+        "1 demo voor Bink & Ian": -750,
+    },
+    "mei-24": {
+        "Personeelskosten": -16315.00,
+        "Loonjournaalpost": -16315.00,
+        "IT Kosten": -284.03,
+        "ACK CSP 14-02-24": -51.3,
+        "ACK SLA 37,60 PER WERKPLEK": -112.8,
+        "Ack Back Up storage": -44.79,
+        "BUBBLE": -13.52,
+        "SLA licenties 2024": -46.88,
+        "Yomani SDLE pin Worldline": -14.74,
+        "Contributies/ Lidmaatschappen": -859.24,
+        "2Solar software licentie": -704.5,
+        "Contributie installatiebedrijf": -154.74,
+        "Afschrijvingen": -3449.16,
+        "5231 afschrijving service auto": -2000.00,
+        "Afschrijving combo": -699.16,
+        "1 demo voor Bink & Ian": -750,
+    },
+    "jun-24": {
+        "Personeelskosten": -16315.00,
+        "Loonjournaalpost": -16315.00,
+        "IT Kosten": -391.83,
+        "ACK CSP 14-02-24": -51.3,
+        "ACK SLA 37,60 PER WERKPLEK": -112.8,
+        "Ack Back Up storage": -44.79,
+        "BUBBLE": -13.52,
+        "SLA licenties 2024": -46.88,
+        "Coolblue Samsung ViewFinity": -47.92,
+        "Acknowledge adobe lightroom": -74.63,
+        "Contributies/ Lidmaatschappen": -859.24,
+        "2Solar software licentie": -704.5,
+        "Contributie installatiebedrijf": -154.74,
+        "Afschrijvingen": -3348.98,
+        "5231 afschrijving service auto": -2000.00,
+        "Afschrijving combo": -598.98,
+        "1 demo voor Bink & Ian": -750,
+    }
+}
+
+# Historische gemiddelden per eenheid, de gemeenschappelijke basis voor alle berekeningen.
+# data mag een DataFrame of een dict met lijsten zijn (zoals historische_data).
+def bereken_eenheidstarieven(data):
+    aantal = len(data["laadpalen"])
+    return {
+        "omzet_per_laadpaal": sum(omzet / aantal_stuks for omzet, aantal_stuks in zip(data["omzet_laadpalen"], data["laadpalen"])) / aantal,
+        "marge_per_laadpaal": sum(marge / aantal_stuks for marge, aantal_stuks in zip(data["brutomarge_laadpalen"], data["laadpalen"])) / aantal,
+        "omzet_per_zonnepaneel": sum(omzet / aantal_stuks for omzet, aantal_stuks in zip(data["omzet_zonnepanelen"], data["zonnepanelen"])) / aantal,
+        "marge_per_zonnepaneel": sum(marge / aantal_stuks for marge, aantal_stuks in zip(data["brutomarge_zonnepanelen"], data["zonnepanelen"])) / aantal,
+        "it_kosten": -sum(data["it_kosten"]) / aantal,
+        "solar_kosten": -sum(data["solar_kosten"]) / aantal,
+        "contributie_kosten": -sum(data["contributie_kosten"]) / aantal,
+    }
+
+_standaard_tarieven = None
+
+# Tarieven op basis van de ingebouwde historische gegevens, voor aanroepen zonder eigen tarieven
+def standaard_tarieven():
+    global _standaard_tarieven
+    if _standaard_tarieven is None:
+        _standaard_tarieven = bereken_eenheidstarieven(historische_data)
+    return _standaard_tarieven
+
+# Standaardwaarden van de invoerparameters (de beginstand van de schuifregelaars)
+STANDAARD_INVOER = {
+    "aantal_laadpalen": 22,
+    "aantal_zonnepanelen": 2,
+    "marge_laadpalen": 32,
+    "marge_zonnepanelen": 32,
+    "aantal_installeurs": 2,
+    "aantal_verkopers": 2,
+    "fulltime_verkopers": 0,
+    "marketing_budget": 5000,
+}
+
+# Hoe de kostenkolommen van een maand in de historie in het resultaat meetellen, vastgelegd per maand bij
+# het opslaan (Opslag.voeg_maanden_toe). In de oorspronkelijke historie staan kosten negatief en worden ze
+# opgeteld (KOSTEN_NEGATIEF); maanden uit bereken_gegevens hebben de kolommen zoals het kostenmodel ze van
+# de marge aftrekt (KOSTEN_POSITIEF). Het resultaat van een maand verandert dus met -kostenteken maal
+# de verandering van een kostenkolom.
+KOSTEN_NEGATIEF = -1
+KOSTEN_POSITIEF = 1
+
+# Kolommen van de historie en de regel in het kostenmodel waar ze vandaan komen
+HISTORIE_REGELS = {
+    "omzet": "totale_omzet",
+    "kostprijs": "kostprijs",
+    "brutomarge": "totale_marge",
+    "omzet_laadpalen": "omzet_laadpalen",
+    "kostprijs_laadpalen": "kostprijs_laadpalen",
+    "brutomarge_laadpalen": "brutomarge_laadpalen",
+    "omzet_zonnepanelen": "omzet_zonnepanelen",
+    "kostprijs_zonnepanelen": "kostprijs_zonnepanelen",
+    "brutomarge_zonnepanelen": "brutomarge_zonnepanelen",
+    "personeelskosten": "personeelskosten",
+    "it_kosten": "it_kosten",
+    "solar_kosten": "solar_kosten",
+    "contributie_kosten": "contributie_kosten",
+    "autokosten": "autokosten",
+    "afschrijving_kosten": "afschrijving_kosten",
+    "resultaat": "resultaat",
+}
+
+# Functie om de gegevens te berekenen op basis van de invoer. De kostenregels (omzet, marge,
+# personeel, vaste kosten, afschrijvingen en totalen) staan in het kostenmodel (kostenmodel.json).
+def bereken_gegevens(aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, maand, tarieven=None):
+    if tarieven is None:
+        tarieven = standaard_tarieven()
+
+    model = standaard_model()
+    regels = model.bereken(
+        tarieven,
+        aantal_laadpalen=aantal_laadpalen,
+        aantal_zonnepanelen=aantal_zonnepanelen,
+        marge_laadpalen=marge_laadpalen,
+        marge_zonnepanelen=marge_zonnepanelen,
+        aantal_installeurs=aantal_installeurs,
+        aantal_verkopers=aantal_verkopers,
+        fulltime_verkopers=fulltime_verkopers,
+        marketing_budget=marketing_budget,
+    )
+
+    nieuwe_data = {"maand": maand, "laadpalen": aantal_laadpalen, "zonnepanelen": aantal_zonnepanelen}
+    for kolom, regel in HISTORIE_REGELS.items():
+        nieuwe_data[kolom] = regels[regel]
+
+    return nieuwe_data, specificatie_uit_regels(model, regels)
+
+# Specificatie van een berekende maand: de personeelskosten, elke vaste kostenregel met zijn
+# omschrijving en de afschrijvingen
+def specificatie_uit_regels(model, regels):
+    specificatie = {"Personeelskosten": regels["personeelskosten"]}
+    for regel in model.regels.values():
+        if regel.soort == "vaste_kosten":
+            specificatie[regel.omschrijving] = regels[regel.naam]
+    specificatie["Afschrijvingen"] = regels["afschrijving_kosten"]
+    return specificatie
+
+# Invoerparameters van bereken_gegevens die per scenario kunnen variëren
+SCENARIO_PARAMETERS = (
+    "aantal_laadpalen",
+    "aantal_zonnepanelen",
+    "marge_laadpalen",
+    "marge_zonnepanelen",
+    "aantal_installeurs",
+    "aantal_verkopers",
+    "fulltime_verkopers",
+    "marketing_budget",
+)
+
+# Vectorized versie van bereken_gegevens: elke parameter mag een getal of een array zijn.
+# Het kostenmodel rekent met arrays dezelfde bewerkingen als met getallen, zodat de uitkomsten
+# per scenario exact gelijk zijn aan die van de scalaire functie. Zonder afschrijving_kosten geldt de
+# vaste maandafschrijving van bereken_gegevens; de prognose geeft het afschrijvingsschema per maand mee.
+def bereken_scenario_kolommen(aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, tarieven=None, afschrijving_kosten=None):
+    if tarieven is None:
+        tarieven = standaard_tarieven()
+
+    invoer = dict(zip(SCENARIO_PARAMETERS, np.broadcast_arrays(
+        *(np.asarray(waarde, dtype=float) for waarde in (aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget))
+    )))
+    if afschrijving_kosten is not None:
+        invoer["afschrijving_kosten"] = afschrijving_kosten
+
+    # Een marge van 0 geeft in bereken_gegevens een ZeroDivisionError, hier inf/nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        regels = standaard_model().bereken(tarieven, **invoer)
+
+    # Vaste kosten zijn voor elk scenario gelijk (afschrijvingen in een prognose per maand)
+    vast = np.ones_like(regels["resultaat"])
+    return {
+        "laadpalen": invoer["aantal_laadpalen"],
+        "zonnepanelen": invoer["aantal_zonnepanelen"],
+        "marge_laadpalen": invoer["marge_laadpalen"],
+        "marge_zonnepanelen": invoer["marge_zonnepanelen"],
+        "aantal_installeurs": invoer["aantal_installeurs"],
+        "aantal_verkopers": invoer["aantal_verkopers"],
+        "fulltime_verkopers": invoer["fulltime_verkopers"],
+        "marketing_budget": invoer["marketing_budget"],
+        "omzet": regels["totale_omzet"],
+        "kostprijs": regels["kostprijs"],
+        "brutomarge": regels["totale_marge"],
+        "omzet_laadpalen": regels["omzet_laadpalen"],
+        "kostprijs_laadpalen": regels["kostprijs_laadpalen"],
+        "brutomarge_laadpalen": regels["brutomarge_laadpalen"],
+        "omzet_zonnepanelen": regels["omzet_zonnepanelen"],
+        "kostprijs_zonnepanelen": regels["kostprijs_zonnepanelen"],
+        "brutomarge_zonnepanelen": regels["brutomarge_zonnepanelen"],
+        "personeelskosten": regels["personeelskosten"],
+        "it_kosten": regels["it_kosten"] * vast,
+        "solar_kosten": regels["solar_kosten"] * vast,
+        "contributie_kosten": regels["contributie_kosten"] * vast,
+        "autokosten": regels["autokosten"] * vast,
+        "afschrijving_kosten": regels["afschrijving_kosten"] * vast,
+        "totale_kosten": regels["totale_kosten"],
+        "resultaat": regels["resultaat"],
+        "totale_personen": regels["totale_personen"],
+        "omzet_per_persoon": regels["omzet_per_persoon"],
+        "marge_per_persoon": regels["marge_per_persoon"],
+    }
+
+# Bereken een batch scenario's in één keer en geef een DataFrame met één rij per scenario.
+# Met raster=True wordt het volledige kruisproduct van alle opgegeven waarden doorgerekend,
+# anders worden de parameters tegen elkaar gebroadcast (losse getallen gelden voor alle scenario's).
+def bereken_scenarios(aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, raster=False, tarieven=None):
+    invoer = [aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget]
+    if raster:
+        invoer = np.meshgrid(*(np.ravel(waarde) for waarde in invoer), indexing="ij")
+    kolommen = bereken_scenario_kolommen(*invoer, tarieven=tarieven)
+    import pandas as pd
+
+    return pd.DataFrame({naam: np.ravel(waarden) for naam, waarden in kolommen.items()})
+
+# Verdelingen voor de risicosimulatie, geschat uit de historie. Volumes als (gemiddelde, standaardafwijking)
+# van het aantal per maand; voor de marges alleen de spreiding van het historische margepercentage,
+# het gemiddelde komt van de schuifregelaar.
+def schat_verdelingen(data, marge_laadpalen, marge_zonnepanelen):
+    kolom = lambda naam: np.asarray(data[naam], dtype=float)
+    spreiding = lambda reeks: float(reeks.std(ddof=1)) if len(reeks) > 1 else 0.0
+    return {
+        "laadpalen": (float(kolom("laadpalen").mean()), spreiding(kolom("laadpalen"))),
+        "zonnepanelen": (float(kolom("zonnepanelen").mean()), spreiding(kolom("zonnepanelen"))),
+        "marge_laadpalen": (marge_laadpalen, spreiding(kolom("brutomarge_laadpalen") / kolom("omzet_laadpalen") * 100)),
+        "marge_zonnepanelen": (marge_zonnepanelen, spreiding(kolom("brutomarge_zonnepanelen") / kolom("omzet_zonnepanelen") * 100)),
+    }
+
+# Trek gehele aantallen: negatief binomiaal als de spreiding groter is dan het gemiddelde, anders Poisson
+def trek_volumes(rng, gemiddelde, standaardafwijking, aantal):
+    if gemiddelde <= 0:
+        return np.zeros(aantal)
+    variantie = standaardafwijking ** 2
+    if variantie > gemiddelde:
+        return rng.negative_binomial(gemiddelde ** 2 / (variantie - gemiddelde), gemiddelde / variantie, aantal).astype(float)
+    return rng.poisson(gemiddelde, aantal).astype(float)
+
+# Monte Carlo-simulatie van het maandresultaat. De trekkingen worden in blokken door
+# bereken_scenario_kolommen gehaald, zodat het geheugengebruik begrensd blijft bij miljoenen trekkingen.
+def simuleer_resultaat(verdelingen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, aantal_trekkingen=1_000_000, blokgrootte=100_000, seed=None, tarieven=None):
+    rng = np.random.default_rng(seed)
+    resultaten = np.empty(aantal_trekkingen)
+    for begin in range(0, aantal_trekkingen, blokgrootte):
+        aantal = min(blokgrootte, aantal_trekkingen - begin)
+        kolommen = bereken_scenario_kolommen(
+            trek_volumes(rng, *verdelingen["laadpalen"], aantal),
+            trek_volumes(rng, *verdelingen["zonnepanelen"], aantal),
+            np.maximum(rng.normal(*verdelingen["marge_laadpalen"], aantal), 0),
+            np.maximum(rng.normal(*verdelingen["marge_zonnepanelen"], aantal), 0),
+            aantal_installeurs,
+            aantal_verkopers,
+            fulltime_verkopers,
+            marketing_budget,
+            tarieven=tarieven,
+        )
+        resultaten[begin:begin + aantal] = kolommen["resultaat"]
+    return resultaten
+
+def vat_simulatie_samen(resultaten, percentielen=(5, 10, 25, 50, 75, 90, 95)):
+    return {
+        "gemiddelde": float(resultaten.mean()),
+        "percentielen": dict(zip(percentielen, np.percentile(resultaten, percentielen).tolist())),
+        "kans_op_verlies": float(np.mean(resultaten < 0)),
+    }
+
+# Zoekbereik per vrije invoer van de doelzoeker: (ondergrens, bovengrens, alleen gehele waarden)
+DOELZOEKER_BEREIK = {
+    "aantal_laadpalen": (0, 100_000, True),
+    "aantal_zonnepanelen": (0, 100_000, True),
+    "marge_laadpalen": (0, 1_000, False),
+    "marge_zonnepanelen": (0, 1_000, False),
+    "aantal_installeurs": (0, 10_000, True),
+    "aantal_verkopers": (0, 10_000, True),
+    "fulltime_verkopers": (0, 10_000, True),
+    "marketing_budget": (0, 100_000_000, False),
+}
+
+# Zoek de waarde van één vrije invoer waarbij de doelgrootheid (bijv. "resultaat" of "marge_per_persoon")
+# het doel haalt, terwijl de overige invoer vast blijft. Bij een stijgende doelgrootheid is dat de
+# kleinste waarde die het doel haalt, bij een dalende (kosten) de grootste. Gehele invoer wordt op
+# gehele waarden gezocht. Vaste invoer mag een array zijn: dan wordt voor elke waarde tegelijk gezocht
+# met een gevectoriseerde bisectie. Waar het doel binnen het bereik niet haalbaar is, komt NaN terug.
+def zoek_doel(vrije_invoer, doel=0.0, doelgrootheid="resultaat", bereik=None, tarieven=None, **vaste_invoer):
+    ondergrens, bovengrens, geheel = bereik or DOELZOEKER_BEREIK[vrije_invoer]
+    ontbrekend = set(SCENARIO_PARAMETERS) - set(vaste_invoer) - {vrije_invoer}
+    if ontbrekend:
+        raise TypeError(f"zoek_doel mist vaste invoer: {', '.join(sorted(ontbrekend))}")
+    vorm = np.broadcast_shapes(*(np.shape(waarde) for waarde in vaste_invoer.values()))
+
+    def doelwaarde(waarde):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return bereken_scenario_kolommen(**vaste_invoer, **{vrije_invoer: waarde}, tarieven=tarieven)[doelgrootheid]
+
+    onder = np.full(vorm, float(ondergrens))
+    boven = np.full(vorm, float(bovengrens))
+    waarde_onder = doelwaarde(onder)
+    waarde_boven = doelwaarde(boven)
+    stijgend = waarde_boven >= waarde_onder
+
+    # Invariant: de kant waar de doelgrootheid het hoogst is haalt het doel, de andere kant niet
+    iteraties = int(np.ceil(np.log2(bovengrens - ondergrens + 1))) + 1 if geheel else 64
+    for _ in range(iteraties):
+        midden = np.floor((onder + boven) / 2) if geheel else (onder + boven) / 2
+        naar_boven = (doelwaarde(midden) >= doel) == stijgend
+        boven = np.where(naar_boven, midden, boven)
+        onder = np.where(naar_boven, onder, midden)
+
+    oplossing = np.where(stijgend, boven, onder)
+    # Wordt het doel al aan de gunstige kant van het bereik gehaald, dan is die grens de oplossing;
+    # wordt het nergens gehaald, dan is er geen oplossing
+    beste, slechtste = np.where(stijgend, waarde_boven, waarde_onder), np.where(stijgend, waarde_onder, waarde_boven)
+    oplossing = np.where(slechtste >= doel, np.where(stijgend, float(ondergrens), float(bovengrens)), oplossing)
+    oplossing = np.where(beste >= doel, oplossing, np.nan)
+    return oplossing.item() if oplossing.ndim == 0 else oplossing
+
+# Break-even-curve: los de vrije invoer op voor elke waarde van een tweede invoer, in één aanroep van zoek_doel
+def bereken_doelcurve(vrije_invoer, variabele, waarden, doel=0.0, doelgrootheid="resultaat", tarieven=None, **vaste_invoer):
+    waarden = np.asarray(waarden, dtype=float)
+    vaste_invoer[variabele] = waarden
+    oplossing = zoek_doel(vrije_invoer, doel, doelgrootheid, tarieven=tarieven, **vaste_invoer)
+    import pandas as pd
+
+    return pd.DataFrame({variabele: waarden, vrije_invoer: oplossing})
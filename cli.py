@@ -0,0 +1,130 @@
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from berekening import SCENARIO_PARAMETERS, STANDAARD_INVOER, bereken_eenheidstarieven, bereken_scenario_kolommen, historische_data, specificaties
+from meting import Meter, meet
+
+# Configurator zonder Streamlit, bijvoorbeeld voor cron of een pipeline:
+#
+#   python cli.py scenarios.csv -o resultaten.csv
+#   python cli.py scenarios.json -o resultaten.json --database configurator.db --rapport rapport.pdf
+#
+# Een scenariobestand (CSV met kopregel, of JSON met een lijst objecten) bevat per scenario de
+# invoerparameters van bereken_gegevens; ontbrekende parameters krijgen de standaardwaarde. Een
+# optionele kolom "naam" wordt in de uitvoer overgenomen. PDF- en plotbibliotheken worden alleen
+# geladen als er met --rapport om een rapport gevraagd wordt.
+
+
+def lees_scenarios(pad):
+    if pad.lower().endswith(".json"):
+        with open(pad, encoding="utf-8") as bestand:
+            scenarios = json.load(bestand)
+        return scenarios["scenarios"] if isinstance(scenarios, dict) else scenarios
+    with open(pad, newline="", encoding="utf-8-sig") as bestand:
+        return list(csv.DictReader(bestand))
+
+
+# Historie en specificaties uit de database van de app, of de ingebouwde gegevens
+def laad_historie(database=None):
+    if database is None:
+        return historische_data, specificaties
+    import pandas as pd
+    from opslag import Opslag, Specificaties
+
+    opslag = Opslag(database)
+    opslag.initialiseer(pd.DataFrame(historische_data), specificaties)
+    return opslag.laad_data(), dict(Specificaties(opslag))
+
+
+def _invoerwaarde(scenario, naam):
+    waarde = scenario.get(naam)
+    return float(STANDAARD_INVOER[naam] if waarde in (None, "") else waarde)
+
+
+def bereken(scenarios, tarieven):
+    invoer = {naam: np.array([_invoerwaarde(scenario, naam) for scenario in scenarios]) for naam in SCENARIO_PARAMETERS}
+    return bereken_scenario_kolommen(**invoer, tarieven=tarieven)
+
+
+def _json_getal(waarde):
+    return waarde if math.isfinite(waarde) else None
+
+
+def schrijf_resultaten(kolommen, namen, uitvoer, formaat):
+    kolomnamen = (["naam"] if namen else []) + list(kolommen)
+    waarden = [np.ravel(reeks).tolist() for reeks in kolommen.values()]
+    rijen = [([namen[i]] if namen else []) + [reeks[i] for reeks in waarden] for i in range(len(waarden[0]))]
+
+    bestand = sys.stdout if uitvoer == "-" else open(uitvoer, "w", newline="", encoding="utf-8")
+    try:
+        if formaat == "json":
+            json.dump(
+                [{naam: _json_getal(waarde) if isinstance(waarde, float) else waarde for naam, waarde in zip(kolomnamen, rij)} for rij in rijen],
+                bestand,
+                ensure_ascii=False,
+                indent=2,
+            )
+            bestand.write("\n")
+        else:
+            schrijver = csv.writer(bestand)
+            schrijver.writerow(kolomnamen)
+            schrijver.writerows(rijen)
+    finally:
+        if bestand is not sys.stdout:
+            bestand.close()
+
+
+def voer_uit(args, formaat):
+    scenarios = lees_scenarios(args.scenarios)
+    data, specificaties_per_maand = laad_historie(args.database)
+    if scenarios:
+        with meet("scenario's berekenen"):
+            kolommen = bereken(scenarios, bereken_eenheidstarieven(data))
+        namen = [scenario.get("naam", "") for scenario in scenarios] if any("naam" in scenario for scenario in scenarios) else None
+        schrijf_resultaten(kolommen, namen, args.uitvoer, formaat)
+
+    if args.rapport:
+        import pandas as pd
+        from rapport import genereer_rapport
+
+        with meet("genereer_rapport", "rapport"):
+            pdf_content = genereer_rapport(pd.DataFrame(data), specificaties_per_maand, args.installateurs, args.verkopers, args.fulltime_verkopers)
+        with open(args.rapport, "wb") as bestand:
+            bestand.write(pdf_content)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bereken configurator-scenario's en maak optioneel het PDF-rapport.")
+    parser.add_argument("scenarios", help="scenariobestand (.csv of .json)")
+    parser.add_argument("-o", "--uitvoer", default="-", help="resultatenbestand (.csv of .json), standaard stdout")
+    parser.add_argument("--formaat", choices=["csv", "json"], help="uitvoerformaat, standaard afgeleid van --uitvoer (anders csv)")
+    parser.add_argument("--database", help="SQLite-database van de app als bron voor de historie")
+    parser.add_argument("--rapport", help="schrijf ook het PDF-rapport naar dit bestand")
+    parser.add_argument("--installateurs", type=int, default=STANDAARD_INVOER["aantal_installeurs"], help="fulltime installateurs voor het rapport")
+    parser.add_argument("--verkopers", type=int, default=STANDAARD_INVOER["aantal_verkopers"], help="parttime verkopers voor het rapport")
+    parser.add_argument("--fulltime-verkopers", type=int, default=STANDAARD_INVOER["fulltime_verkopers"], help="fulltime verkopers voor het rapport")
+    parser.add_argument("--trace", help="schrijf prestatiemetingen (Trace Event Format) naar dit bestand")
+    args = parser.parse_args(argv)
+
+    if args.database is not None and not os.path.exists(args.database):
+        parser.error(f"database niet gevonden: {args.database}")
+    formaat = args.formaat or ("json" if args.uitvoer.lower().endswith(".json") else "csv")
+
+    if args.trace:
+        with Meter() as meter:
+            code = voer_uit(args, formaat)
+        with open(args.trace, "w", encoding="utf-8") as bestand:
+            bestand.write(meter.naar_trace_events())
+        return code
+    return voer_uit(args, formaat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,455 +1,237 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from fpdf import FPDF
-from datetime import datetime
 from io import BytesIO
-import matplotlib.pyplot as plt
-import seaborn as sns
-import tempfile
+import csv
+import os
+from berekening import (
+    historische_data, specificaties, STANDAARD_INVOER, KOSTEN_POSITIEF, maandnummer, volgende_maand, bereken_eenheidstarieven, bereken_gegevens,
+    schat_verdelingen, simuleer_resultaat, vat_simulatie_samen, DOELZOEKER_BEREIK, zoek_doel, bereken_doelcurve,
+)
+from kostenmodel import standaard_model
+from rapportcache import historie_sleutel
+from opslag import Opslag, Specificaties
+import grootboek
+from prognose import STANDAARD_ACTIVA, bereken_prognose, prognose_tabel
+from rapportwachtrij import Rapportwachtrij
+from scenarios import laad_scenarioresultaten, vergelijk_scenarios
+from vestigingen import Vestigingsdata, bereken_maand, consolideer
+import meting
+from meting import meet
 
 # Set page configuration
 st.set_page_config(page_title="Bedrijfsconfigurator", layout="wide")
 
-# Gegevens
-historische_data = {
-    "maand": ["apr-24", "mei-24", "jun-24"],
-    "laadpalen": [17, 32, 22],
-    "zonnepanelen": [1, 1, 2],
-    "omzet": [47815.08, 77623.70, 70814.06],
-    "kostprijs": [-31635.08, -53237.07, -48733.60],
-    "brutomarge": [16180.00, 24386.63, 22080.46],
-    "omzet_laadpalen": [39006.93, 72205.14, 53114.71],
-    "kostprijs_laadpalen": [-27304.85, -51170.81, -42461.63],
-    "brutomarge_laadpalen": [11702.08, 21034.33, 10653.08],
-    "omzet_zonnepanelen": [8808.15, 5418.56, 17699.35],
-    "kostprijs_zonnepanelen": [-4330.23, -2066.26, -6271.97],
-    "brutomarge_zonnepanelen": [4477.92, 3352.30, 11427.38],
-    "personeelskosten": [-16315.00, -16315.00, -16315.00],
-    "it_kosten": [-311.29, -284.03, -391.83],
-    "solar_kosten": [-704.50, -704.50, -704.50],
-    "contributie_kosten": [-154.74, -154.74, -154.74],
-    "afschrijving_kosten": [-3631.45, -3449.16, -3348.98],
-    "autokosten": [-500, -500, -500],
-    "resultaat": [-4936.98, 3479.20, 1165.41]
-}
-
-specificaties = {
-    "apr-24": {
-        "Personeelskosten": -16315.00,
-        "Loonjournaalpost": -16315.00,
-        "IT Kosten": -311.29,
-        "Acknowledge cloud dienst": -56.25,
-        "ACK CSP 14-02-24": -51.3,
-        "ACK SLA 37,60 PER WERKPLEK": -112.8,
-        "Ack Back Up storage": -44.79,
-        "BUBBLE": -13.52,
-        "SLA Licenties 2024-03": -23.44,
-        "kpn": -9.19,
-        "Contributies/ Lidmaatschappen": -859.24,
-        "2Solar software licentie": -704.5,
-        "Contributie installatiebedrijf": -154.74,
-        "Afschrijvingen": -3631.45,
-        "5231 afschrijving service auto": -2000.00,
-        "Afschrijving combo": -881.45,
-        "1 demo voor Bink & Ian": -750,
-    },
-    "mei-24": {
-        "Personeelskosten": -16315.00,
-        "Loonjournaalpost": -16315.00,
-        "IT Kosten": -284.03,
-        "ACK CSP 14-02-24": -51.3,
-        "ACK SLA 37,60 PER WERKPLEK": -112.8,
-        "Ack Back Up storage": -44.79,
-        "BUBBLE": -13.52,
-        "SLA licenties 2024": -46.88,
-        "Yomani SDLE pin Worldline": -14.74,
-        "Contributies/ Lidmaatschappen": -859.24,
-        "2Solar software licentie": -704.5,
-        "Contributie installatiebedrijf": -154.74,
-        "Afschrijvingen": -3449.16,
-        "5231 afschrijving service auto": -2000.00,
-        "Afschrijving combo": -699.16,
-        "1 demo voor Bink & Ian": -750,
-    },
-    "jun-24": {
-        "Personeelskosten": -16315.00,
-        "Loonjournaalpost": -16315.00,
-        "IT Kosten": -391.83,
-        "ACK CSP 14-02-24": -51.3,
-        "ACK SLA 37,60 PER WERKPLEK": -112.8,
-        "Ack Back Up storage": -44.79,
-        "BUBBLE": -13.52,
-        "SLA licenties 2024": -46.88,
-        "Coolblue Samsung ViewFinity": -47.92,
-        "Acknowledge adobe lightroom": -74.63,
-        "Contributies/ Lidmaatschappen": -859.24,
-        "2Solar software licentie": -704.5,
-        "Contributie installatiebedrijf": -154.74,
-        "Afschrijvingen": -3348.98,
-        "5231 afschrijving service auto": -2000.00,
-        "Afschrijving combo": -598.98,
-        "1 demo voor Bink & Ian": -750,
-    }
-}
-
-# Zet de oorspronkelijke data in een DataFrame
-df = pd.DataFrame(historische_data)
-
-# Laad opgeslagen gegevens als die er zijn
-if "data" not in st.session_state:
-    st.session_state.data = df
-else:
+# Prestatiemetingen staan aan met ?debug=1 in de URL (of CONFIGURATOR_DEBUG=1), met ?debug=geheugen
+# worden ook de allocaties gemeten. Uitgeschakeld kost de instrumentatie vrijwel niets.
+# Een run die door st.rerun() (of nieuwe invoer) is afgebroken komt niet toe aan het stoppen van zijn
+# meter onderaan; die wordt hier gestopt, zodat tracemalloc niet blijft lopen.
+debug = st.query_params.get("debug", os.environ.get("CONFIGURATOR_DEBUG", ""))
+if st.session_state.get("meter") is not None:
+    st.session_state.meter.stop()
+meter = meting.Meter(geheugen=debug == "geheugen") if debug in ("1", "geheugen") else None
+st.session_state.meter = meter
+meting.activeer(meter)
+
+# De tarieven worden alleen opnieuw bepaald als de sleutel verandert (nieuwe maand via "Invoeren");
+# de DataFrame zelf wordt niet gehasht door Streamlit (underscore-parameter)
+@st.cache_data(show_spinner=False)
+def laad_eenheidstarieven(sleutel, _data):
+    return bereken_eenheidstarieven(_data)
+
+# De database wordt bij de eerste start gevuld met de historische gegevens uit berekening.py.
+# Met de omgevingsvariabele CONFIGURATOR_DATABASE kan een ander bestand gekozen worden.
+@st.cache_resource
+def laad_opslag():
+    pad = os.environ.get("CONFIGURATOR_DATABASE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "configurator.db"))
+    opslag = Opslag(pad)
+    opslag.initialiseer(pd.DataFrame(historische_data), specificaties)
+    return opslag
+
+# De historie wordt één keer per revisie van de database ingelezen en gehasht, niet per sessie of rerun
+@st.cache_data(show_spinner=False)
+def laad_historie(revisie, _opslag):
+    data = _opslag.laad_data()
+    return data, historie_sleutel(data)
+
+with meet("data laden"):
+    opslag = laad_opslag()
+
+    # Laad opgeslagen gegevens als die er zijn
+    if "data" not in st.session_state:
+        st.session_state.data, st.session_state.data_sleutel = laad_historie(opslag.revisie(), opslag)
     df = st.session_state.data
 
-if "specificaties" not in st.session_state:
-    st.session_state.specificaties = specificaties
-else:
+    # Specificaties worden per maand pas uit de database gelezen als ze nodig zijn
+    if "specificaties" not in st.session_state:
+        st.session_state.specificaties = Specificaties(opslag)
     specificaties = st.session_state.specificaties
 
-def bereken_afschrijving(kosten, percentage):
-    return kosten * (1 - percentage / 100)
-
-# Functie om de gegevens te berekenen op basis van de invoer
-def bereken_gegevens(aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, maand):
-    # Omzet en marge berekeningen
-    omzet_laadpalen = aantal_laadpalen * (sum(df["omzet_laadpalen"] / df["laadpalen"]) / len(df))
-    marge_laadpalen = aantal_laadpalen * (sum(df["brutomarge_laadpalen"] / df["laadpalen"]) / len(df)) * (marge_laadpalen / 100)
-    omzet_zonnepanelen = aantal_zonnepanelen * (sum(df["omzet_zonnepanelen"] / df["zonnepanelen"]) / len(df))
-    marge_zonnepanelen = aantal_zonnepanelen * (sum(df["brutomarge_zonnepanelen"] / df["zonnepanelen"]) / len(df)) * (marge_zonnepanelen / 100)
-
-    totale_omzet = omzet_laadpalen + omzet_zonnepanelen
-    totale_marge = marge_laadpalen + marge_zonnepanelen
-
-    # Personeelskosten
-    fulltime_installeurs_kosten = aantal_installeurs * 4000  # Fulltime installateurs à €4000 p.m.
-    parttime_verkopers_kosten = aantal_verkopers * 20 / 40 * 3000  # Parttime verkopers (20 uur p.p) à €3000 p.m.
-    fulltime_verkoper_kosten = fulltime_verkopers * 3000  # Fulltime verkopers à €3000 p.m.
-    parttime_registratie_kosten = 8 / 40 * 2500  # 1x parttime registratie (8 uur p.w.) à €2500 p.m.
-    personeelskosten = fulltime_installeurs_kosten + parttime_verkopers_kosten + fulltime_verkoper_kosten + parttime_registratie_kosten
-
-    # Vaste kosten
-    it_kosten = -sum(df["it_kosten"]) / len(df)
-    solar_kosten = -sum(df["solar_kosten"]) / len(df)
-    contributie_kosten = -sum(df["contributie_kosten"]) / len(df)
-    autokosten = -200  # Verander hier naar de juiste autokosten
-    afschrijving_service_auto = bereken_afschrijving(-2000, 5)  # Afschrijving van 5% per maand
-    afschrijving_combo = bereken_afschrijving(-600, 5)  # Afschrijving van 5% per maand
-
-    afschrijving_kosten = afschrijving_service_auto + afschrijving_combo
-
-    vaste_kosten = it_kosten + solar_kosten + contributie_kosten + autokosten + afschrijving_kosten
-    totale_kosten = personeelskosten + vaste_kosten + marketing_budget
-
-    resultaat = totale_marge - totale_kosten
-
-    totale_personen = aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1  # Totaal personeel incl. registratie medewerker
-    omzet_per_persoon = totale_omzet / totale_personen
-    marge_per_persoon = totale_marge / totale_personen
-
-    nieuwe_data = {
-        "maand": maand,
-        "laadpalen": aantal_laadpalen,
-        "zonnepanelen": aantal_zonnepanelen,
-        "omzet": totale_omzet,
-        "kostprijs": -(omzet_laadpalen + omzet_zonnepanelen - totale_marge),
-        "brutomarge": totale_marge,
-        "omzet_laadpalen": omzet_laadpalen,
-        "kostprijs_laadpalen": -((omzet_laadpalen * 100 / marge_laadpalen) - omzet_laadpalen),
-        "brutomarge_laadpalen": marge_laadpalen,
-        "omzet_zonnepanelen": omzet_zonnepanelen,
-        "kostprijs_zonnepanelen": -((omzet_zonnepanelen * 100 / marge_zonnepanelen) - omzet_zonnepanelen),
-        "brutomarge_zonnepanelen": marge_zonnepanelen,
-        "personeelskosten": personeelskosten,
-        "it_kosten": it_kosten,
-        "solar_kosten": solar_kosten,
-        "contributie_kosten": contributie_kosten,
-        "autokosten": autokosten,
-        "afschrijving_kosten": afschrijving_kosten,
-        "resultaat": resultaat
-    }
-
-    specificatie_nieuwe_maand = {
-        "Personeelskosten": personeelskosten,
-        "IT Kosten": it_kosten,
-        "Solar kosten": solar_kosten,
-        "Contributie installatiebedrijf": contributie_kosten,
-        "Autokosten": autokosten,
-        "Afschrijvingen": afschrijving_kosten,
-    }
-
-    return nieuwe_data, specificatie_nieuwe_maand
-
-class PDF(FPDF):
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("DejaVu", size=8)
-        self.cell(0, 10, f"Pagina {self.page_no()}", 0, 0, "C")
-
-    def title_page(self):
-        self.add_page()
-        self.set_font("DejaVu", size=24)
-        self.cell(0, 60, "Bedrijfsconfigurator Rapport", 0, 1, "C")
-        self.set_font("DejaVu", size=18)
-        self.cell(0, 10, "Overzicht van financiële prestaties", 0, 1, "C")
-        self.ln(10)
-        self.set_font("DejaVu", size=14)
-        self.cell(0, 10, f"Datum: {datetime.now().strftime('%d-%m-%Y')}", 0, 1, "C")
-        self.ln(20)
-
-    def chapter_title(self, num, title):
-        self.set_font("DejaVu", size=16)
-        self.cell(0, 10, f"Hoofdstuk {num}: {title}", 0, 1, 'L')
-        self.ln(5)
-
-    def chapter_subtitle(self, subtitle):
-        self.set_font("DejaVu", size=12)
-        self.cell(0, 10, subtitle, 0, 1, 'L')
-        self.ln(3)
-
-    def add_table(self, data, col_widths=None):
-        self.set_font("DejaVu", size=10)
-        if not col_widths:
-            col_widths = [self.w / (len(data.columns) + 1)] * len(data.columns)
-        row_height = self.font_size + 3
-
-        for column in data.columns:
-            self.cell(col_widths[data.columns.get_loc(column)], row_height, column, border=1, align='C')
-        self.ln(row_height)
-        for i in range(len(data)):
-            for column in data.columns:
-                text = f"€{data[column].iloc[i]:,.2f}" if isinstance(data[column].iloc[i], (int, float)) else str(data[column].iloc[i])
-                self.cell(col_widths[data.columns.get_loc(column)], row_height, text, border=1, align='C')
-            self.ln(row_height)
-
-    def add_content_table(self, chapters):
-        self.set_font("DejaVu", size=14)
-        self.cell(0, 10, "Inhoudsopgave", 0, 1, 'L')
-        self.ln(5)
-        self.set_font("DejaVu", size=12)
-        for chapter_num, chapter_title in chapters.items():
-            self.cell(0, 10, f"Hoofdstuk {chapter_num}: {chapter_title}", 0, 1, 'L')
-        self.ln(10)
-
-    def add_specifications(self, specifications):
-        self.set_font("DejaVu", size=12)
-        for month, spec in specifications.items():
-            self.chapter_subtitle(f"Specificaties voor {month}")
-            for key, value in spec.items():
-                self.cell(0, 10, f"{key}: €{value:,.2f}", 0, 1, 'L')
-            self.ln(5)
-
-def genereer_rapport(aantal_installeurs, aantal_verkopers, fulltime_verkopers):
-    pdf = PDF()
-    pdf.add_font("DejaVu", "", "DejaVSanus.ttf", uni=True)  # Adjust path to font file
-    pdf.set_font("DejaVu", size=12)
-
-    # Titelpagina
-    pdf.title_page()
-
-    # Inhoudsopgave op pagina 2
-    pdf.add_page()
-    chapters = {
-        1: "Inleiding",
-        2: "Financiële Overzichten",
-        3: "Detailgegevens",
-        4: "Specificaties"
-    }
-    pdf.add_content_table(chapters)
-    
-    # Inleiding
-    pdf.add_page()
-    pdf.chapter_title(1, "Inleiding")
-    pdf.set_font("DejaVu", size=10)
-    inleiding_tekst = (
-        "Dit rapport geeft een uitgebreid overzicht van de financiële prestaties van het bedrijf "
-        "over de afgelopen maanden. Het doel van dit rapport is om inzicht te geven in de omzet, "
-        "marges, kosten en resultaten per maand, evenals de vaste maandelijkse kosten. "
-        "De informatie in dit rapport is bedoeld om beslissingsondersteuning te bieden en om een "
-        "duidelijk beeld te geven van de financiële gezondheid van het bedrijf.\n\n"
-        "In het hoofdstuk 'Financiële Overzichten' worden de maandelijkse financiële gegevens "
-        "gepresenteerd, inclusief omzet, marges en kosten. Daarnaast worden er grafieken getoond "
-        "om trends en verhoudingen te visualiseren. Het hoofdstuk 'Detailgegevens' bevat een gedetailleerde "
-        "tabel met alle financiële gegevens van de afgelopen maanden.\n\n"
-        "We hopen dat dit rapport u helpt bij het nemen van geïnformeerde beslissingen en het verbeteren "
-        "van de financiële prestaties van het bedrijf."
-    )
-    pdf.multi_cell(0, 10, inleiding_tekst)
-    pdf.ln(10)
-
-    # Financiële Overzichten
-    pdf.chapter_title(2, "Financiële Overzichten")
-    for maand in df['maand'].unique():
-        maand_data = df[df['maand'] == maand]
-
-        pdf.chapter_subtitle(f"Maand: {maand}")
-        
-        pdf.set_font("DejaVu", size=12)
-        pdf.cell(0, 10, "Financiële Overzicht", 0, 1)
-        pdf.ln(5)
-        financial_overview = pd.DataFrame({
-            "Categorie": ["Totale Omzet", "Totale Marge", "Totale Kosten", "Resultaat", "Omzet per Persoon", "Marge per Persoon"],
-            "Bedrag": [
-                f"€{maand_data['omzet'].values[0]:,.2f}",
-                f"€{maand_data['brutomarge'].values[0]:,.2f}",
-                f"€{maand_data['kostprijs'].values[0] * -1:,.2f}",
-                f"€{maand_data['resultaat'].values[0]:,.2f}",
-                f"€{maand_data['omzet'].values[0] / (aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1):,.2f}",
-                f"€{maand_data['brutomarge'].values[0] / (aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1):,.2f}"
-            ]
-        })
-        pdf.add_table(financial_overview)
-        pdf.ln(10)
-
-        pdf.cell(0, 10, "Omzet en Marges", 0, 1)
-        pdf.ln(5)
-        omzet_marges = pd.DataFrame({
-            "Categorie": ["Omzet Laadpalen", "Marge Laadpalen", "Omzet Zonnepanelen", "Marge Zonnepanelen"],
-            "Bedrag": [
-                f"€{maand_data['omzet_laadpalen'].values[0]:,.2f}",
-                f"€{maand_data['brutomarge_laadpalen'].values[0]:,.2f}",
-                f"€{maand_data['omzet_zonnepanelen'].values[0]:,.2f}",
-                f"€{maand_data['brutomarge_zonnepanelen'].values[0]:,.2f}"
-            ]
-        })
-        pdf.add_table(omzet_marges)
-        pdf.ln(10)
-
-        pdf.cell(0, 10, "Kostenoverzicht", 0, 1)
-        pdf.ln(5)
-        kostenoverzicht = pd.DataFrame({
-            "Categorie": ["Totale Personeelskosten", "IT Kosten", "Solar Kosten", "Contributie Installatiebedrijf", "Autokosten", "Afschrijving Vervoersmiddelen"],
-            "Bedrag": [
-                f"€{maand_data['personeelskosten'].values[0]:,.2f}",
-                f"€{-maand_data['it_kosten'].values[0]:,.2f}",
-                f"€{-maand_data['solar_kosten'].values[0]:,.2f}",
-                f"€{-maand_data['contributie_kosten'].values[0]:,.2f}",
-                f"€{-maand_data['autokosten'].values[0]:,.2f}",
-                f"€{-maand_data['afschrijving_kosten'].values[0]:,.2f}"
-            ]
-        })
-        pdf.add_table(kostenoverzicht)
-        pdf.ln(10)
-
-        # Voeg grafieken toe met mooiere layout
-        fig, ax = plt.subplots(figsize=(6, 3))
-        sns.barplot(x=["Omzet", "Marge", "Resultaat"], y=[maand_data['omzet'].values[0], maand_data['brutomarge'].values[0], maand_data['resultaat'].values[0]], palette="viridis", ax=ax)
-        ax.set_ylim(0, 250000)
-        ax.set_ylabel("Bedrag in €")
-        ax.set_title("Financiële Overzicht")
-        fig.tight_layout()
-        
-        # Save figure to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png") as tmpfile:
-            fig.savefig(tmpfile.name, bbox_inches='tight')
-            pdf.image(tmpfile.name, x=10, y=None, w=180)
-        
-        plt.close(fig)
-        pdf.ln(10)
-
-        fig, ax = plt.subplots(figsize=(6, 3))
-        ax.plot(df["maand"], df["omzet"], marker='o', label="Omzet", color='blue')
-        ax.plot(df["maand"], -df["kostprijs"], marker='o', label="Kosten", color='red')
-        ax.plot(df["maand"], df["resultaat"], marker='o', label="Winst", color='green')
-        ax.set_ylabel("Bedrag in €")
-        ax.set_title("Trends en Verhoudingen")
-        ax.legend()
-        fig.tight_layout()
-        sns.despine()
-        
-        # Save figure to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png") as tmpfile:
-            fig.savefig(tmpfile.name, bbox_inches='tight')
-            pdf.image(tmpfile.name, x=10, y=None, w=180)
-        
-        plt.close(fig)
-        pdf.add_page()
-
-    # Detailgegevens
-    pdf.chapter_title(3, "Detailgegevens")
-    pdf.ln(5)
-
-    pdf.set_font("DejaVu", size=10)
-    col_width = pdf.w / (len(df.columns) + 1)
-    row_height = pdf.font_size + 3
-
-    for column in df.columns:
-        pdf.cell(col_width, row_height, column, border=1, align='C')
-    pdf.ln(row_height)
-    for i in range(len(df)):
-        for column in df.columns:
-            text = f"€{df[column].iloc[i]:,.2f}" if isinstance(df[column].iloc[i], (int, float)) else str(df[column].iloc[i])
-            pdf.cell(col_width, row_height, text, border=1, align='C')
-        pdf.ln(row_height)
-
-    # Add specifications
-    pdf.chapter_title(4, "Specificaties")
-    pdf.add_specifications(st.session_state.specificaties)
-
-    return pdf.output(dest='S').encode('latin1')
+    tarieven = laad_eenheidstarieven(st.session_state.data_sleutel, df)
 
 # Streamlit interface
 st.title("Bedrijfsconfigurator")
 
+# Omschrijving en schuifregelaarbereik van de invoerparameters; de schuifregelaars in de zijbalk worden
+# hieruit opgebouwd, met STANDAARD_INVOER als beginwaarde
+INVOER_LABELS = {
+    "aantal_laadpalen": ("Aantal verkochte laadpalen", 0, 100),
+    "aantal_zonnepanelen": ("Aantal verkochte zonnepanelen", 0, 50),
+    "marge_laadpalen": ("Marge Laadpalen (%)", 0, 100),
+    "marge_zonnepanelen": ("Marge Zonnepanelen (%)", 0, 100),
+    "aantal_installeurs": ("Aantal fulltime installateurs", 1, 10),
+    "aantal_verkopers": ("Aantal parttime verkopers", 0, 10),
+    "fulltime_verkopers": ("Aantal fulltime verkopers", 0, 10),
+    "marketing_budget": ("Marketing Budget (€)", 0, 50000),
+}
+
+# Break-even: los één invoer op voor een doelresultaat, met de overige schuifregelaars als vaste invoer.
+# Als fragment: een andere doelwaarde of op te lossen invoer voert alleen dit paneel opnieuw uit.
+@st.fragment
+def toon_doelzoeker(huidige_invoer):
+    with st.expander("Break-even / doel zoeken"), meet("doelzoeker"):
+        doelgrootheid = st.selectbox("Doel", ["resultaat", "marge_per_persoon"], format_func={"resultaat": "Resultaat", "marge_per_persoon": "Marge per persoon"}.get)
+        doel = st.number_input("Doelwaarde (€)", value=0.0, step=500.0)
+        vrije_invoer = st.selectbox("Op te lossen invoer", list(DOELZOEKER_BEREIK), format_func=lambda naam: INVOER_LABELS[naam][0])
+        vaste_invoer = {naam: waarde for naam, waarde in huidige_invoer.items() if naam != vrije_invoer}
+        oplossing = zoek_doel(vrije_invoer, doel, doelgrootheid, tarieven=tarieven, **vaste_invoer)
+        geheel = DOELZOEKER_BEREIK[vrije_invoer][2]
+        st.metric(INVOER_LABELS[vrije_invoer][0], "Niet haalbaar" if np.isnan(oplossing) else f"{oplossing:,.0f}" if geheel else f"{oplossing:,.2f}")
+
+        variabele = st.selectbox("Break-even-curve over", ["geen"] + list(vaste_invoer), format_func=lambda naam: "Geen curve" if naam == "geen" else INVOER_LABELS[naam][0])
+        if variabele != "geen":
+            _, minimum, maximum = INVOER_LABELS[variabele]
+            waarden = np.arange(minimum, maximum + 1) if DOELZOEKER_BEREIK[variabele][2] else np.linspace(minimum, maximum, 201)
+            curve = bereken_doelcurve(vrije_invoer, variabele, waarden, doel, doelgrootheid, tarieven=tarieven, **vaste_invoer)
+            fig_curve = px.line(curve, x=variabele, y=vrije_invoer, labels={variabele: INVOER_LABELS[variabele][0], vrije_invoer: INVOER_LABELS[vrije_invoer][0]})
+            st.plotly_chart(fig_curve, use_container_width=True)
+
+# De kostenregels uit het kostenmodel (kostenmodel.json) voor de huidige invoer. De evaluator van de
+# sessie onthoudt de vorige uitkomsten en rekent na een gewijzigde schuifregelaar alleen de regels
+# opnieuw uit die daarvan afhangen.
+@st.fragment
+def toon_kostenregels(huidige_invoer):
+    with st.expander("Kostenregels"), meet("kostenregels"):
+        if "kostenregels" not in st.session_state:
+            st.session_state.kostenregels = standaard_model().evaluator()
+        evaluator = st.session_state.kostenregels
+        herberekend = evaluator.zet(tarieven, **huidige_invoer)
+        st.caption(f"{herberekend} van {len(evaluator.model.regels)} regels opnieuw berekend")
+        st.dataframe(pd.DataFrame(evaluator.regeltabel()), hide_index=True, column_config={"bedrag": st.column_config.NumberColumn("Bedrag (€)", format="%.2f")})
+
 with st.sidebar:
     st.header("Invoerparameters")
-    aantal_laadpalen = st.slider("Aantal verkochte laadpalen", 0, 100, 22)
-    aantal_zonnepanelen = st.slider("Aantal verkochte zonnepanelen", 0, 50, 2)
-    marge_laadpalen = st.slider("Marge Laadpalen (%)", 0, 100, 32)
-    marge_zonnepanelen = st.slider("Marge Zonnepanelen (%)", 0, 100, 32)
-    aantal_installeurs = st.slider("Aantal fulltime installateurs", 1, 10, 2)
-    aantal_verkopers = st.slider("Aantal parttime verkopers", 0, 10, 2)
-    fulltime_verkopers = st.slider("Aantal fulltime verkopers", 0, 10, 0)
-    marketing_budget = st.slider("Marketing Budget (€)", 0, 50000, 5000)
+    huidige_invoer = {naam: st.slider(label, minimum, maximum, STANDAARD_INVOER[naam]) for naam, (label, minimum, maximum) in INVOER_LABELS.items()}
     maand = st.text_input("Maand (bijv. jul-24)", "jul-24")
 
     if st.button("Invoeren"):
         # Bereken de gegevens voor nieuwe maand
-        nieuwe_data, specificatie_nieuwe_maand = bereken_gegevens(aantal_laadpalen, aantal_zonnepanelen, marge_laadpalen, marge_zonnepanelen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, maand)
+        with meet("bereken_gegevens"):
+            nieuwe_data, specificatie_nieuwe_maand = bereken_gegevens(**huidige_invoer, maand=maand, tarieven=tarieven)
         df_nieuwe_data = pd.DataFrame([nieuwe_data])
         df = pd.concat([df, df_nieuwe_data], ignore_index=True)
         
-        # Sla de bijgewerkte gegevens op in de sessie
+        # Sla de bijgewerkte gegevens op in de database en in de sessie
+        opslag.voeg_maand_toe(nieuwe_data, KOSTEN_POSITIEF)
         st.session_state.data = df
+        st.session_state.data_sleutel = historie_sleutel(df)
+        tarieven = laad_eenheidstarieven(st.session_state.data_sleutel, df)
 
         # Voeg nieuwe maand toe aan specificaties
         if maand not in st.session_state.specificaties:
             st.session_state.specificaties[maand] = specificatie_nieuwe_maand
             specificaties = st.session_state.specificaties
 
+    # Grootboekexport inlezen; met een maand erbij wordt alleen die maand (opnieuw) geïmporteerd
+    with st.expander("Grootboek importeren"):
+        grootboek_bestand = st.file_uploader("Grootboekexport (CSV of XLSX)", type=["csv", "xlsx"])
+        import_maand = st.text_input("Alleen maand (leeg = alle maanden)", "")
+        if grootboek_bestand is not None and st.button("Importeren"):
+            mapping = grootboek.laad_mapping(os.environ.get("CONFIGURATOR_GROOTBOEK_MAPPING"))
+            try:
+                import_specificaties, import_kosten, verslag = grootboek.importeer_grootboek(
+                    grootboek_bestand, mapping, maanden={import_maand.strip()} if import_maand.strip() else None
+                )
+            except (ValueError, csv.Error) as fout:
+                st.error(f"De grootboekexport kon niet gelezen worden: {fout}")
+            else:
+                bijgewerkt, zonder_historie = grootboek.verwerk_import(opslag, import_specificaties, import_kosten)
+
+                # Historie en specificaties opnieuw inlezen uit de database
+                st.session_state.data, st.session_state.data_sleutel = laad_historie(opslag.revisie(), opslag)
+                st.session_state.specificaties = Specificaties(opslag)
+                df = st.session_state.data
+                specificaties = st.session_state.specificaties
+                tarieven = laad_eenheidstarieven(st.session_state.data_sleutel, df)
+
+                st.success(f"{verslag['regels']} regels gelezen, {len(import_specificaties)} maanden geïmporteerd.")
+                if verslag["overgeslagen"]:
+                    st.warning(f"{verslag['overgeslagen']} regels zonder passende categorie overgeslagen, o.a.: "
+                               + ", ".join(omschrijving for omschrijving, _ in verslag["niet_gekoppeld"].most_common(5)))
+                if zonder_historie:
+                    st.info("Alleen specificaties opgeslagen (geen omzetgegevens) voor: " + ", ".join(zonder_historie))
+
+    toon_doelzoeker(huidige_invoer)
+    toon_kostenregels(huidige_invoer)
+
+# Figuren worden per combinatie van invoer één keer opgebouwd; het opbouwen met plotly express is het
+# duurste deel van een rerun. st.cache_resource geeft het figuurobject zelf terug (zonder kopie) en deelt
+# het tussen reruns en sessies; de figuren worden na het opbouwen niet meer gewijzigd.
+@st.cache_resource(max_entries=256, show_spinner=False)
+def staafgrafiek(categorieen, bedragen, titel):
+    return px.bar(x=list(categorieen), y=list(bedragen), labels={'x': 'Categorie', 'y': 'Bedrag in €'}, title=titel)
+
+# De trendgrafiek hangt alleen van de historie af en wordt één keer per inhoud van de historie opgebouwd
+@st.cache_resource(max_entries=16, show_spinner=False)
+def trendgrafiek(data_sleutel, _df):
+    return px.line(_df, x="maand", y=["omzet", "kostprijs", "resultaat"], labels={'value': 'Bedrag in €', 'variable': 'Categorie'},
+                   title="Omzet, Kosten en Winst")
+
 st.markdown("### Resultaten")
 
-# Dropdown menu voor maand specificaties
-selected_month = st.selectbox("Selecteer een maand voor specificaties", ["Selecteer een maand"] + list(st.session_state.specificaties.keys()))
+# Dropdown menu voor maand specificaties; als fragment voert het kiezen van een maand alleen dit deel opnieuw uit
+@st.fragment
+def toon_specificaties():
+    selected_month = st.selectbox("Selecteer een maand voor specificaties", ["Selecteer een maand"] + list(st.session_state.specificaties.keys()))
+
+    if selected_month and selected_month != "Selecteer een maand":
+        with st.expander(f"Specificaties voor {selected_month}"):
+            specificatie_data = st.session_state.specificaties[selected_month]
+            for key, value in specificatie_data.items():
+                st.write(f"{key}: €{value:,.2f}")
+
+toon_specificaties()
 
-if selected_month and selected_month != "Selecteer een maand":
-    with st.expander(f"Specificaties voor {selected_month}"):
-        specificatie_data = st.session_state.specificaties[selected_month]
-        for key, value in specificatie_data.items():
-            st.write(f"{key}: €{value:,.2f}")
+# De resultaten gaan over de laatste maand van de historie; alleen de bedragen per persoon hangen
+# ook van de schuifregelaars af
+laatste = df.iloc[-1]
+totale_personen = huidige_invoer["aantal_installeurs"] + huidige_invoer["aantal_verkopers"] + huidige_invoer["fulltime_verkopers"] + 1
+omzet_per_persoon = float(laatste['omzet']) / totale_personen
+marge_per_persoon = float(laatste['brutomarge']) / totale_personen
 
 # Organiseer de resultaten in een kolomstructuur
-with st.container():
+with meet("metrics"), st.container():
     col1, col2, col3, col4 = st.columns((2, 1, 1, 1))
 
     with col1:
-        st.metric("Totale Omzet", f"€{df['omzet'].iloc[-1]:,.2f}")
-        st.metric("Omzet per Persoon", f"€{df['omzet'].iloc[-1] / (aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1):,.2f}")
+        st.metric("Totale Omzet", f"€{laatste['omzet']:,.2f}")
+        st.metric("Omzet per Persoon", f"€{omzet_per_persoon:,.2f}")
 
     with col2:
-        st.metric("Totale Marge", f"€{df['brutomarge'].iloc[-1]:,.2f}")
-        st.metric("Marge per Persoon", f"€{df['brutomarge'].iloc[-1] / (aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1):,.2f}")
+        st.metric("Totale Marge", f"€{laatste['brutomarge']:,.2f}")
+        st.metric("Marge per Persoon", f"€{marge_per_persoon:,.2f}")
 
     with col3:
-        st.metric("Resultaat", f"€{df['resultaat'].iloc[-1]:,.2f}")
-        st.metric("Totale Personeelskosten", f"€{df['personeelskosten'].iloc[-1]:,.2f}")
+        st.metric("Resultaat", f"€{laatste['resultaat']:,.2f}")
+        st.metric("Totale Personeelskosten", f"€{laatste['personeelskosten']:,.2f}")
 
     with col4:
-        st.metric("IT kosten", f"€{-df['it_kosten'].iloc[-1]:,.2f}")
-        st.metric("Solar kosten", f"€{-df['solar_kosten'].iloc[-1]:,.2f}")
-        st.metric("Contributie installatiebedrijf", f"€{-df['contributie_kosten'].iloc[-1]:,.2f}")
-        st.metric("Autokosten", f"€{-df['autokosten'].iloc[-1]:,.2f}")
-        st.metric("Afschrijving vervoersmiddelen", f"€{-df['afschrijving_kosten'].iloc[-1]:,.2f}")
+        st.metric("IT kosten", f"€{-laatste['it_kosten']:,.2f}")
+        st.metric("Solar kosten", f"€{-laatste['solar_kosten']:,.2f}")
+        st.metric("Contributie installatiebedrijf", f"€{-laatste['contributie_kosten']:,.2f}")
+        st.metric("Autokosten", f"€{-laatste['autokosten']:,.2f}")
+        st.metric("Afschrijving vervoersmiddelen", f"€{-laatste['afschrijving_kosten']:,.2f}")
 
 # Visualisaties
 st.markdown("### Visualisaties")
@@ -463,37 +245,372 @@ def plot_to_image(figure):
 with st.container():
     col1, col2, col3, col4 = st.columns(4)
 
-    with col1:
-        fig1 = px.bar(x=["Omzet", "Marge", "Resultaat"], y=[df['omzet'].iloc[-1], df['brutomarge'].iloc[-1], df['resultaat'].iloc[-1]],
-                      labels={'x': 'Categorie', 'y': 'Bedrag in €'}, title="Financiële Overzicht")
+    with col1, meet("grafiek: Financiële Overzicht", "plotly"):
+        fig1 = staafgrafiek(("Omzet", "Marge", "Resultaat"), (float(laatste['omzet']), float(laatste['brutomarge']), float(laatste['resultaat'])), "Financiële Overzicht")
         st.plotly_chart(fig1, use_container_width=True)
 
-    with col2:
-        fig2 = px.bar(x=["Omzet per Persoon", "Marge per Persoon"], y=[df['omzet'].iloc[-1] / (aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1), df['brutomarge'].iloc[-1] / (aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1)],
-                      labels={'x': 'Categorie', 'y': 'Bedrag in €'}, title="Omzet en Marge per Persoon")
+    with col2, meet("grafiek: Omzet en Marge per Persoon", "plotly"):
+        fig2 = staafgrafiek(("Omzet per Persoon", "Marge per Persoon"), (omzet_per_persoon, marge_per_persoon), "Omzet en Marge per Persoon")
         st.plotly_chart(fig2, use_container_width=True)
 
-    with col3:
-        fig3 = px.bar(x=["Omzet Laadpalen", "Marge Laadpalen"], y=[df['omzet_laadpalen'].iloc[-1], df['brutomarge_laadpalen'].iloc[-1]],
-                      labels={'x': 'Categorie', 'y': 'Bedrag in €'}, title="Laadpalen Omzet en Marge")
+    with col3, meet("grafiek: Laadpalen Omzet en Marge", "plotly"):
+        fig3 = staafgrafiek(("Omzet Laadpalen", "Marge Laadpalen"), (float(laatste['omzet_laadpalen']), float(laatste['brutomarge_laadpalen'])), "Laadpalen Omzet en Marge")
         st.plotly_chart(fig3, use_container_width=True)
 
-    with col4:
-        fig4 = px.bar(x=["Omzet Zonnepanelen", "Marge Zonnepanelen"], y=[df['omzet_zonnepanelen'].iloc[-1], df['brutomarge_zonnepanelen'].iloc[-1]],
-                      labels={'x': 'Categorie', 'y': 'Bedrag in €'}, title="Zonnepanelen Omzet en Marge")
+    with col4, meet("grafiek: Zonnepanelen Omzet en Marge", "plotly"):
+        fig4 = staafgrafiek(("Omzet Zonnepanelen", "Marge Zonnepanelen"), (float(laatste['omzet_zonnepanelen']), float(laatste['brutomarge_zonnepanelen'])), "Zonnepanelen Omzet en Marge")
         st.plotly_chart(fig4, use_container_width=True)
 
 st.markdown("### Trends en Verhoudingen")
 
-with st.container():
-    fig5 = px.line(df, x="maand", y=["omzet", "kostprijs", "resultaat"], labels={'value': 'Bedrag in €', 'variable': 'Categorie'},
-                   title="Omzet, Kosten en Winst")
+with st.container(), meet("grafiek: Omzet, Kosten en Winst", "plotly"):
+    fig5 = trendgrafiek(st.session_state.data_sleutel, df)
     st.plotly_chart(fig5, use_container_width=True)
 
 st.markdown("### Detailgegevens")
-st.dataframe(df)
+with meet("detailgegevens"):
+    st.dataframe(df)
+
+# Berekening en figuren van de prognose, per combinatie van invoer (wijzigingen en activa als tuples)
+@st.cache_resource(max_entries=32, show_spinner=False)
+def laad_prognose(data_sleutel, startmaand, aantal_maanden, groei_laadpalen, groei_zonnepanelen, wijzigingen, activa, invoer):
+    prognose = bereken_prognose(
+        startmaand, aantal_maanden, groei_laadpalen, groei_zonnepanelen,
+        wijzigingen=wijzigingen, activa=[dict(activum) for activum in activa], tarieven=tarieven, **dict(invoer),
+    )
+    prognose_df = prognose_tabel(prognose)
+    fig_prognose = px.line(prognose_df, x="maand", y=["omzet", "brutomarge", "resultaat", "cumulatief_resultaat"],
+                           labels={'value': 'Bedrag in €', 'variable': 'Categorie'}, title="Prognose per maand")
+    afschrijvingen_df = pd.DataFrame(prognose["afschrijving"].T, columns=prognose["activa"]).assign(maand=prognose["maanden"])
+    fig_afschrijving = px.bar(afschrijvingen_df, x="maand", y=prognose["activa"], labels={'value': 'Afschrijving in €', 'variable': 'Activum'},
+                              title="Afschrijvingsschema")
+    return prognose, prognose_df, fig_prognose, fig_afschrijving
+
+# Meerjarenprognose met de schuifregelaars als uitgangspunt voor de eerste maand. Als fragment voert
+# het aanpassen van de prognose-invoer alleen dit paneel opnieuw uit.
+@st.fragment
+def toon_prognose(huidige_invoer, standaard_startmaand):
+    with st.expander("Prognose over meerdere maanden"), meet("prognose"):
+        col1, col2, col3, col4 = st.columns(4)
+        startmaand = col1.text_input("Startmaand", standaard_startmaand, key="prognose_startmaand")
+        aantal_maanden = col2.slider("Aantal maanden", 12, 60, 24, step=6)
+        groei_laadpalen = col3.number_input("Groei laadpalen (% per maand)", value=0.0, step=0.5)
+        groei_zonnepanelen = col4.number_input("Groei zonnepanelen (% per maand)", value=0.0, step=0.5)
+
+        # Wijzigingen in de bezetting (of een andere invoer) vanaf een bepaalde maand
+        invoer_per_label = {label: naam for naam, (label, _, _) in INVOER_LABELS.items()}
+        wijzigingen = st.data_editor(
+            pd.DataFrame({"Maand": pd.Series(dtype=str), "Invoer": pd.Series(dtype=str), "Verandering": pd.Series(dtype=float)}),
+            num_rows="dynamic", hide_index=True, key="prognose_wijzigingen",
+            column_config={"Invoer": st.column_config.SelectboxColumn("Invoer", options=list(invoer_per_label))},
+        ).dropna()
+        activa = st.data_editor(
+            pd.DataFrame(STANDAARD_ACTIVA), num_rows="dynamic", hide_index=True, key="prognose_activa",
+            column_config={"methode": st.column_config.SelectboxColumn("methode", options=["lineair", "degressief"])},
+        ).fillna({"restwaarde": 0.0, "percentage": 0.0, "methode": "lineair"}).dropna()
+
+        try:
+            prognose, prognose_df, fig_prognose, fig_afschrijving = laad_prognose(
+                st.session_state.data_sleutel, startmaand, aantal_maanden, groei_laadpalen, groei_zonnepanelen,
+                tuple((rij.Maand, invoer_per_label[rij.Invoer], rij.Verandering) for rij in wijzigingen.itertuples()),
+                tuple(tuple(activum.items()) for activum in activa.to_dict("records")),
+                tuple(huidige_invoer.items()),
+            )
+        except ValueError as fout:
+            st.error(str(fout))
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Cumulatief resultaat", f"€{prognose_df['cumulatief_resultaat'].iloc[-1]:,.2f}")
+            col2.metric("Afschrijvingen in de prognose", f"€{prognose['afschrijving'].sum():,.2f}")
+            col3.metric(f"Boekwaarde activa eind {prognose['maanden'][-1]}", f"€{prognose['boekwaarde'][:, -1].sum():,.2f}")
+            st.plotly_chart(fig_prognose, use_container_width=True)
+            st.plotly_chart(fig_afschrijving, use_container_width=True)
+
+st.markdown("### Meerjarenprognose")
+try:
+    standaard_startmaand = volgende_maand(df["maand"].iloc[-1])
+except ValueError:
+    standaard_startmaand = maand
+toon_prognose(huidige_invoer, standaard_startmaand)
+
+# Risicosimulatie van het maandresultaat bij de huidige personeelsbezetting en marketingbudget.
+# Samenvatting en histogram worden per invoer één keer berekend en gedeeld (zie staafgrafiek).
+@st.cache_resource(max_entries=32, show_spinner="Simulatie wordt uitgevoerd...")
+def laad_simulatie(data_sleutel, verdelingen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, aantal_trekkingen):
+    resultaten = simuleer_resultaat(verdelingen, aantal_installeurs, aantal_verkopers, fulltime_verkopers, marketing_budget, aantal_trekkingen, seed=0, tarieven=tarieven)
+    aantallen, grenzen = np.histogram(resultaten, bins=60)
+    fig_sim = px.bar(x=(grenzen[:-1] + grenzen[1:]) / 2, y=aantallen, labels={'x': 'Resultaat in €', 'y': 'Aantal trekkingen'},
+                     title="Verdeling van het maandresultaat")
+    fig_sim.update_traces(marker_color=np.where((grenzen[:-1] + grenzen[1:]) / 2 < 0, "crimson", "seagreen"))
+    fig_sim.update_layout(bargap=0)
+    return vat_simulatie_samen(resultaten), fig_sim
+
+# Als fragment: de verdelingen aanpassen of de simulatie aanzetten voert alleen dit paneel opnieuw uit
+@st.fragment
+def toon_simulatie(huidige_invoer):
+    with st.expander("Monte Carlo-simulatie van het resultaat"), meet("simulatie"):
+        geschat = schat_verdelingen(df, huidige_invoer["marge_laadpalen"], huidige_invoer["marge_zonnepanelen"])
+        col1, col2, col3, col4 = st.columns(4)
+        verdelingen = {}
+        for kolom, (naam, label) in zip((col1, col2, col3, col4), (("laadpalen", "Laadpalen"), ("zonnepanelen", "Zonnepanelen"), ("marge_laadpalen", "Marge laadpalen (%)"), ("marge_zonnepanelen", "Marge zonnepanelen (%)"))):
+            with kolom:
+                gemiddelde = st.number_input(f"{label}: gemiddelde", value=float(round(geschat[naam][0], 2)), min_value=0.0, key=f"sim_{naam}_gem")
+                spreiding = st.number_input(f"{label}: standaardafwijking", value=float(round(geschat[naam][1], 2)), min_value=0.0, key=f"sim_{naam}_sd")
+                verdelingen[naam] = (gemiddelde, spreiding)
+        aantal_trekkingen = st.select_slider("Aantal trekkingen", options=[10_000, 100_000, 1_000_000], value=1_000_000)
+
+        if st.toggle("Simulatie uitvoeren"):
+            samenvatting, fig_sim = laad_simulatie(
+                st.session_state.data_sleutel, verdelingen, huidige_invoer["aantal_installeurs"], huidige_invoer["aantal_verkopers"],
+                huidige_invoer["fulltime_verkopers"], huidige_invoer["marketing_budget"], aantal_trekkingen,
+            )
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Kans op verlies", f"{samenvatting['kans_op_verlies']:.1%}")
+            col2.metric("Verwacht resultaat", f"€{samenvatting['gemiddelde']:,.2f}")
+            col3.metric("Mediaan", f"€{samenvatting['percentielen'][50]:,.2f}")
+            st.dataframe(pd.DataFrame({
+                "Percentiel": [f"P{p}" for p in samenvatting["percentielen"]],
+                "Resultaat": [f"€{waarde:,.2f}" for waarde in samenvatting["percentielen"].values()],
+            }), hide_index=True)
+            st.plotly_chart(fig_sim, use_container_width=True)
+
+st.markdown("### Risicosimulatie")
+toon_simulatie(huidige_invoer)
+
+# Parameters en historie van de vestigingen, één keer per revisie van de database
+@st.cache_data(show_spinner=False)
+def laad_vestigingen(revisie, _opslag):
+    tabel = _opslag.laad_vestiging_data()
+    return _opslag.vestigingen(), tabel, historie_sleutel(tabel)
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def vestigingsgrafiek(data_sleutel, _tabel):
+    return px.bar(_tabel, x="maand", y="resultaat", color="vestiging", barmode="group", labels={'resultaat': 'Resultaat in €'},
+                  title="Resultaat per vestiging")
+
+# Maandlabels van vestigingen moeten herkenbaar zijn (bijv. jul-24) om ze op volgorde te kunnen zetten
+def geldige_maand(label):
+    try:
+        maandnummer(label)
+    except ValueError:
+        return False
+    return True
+
+# Vestigingen: parameters per vestiging bewerken, historie per vestiging importeren, een maand voor
+# alle vestigingen tegelijk berekenen en het geconsolideerde overzicht. Als fragment voert het bewerken
+# alleen dit paneel opnieuw uit; opslaan leest alles opnieuw in met een volledige rerun.
+@st.fragment
+def toon_vestigingen(huidige_invoer, maand):
+    with st.expander("Vestigingen"), meet("vestigingen"):
+        parameters, tabel, vestiging_sleutel = laad_vestigingen(opslag.revisie(), opslag)
+        st.caption("Parameters per vestiging; lege velden krijgen de waarde van de schuifregelaar.")
+        invoer = pd.DataFrame(
+            [{"vestiging": naam, **{sleutel: instellingen.get(sleutel) for sleutel in INVOER_LABELS}} for naam, instellingen in parameters.items()],
+            columns=["vestiging", *INVOER_LABELS],
+        ).astype({sleutel: float for sleutel in INVOER_LABELS})
+        bewerkt = st.data_editor(
+            invoer, num_rows="dynamic", hide_index=True, key="vestigingen_invoer",
+            column_config={sleutel: st.column_config.NumberColumn(label, min_value=minimum, max_value=maximum, step=1) for sleutel, (label, minimum, maximum) in INVOER_LABELS.items()},
+        )
+        namen = bewerkt["vestiging"].map(lambda naam: "" if pd.isna(naam) else str(naam).strip())
+        # Bestaande rijen houden hun index: een andere naam is een hernoeming, een ontbrekende (of lege) rij
+        # een verwijdering. Verwijderen wist ook de historie en moet daarom eerst bevestigd worden.
+        hernoemd = {invoer.at[index, "vestiging"]: naam for index, naam in namen.items() if index in invoer.index and naam and naam != invoer.at[index, "vestiging"]}
+        verwijderd = [oud for index, oud in invoer["vestiging"].items() if not namen.get(index)]
+        bevestigd = False
+        if verwijderd:
+            st.warning(f"Bij opslaan worden {', '.join(verwijderd)} en hun historie verwijderd.")
+            bevestigd = st.checkbox("Verwijderen bevestigen", key="vestigingen_verwijderen")
+        col1, col2 = st.columns(2)
+        if col1.button("Vestigingen opslaan"):
+            ingevuld = bewerkt.assign(vestiging=namen)[namen != ""]
+            if verwijderd and not bevestigd:
+                st.error("Bevestig eerst het verwijderen van de vestigingen.")
+            elif ingevuld["vestiging"].duplicated().any() or set(hernoemd.values()) & (set(parameters) - set(hernoemd) - set(verwijderd)):
+                st.error("Elke vestiging moet een eigen naam hebben.")
+            else:
+                for naam in verwijderd:
+                    opslag.verwijder_vestiging(naam)
+                for naam, nieuwe_naam in hernoemd.items():
+                    opslag.hernoem_vestiging(naam, nieuwe_naam)
+                for rij in ingevuld.to_dict("records"):
+                    naam = rij.pop("vestiging")
+                    opslag.bewaar_vestiging(naam, {sleutel: waarde for sleutel, waarde in rij.items() if not pd.isna(waarde)})
+                st.rerun()
+
+        historie_bestand = st.file_uploader("Historie per vestiging (CSV met de kolommen vestiging, maand en de historiekolommen)", type=["csv"], key="vestigingen_historie")
+        if historie_bestand is not None and col2.button("Historie importeren"):
+            import_tabel = pd.read_csv(historie_bestand)
+            ontbrekend = {"vestiging", "maand"} - set(import_tabel.columns)
+            onbekende_maanden = [] if ontbrekend else [label for label in dict.fromkeys(import_tabel["maand"]) if not geldige_maand(label)]
+            if ontbrekend:
+                st.error(f"Kolommen ontbreken: {', '.join(sorted(ontbrekend))}")
+            elif onbekende_maanden:
+                st.error(f"Onbekende maanden (verwacht bijv. jul-24): {', '.join(map(str, onbekende_maanden[:5]))}")
+            else:
+                opslag.bewaar_vestiging_maanden(import_tabel.to_dict("records"))
+                st.rerun()
+
+        if not parameters:
+            st.info("Nog geen vestigingen.")
+            return
+        if st.button(f"Maand {maand} berekenen voor alle vestigingen"):
+            if not geldige_maand(maand):
+                st.error(f"Onbekende maand: {maand!r} (verwacht bijv. jul-24)")
+                return
+            with meet("vestigingen: maand berekenen"):
+                nieuwe_maand = bereken_maand(Vestigingsdata.van_tabel(tabel, list(parameters)), parameters, maand, standaard=tarieven, standaardinvoer=huidige_invoer)
+            opslag.bewaar_vestiging_maanden(nieuwe_maand.to_dict("records"))
+            st.rerun()
+        if tabel.empty:
+            st.info("Nog geen historie per vestiging.")
+            return
+
+        with meet("vestigingen: consolideren"):
+            geconsolideerd = consolideer(tabel)
+        laatste_maand = geconsolideerd.iloc[-1]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(f"Vestigingen in {laatste_maand['maand']}", int(laatste_maand["vestigingen"]))
+        col2.metric("Geconsolideerde omzet", f"€{laatste_maand['omzet']:,.2f}")
+        col3.metric("Geconsolideerde marge", f"€{laatste_maand['brutomarge']:,.2f}")
+        col4.metric("Geconsolideerd resultaat", f"€{laatste_maand['resultaat']:,.2f}")
+        st.plotly_chart(vestigingsgrafiek(vestiging_sleutel, tabel), use_container_width=True)
+        st.dataframe(geconsolideerd, hide_index=True)
+
+st.markdown("### Vestigingen")
+toon_vestigingen(huidige_invoer, maand)
+
+# Uitkomsten van de opgeslagen scenario's; de opslag onthoudt ze per scenario, zodat alleen nieuwe of
+# gewijzigde scenario's (of alle na nieuwe tarieven) berekend worden
+@st.cache_data(show_spinner=False)
+def laad_scenarios(revisie, data_sleutel, _opslag, _tarieven):
+    return laad_scenarioresultaten(_opslag, _tarieven)
+
+# Benoemde scenario's opslaan en naast elkaar vergelijken met de verschillen ten opzichte van een
+# basisscenario. De gekozen vergelijking gaat ook als hoofdstuk mee in het rapport.
+@st.fragment
+def toon_scenarios(huidige_invoer):
+    with st.expander("Scenario's"), meet("scenario's"):
+        col1, col2 = st.columns((3, 1))
+        naam = col1.text_input("Naam van het scenario", key="scenario_naam")
+        if col2.button("Huidige invoer opslaan") and naam.strip():
+            opslag.bewaar_scenario(naam.strip(), huidige_invoer)
+            st.rerun()
+
+        tabel, berekend = laad_scenarios(opslag.revisie(), st.session_state.data_sleutel, opslag, tarieven)
+        st.session_state.scenario_vergelijking = None
+        if tabel.empty:
+            st.info("Nog geen scenario's opgeslagen.")
+            return
+        st.caption(f"{len(tabel)} scenario's, waarvan {berekend} opnieuw berekend")
+
+        namen = list(tabel["scenario"])
+        gekozen = st.multiselect("Te vergelijken scenario's", namen, default=namen[:10])
+        if not gekozen:
+            return
+        basis = st.selectbox("Basisscenario", gekozen)
+        vergelijking = vergelijk_scenarios(tabel, gekozen, basis)
+        st.dataframe(vergelijking, hide_index=True, column_config={kolom: st.column_config.NumberColumn(format="%.2f") for kolom in vergelijking.columns[1:]})
+        if len(gekozen) > 1:
+            st.plotly_chart(staafgrafiek(tuple(vergelijking.columns[2::2]), tuple(vergelijking.loc["resultaat"].iloc[3::2]), f"Verschil in resultaat met {basis}"), use_container_width=True)
+        if st.checkbox("Vergelijking opnemen in het rapport", value=True, key="scenario_in_rapport"):
+            st.session_state.scenario_vergelijking = vergelijking
+
+        col1, col2 = st.columns((3, 1))
+        te_verwijderen = col1.selectbox("Scenario verwijderen", namen, key="scenario_verwijderen")
+        if col2.button("Verwijderen"):
+            opslag.verwijder_scenario(te_verwijderen)
+            st.rerun()
+
+st.markdown("### Scenario's")
+toon_scenarios(huidige_invoer)
+
+# Rapporten worden op de achtergrond gemaakt; de wachtrij wordt gedeeld door alle sessies, zodat
+# identieke aanvragen één keer gemaakt worden. Het aantal gelijktijdige rapporten is in te stellen
+# met CONFIGURATOR_RAPPORT_WERKERS.
+@st.cache_resource
+def laad_rapportwachtrij():
+    return Rapportwachtrij(max_workers=int(os.environ.get("CONFIGURATOR_RAPPORT_WERKERS", "2")))
+
+rapportwachtrij = laad_rapportwachtrij()
+
+# Voortgang, annuleren en download van het rapport waarvan de taak-id in st.session_state[sleutel] staat.
+# Zolang het rapport loopt wordt dit fragment elke seconde ververst; als het klaar is volgt één
+# volledige rerun die het verversen stopt. De wachtrij bewaart alleen de laatste afgeronde taken (van
+# alle sessies samen); is de taak van deze sessie daardoor vervallen, dan moet het rapport opnieuw.
+def toon_rapporttaak(sleutel, bestandsnaam):
+    taak_id = st.session_state.get(sleutel)
+    if not taak_id:
+        return
+    taak = rapportwachtrij.taak(taak_id)
+    if taak is None:
+        st.warning("Het rapport is verlopen, genereer het opnieuw.")
+        return
+    if taak.actief:
+        st.progress(taak.voortgang, text=f"Rapport wordt gemaakt: {taak.stap} ({taak.gedaan}/{taak.totaal})" if taak.totaal else taak.stap)
+        if st.button("Annuleren", key=f"{sleutel}_annuleren"):
+            rapportwachtrij.annuleer(taak.id)
+            st.session_state[sleutel] = None
+            st.rerun()
+        return
+    if st.session_state.get(f"{sleutel}_ververst"):
+        st.rerun()
+    if taak.status == "klaar":
+        st.download_button(label="Download PDF", data=taak.pdf, file_name=bestandsnaam, mime="application/pdf", key=f"{sleutel}_download")
+        toon_taakmetingen(sleutel, taak)
+    elif taak.status == "fout":
+        st.error(f"Het rapport kon niet gemaakt worden: {taak.fout}")
+    else:
+        st.info("Het rapport is geannuleerd.")
+
+# Metingen van het rapport zelf (alleen als de taak in debugmodus is ingediend)
+def toon_taakmetingen(sleutel, taak):
+    if taak.meter is None:
+        return
+    with st.expander("Prestaties rapport (debug)"):
+        st.caption(f"Gemeten fasen van het rapport, totaal {sum(m['duur'] for m in taak.meter.metingen if m['diepte'] == 0) * 1000:,.1f} ms")
+        st.dataframe(pd.DataFrame(taak.meter.samenvatting()), hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("Download metingen (JSON)", taak.meter.naar_json(), file_name="rapport_metingen.json", mime="application/json", key=f"{sleutel}_metingen")
+        col2.download_button("Download trace (chrome://tracing)", taak.meter.naar_trace_events(), file_name="rapport_trace.json", mime="application/json", key=f"{sleutel}_trace")
+
+def volg_rapporttaak(sleutel, bestandsnaam):
+    taak = rapportwachtrij.taak(st.session_state.get(sleutel))
+    st.session_state[f"{sleutel}_ververst"] = taak is not None and taak.actief
+    st.fragment(toon_rapporttaak, run_every=1 if st.session_state[f"{sleutel}_ververst"] else None)(sleutel, bestandsnaam)
+
+# De vorige aanvraag van deze sessie vervalt (bij dezelfde taak telt deze sessie zo maar één keer mee)
+def start_rapporttaak(sleutel, taak):
+    vorige_taak = st.session_state.get(sleutel)
+    if vorige_taak:
+        rapportwachtrij.annuleer(vorige_taak)
+    st.session_state[sleutel] = taak.id
 
 # Rapport genereren en download button
 if st.button("Genereer Rapport"):
-    pdf_content = genereer_rapport(aantal_installeurs, aantal_verkopers, fulltime_verkopers)
-    st.download_button(label="Download PDF", data=pdf_content, file_name="rapport.pdf", mime="application/pdf")
+    with meet("rapport indienen", "rapport"):
+        taak = rapportwachtrij.dien_in(df, st.session_state.specificaties, huidige_invoer["aantal_installeurs"], huidige_invoer["aantal_verkopers"], huidige_invoer["fulltime_verkopers"],
+                                       data_sleutel=st.session_state.data_sleutel, scenarios=st.session_state.get("scenario_vergelijking"))
+    start_rapporttaak("rapport_taak", taak)
+volg_rapporttaak("rapport_taak", "rapport.pdf")
+
+# Geconsolideerd rapport met een hoofdstuk per vestiging
+vestiging_parameters, vestiging_tabel, vestiging_sleutel = laad_vestigingen(opslag.revisie(), opslag)
+if not vestiging_tabel.empty:
+    if st.button("Genereer vestigingenrapport"):
+        with meet("rapport indienen", "rapport"):
+            taak = rapportwachtrij.dien_in_vestigingen(vestiging_tabel, vestiging_parameters, data_sleutel=vestiging_sleutel, standaardinvoer=huidige_invoer)
+        start_rapporttaak("vestigingsrapport_taak", taak)
+    volg_rapporttaak("vestigingsrapport_taak", "vestigingen.pdf")
+
+# Prestatiemetingen van deze run (alleen in debugmodus)
+if meter is not None:
+    meting.activeer(None)
+    meter.stop()
+    with st.expander("Prestaties (debug)"):
+        samenvatting = pd.DataFrame(meter.samenvatting())
+        st.caption(f"Gemeten fasen van deze run, totaal {sum(m['duur'] for m in meter.metingen if m['diepte'] == 0) * 1000:,.1f} ms")
+        st.dataframe(samenvatting, hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("Download metingen (JSON)", meter.naar_json(), file_name="metingen.json", mime="application/json")
+        col2.download_button("Download trace (chrome://tracing)", meter.naar_trace_events(), file_name="trace.json", mime="application/json")
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import seaborn as sns
+from PIL import Image
+
+from rapportcache import inhoud_sleutel
+
+# Grafieken voor het PDF-rapport. Matplotlib is niet thread-safe, daarom worden de grafieken
+# in losse processen gerenderd en als PNG-bytes teruggegeven; er komen geen tijdelijke bestanden aan te pas.
+# Rapporten kunnen in meerdere threads tegelijk gemaakt worden (rapportwachtrij): renderen in het eigen
+# proces en het aanmaken van de pool gebeuren daarom onder een lock.
+# De PNG's worden gerenderd met GRAFIEK_DPI (in te stellen met CONFIGURATOR_GRAFIEK_DPI) en opgeslagen
+# met een palet van GRAFIEK_KLEUREN kleuren zonder alfakanaal: grafieken hebben weinig kleuren, het
+# bestand wordt ongeveer half zo groot en fpdf hoeft geen transparantiemasker te maken. Het PNG wordt
+# met het standaard compressieniveau opgeslagen: optimize=True maakt het nog maar ~3% kleiner en kost per
+# grafiek ~15-20 ms extra (bijna 60% van het opslaan), bij elk koud gerenderd rapport opnieuw.
+
+# Verhoog bij wijzigingen aan de opmaak, zodat eerder gecachte grafieken niet meer gebruikt worden
+GRAFIEK_VERSIE = 2
+GRAFIEK_DPI = int(os.environ.get("CONFIGURATOR_GRAFIEK_DPI", "100"))
+GRAFIEK_KLEUREN = 256
+
+_pool = None
+_pool_grootte = None
+_pool_lock = threading.Lock()
+_render_lock = threading.Lock()
+
+
+def figuur_naar_png(fig, dpi=None):
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi or GRAFIEK_DPI)
+    plt.close(fig)
+    buffer.seek(0)
+    afbeelding = Image.open(buffer).convert("RGB").quantize(GRAFIEK_KLEUREN)
+    uitvoer = BytesIO()
+    afbeelding.save(uitvoer, format="png")
+    return uitvoer.getvalue()
+
+
+def render_financieel_overzicht(omzet, brutomarge, resultaat):
+    fig, ax = plt.subplots(figsize=(6, 3))
+    sns.barplot(x=["Omzet", "Marge", "Resultaat"], y=[omzet, brutomarge, resultaat], palette="viridis", ax=ax)
+    ax.set_ylim(0, 250000)
+    ax.set_ylabel("Bedrag in €")
+    ax.set_title("Financiële Overzicht")
+    fig.tight_layout()
+    return figuur_naar_png(fig)
+
+
+def render_trends(maanden, omzet, kosten, resultaat):
+    fig, ax = plt.subplots(figsize=(6, 3))
+    ax.plot(maanden, omzet, marker='o', label="Omzet", color='blue')
+    ax.plot(maanden, kosten, marker='o', label="Kosten", color='red')
+    ax.plot(maanden, resultaat, marker='o', label="Winst", color='green')
+    ax.set_ylabel("Bedrag in €")
+    ax.set_title("Trends en Verhoudingen")
+    ax.legend()
+    fig.tight_layout()
+    sns.despine()
+    return figuur_naar_png(fig)
+
+
+GRAFIEKEN = {
+    "financieel_overzicht": render_financieel_overzicht,
+    "trends": render_trends,
+}
+
+
+# Een opdracht is een tuple (soort, argumenten) met alleen picklebare, eenvoudige waarden
+def render_grafiek(opdracht):
+    soort, argumenten = opdracht
+    return GRAFIEKEN[soort](*argumenten)
+
+
+# Render in het eigen proces, één grafiek tegelijk over alle threads
+def _render_hier(opdracht):
+    with _render_lock:
+        return render_grafiek(opdracht)
+
+
+def _werkerpool(max_workers):
+    global _pool, _pool_grootte
+    with _pool_lock:
+        if _pool is None or _pool_grootte != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # "spawn" omdat de Streamlit-server zelf threads draait; de pool blijft bestaan tussen rapporten
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_grootte = max_workers
+        return _pool
+
+
+def grafiek_sleutel(opdracht):
+    soort, argumenten = opdracht
+    return inhoud_sleutel("grafiek", GRAFIEK_VERSIE, GRAFIEK_DPI, soort, argumenten)
+
+
+def _render(opdrachten, max_workers):
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers <= 1 or len(opdrachten) <= 1:
+        return map(_render_hier, opdrachten)
+    return _werkerpool(max_workers).map(render_grafiek, opdrachten)
+
+
+# Render alle opdrachten en lever de PNG-bytes in dezelfde volgorde op als de opdrachten.
+# Geeft een iterator, zodat de PDF-opbouw kan beginnen terwijl latere grafieken nog renderen.
+# Met een cache (rapportcache.InhoudCache) worden alleen de grafieken gerenderd die er nog niet in staan.
+def render_grafieken(opdrachten, max_workers=None, cache=None):
+    opdrachten = list(opdrachten)
+    if cache is None:
+        return _render(opdrachten, max_workers)
+
+    sleutels = [grafiek_sleutel(opdracht) for opdracht in opdrachten]
+    gevonden = [cache.get(sleutel) for sleutel in sleutels]
+    gerenderd = _render([opdracht for opdracht, png in zip(opdrachten, gevonden) if png is None], max_workers)
+
+    def in_volgorde():
+        for sleutel, png in zip(sleutels, gevonden):
+            if png is None:
+                png = next(gerenderd)
+                cache.put(sleutel, png)
+            yield png
+
+    return in_volgorde()
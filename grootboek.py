@@ -0,0 +1,221 @@
+import codecs
+import csv
+import io
+import itertools
+import json
+import os
+import re
+from collections import Counter
+from datetime import date, datetime
+
+from berekening import maandlabel
+
+# Import van grootboekexports (CSV of XLSX) naar specificaties en de kostenkolommen van de historie.
+# Regels worden één voor één gelezen en direct opgeteld, zodat het geheugengebruik alleen afhangt
+# van het aantal maanden en verschillende omschrijvingen, niet van de grootte van de export.
+
+STANDAARD_MAPPING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grootboek_mapping.json")
+
+DATUM_FORMATEN = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y%m%d", "%d.%m.%Y")
+
+
+def laad_mapping(pad=None):
+    with open(pad or STANDAARD_MAPPING, encoding="utf-8") as bestand:
+        return json.load(bestand)
+
+
+def maand_label(datum):
+    return maandlabel(datum.year * 12 + datum.month - 1)
+
+
+def _lees_datum(waarde):
+    if isinstance(waarde, (datetime, date)):
+        return waarde
+    waarde = str(waarde).strip()
+    for formaat in DATUM_FORMATEN:
+        try:
+            return datetime.strptime(waarde[:10], formaat)
+        except ValueError:
+            continue
+    raise ValueError(f"Onbekend datumformaat: {waarde!r}")
+
+
+# Geldige tekstbedragen per decimaalteken: het andere teken mag alleen duizendtallen scheiden. Zo wordt
+# een export met decimaalpunten bij decimaalteken "," geweigerd in plaats van 100x te groot ingelezen.
+_BEDRAGPATRONEN = {
+    ",": re.compile(r"[-+]?(\d+|\d{1,3}(\.\d{3})+)(,\d+)?"),
+    ".": re.compile(r"[-+]?(\d+|\d{1,3}(,\d{3})+)(\.\d+)?"),
+}
+
+
+def _lees_bedrag(waarde, decimaalteken):
+    if isinstance(waarde, (int, float)):
+        return float(waarde)
+    tekst = str(waarde).strip().replace("€", "").replace(" ", "")
+    if not _BEDRAGPATRONEN[decimaalteken].fullmatch(tekst):
+        raise ValueError(f"Bedrag {waarde!r} past niet bij decimaalteken {decimaalteken!r} uit de mapping")
+    if decimaalteken == ",":
+        tekst = tekst.replace(".", "").replace(",", ".")
+    else:
+        tekst = tekst.replace(",", "")
+    return float(tekst)
+
+
+def _csv_rijen(bron, scheidingsteken):
+    # bron is een pad of een (binair of tekst) bestandsobject, zoals een Streamlit-upload
+    if isinstance(bron, (str, os.PathLike)):
+        bestand = open(bron, newline="", encoding="utf-8-sig")
+    elif isinstance(bron, io.TextIOBase):
+        bestand = bron
+    else:
+        bestand = codecs.getreader("utf-8-sig")(bron)
+    try:
+        if scheidingsteken is None:
+            begin = bestand.read(4096)
+            scheidingsteken = csv.Sniffer().sniff(begin, delimiters=";,\t").delimiter
+            # Zet het al gelezen begin terug voor de rest van het bestand
+            rijen = csv.reader(itertools.chain(io.StringIO(begin + bestand.readline()), bestand), delimiter=scheidingsteken)
+        else:
+            rijen = csv.reader(bestand, delimiter=scheidingsteken)
+        yield from rijen
+    finally:
+        if isinstance(bron, (str, os.PathLike)):
+            bestand.close()
+
+
+def _xlsx_rijen(bron):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as fout:
+        raise ImportError("Voor het importeren van XLSX-bestanden is openpyxl nodig (pip install openpyxl)") from fout
+    werkmap = load_workbook(bron, read_only=True, data_only=True)
+    try:
+        yield from werkmap.active.iter_rows(values_only=True)
+    finally:
+        werkmap.close()
+
+
+def lees_grootboekregels(bron, mapping, soort=None):
+    if soort is None:
+        naam = bron if isinstance(bron, (str, os.PathLike)) else getattr(bron, "name", "")
+        soort = "xlsx" if str(naam).lower().endswith((".xlsx", ".xlsm")) else "csv"
+    return _xlsx_rijen(bron) if soort == "xlsx" else _csv_rijen(bron, mapping.get("scheidingsteken"))
+
+
+class _Regelkiezer:
+    # Koppelt een grootboekregel aan (categorie, kolom) volgens de eerste passende regel uit de mapping.
+    # Omschrijvingen en rekeningen herhalen zich sterk, dus de uitkomst wordt per combinatie onthouden.
+    def __init__(self, regels):
+        self._regels = [
+            (str(regel.get("rekening", "")), re.compile(regel["omschrijving"], re.IGNORECASE) if regel.get("omschrijving") else None, regel["categorie"], regel.get("kolom"))
+            for regel in regels
+        ]
+        self._gekozen = {}
+
+    def __call__(self, rekening, omschrijving):
+        sleutel = (rekening, omschrijving)
+        if sleutel not in self._gekozen:
+            self._gekozen[sleutel] = next(
+                (
+                    (categorie, kolom)
+                    for prefix, patroon, categorie, kolom in self._regels
+                    if rekening.startswith(prefix) and (patroon is None or patroon.search(omschrijving))
+                ),
+                None,
+            )
+        return self._gekozen[sleutel]
+
+
+# Lees een grootboekexport en tel de regels per maand op. Met maanden (bijv. {"mei-24"}) worden
+# alleen die maanden verwerkt, voor het opnieuw importeren van één maand.
+# Geeft (specificaties, kosten, verslag): specificaties in dezelfde opbouw als de bestaande
+# specificaties (categorietotaal gevolgd door de regels), kosten per maand per historische kolom.
+def importeer_grootboek(bron, mapping=None, maanden=None, soort=None):
+    if mapping is None:
+        mapping = laad_mapping()
+    kolomnamen = mapping.get("kolommen", {})
+    decimaalteken = mapping.get("decimaalteken", ",")
+    teken = mapping.get("teken", 1)
+    categorie_volgorde = list(dict.fromkeys(mapping.get("categorieen", []) + [regel["categorie"] for regel in mapping["regels"]]))
+    kies = _Regelkiezer(mapping["regels"])
+
+    rijen = lees_grootboekregels(bron, mapping, soort)
+    kop = next(rijen, None)
+    if kop is None:
+        raise ValueError("De grootboekexport is leeg")
+    kop = [str(naam).strip().lower() if naam is not None else "" for naam in kop]
+    try:
+        i_datum, i_omschrijving, i_bedrag = (kop.index(kolomnamen.get(veld, veld).lower()) for veld in ("datum", "omschrijving", "bedrag"))
+    except ValueError as fout:
+        raise ValueError(f"Kolom ontbreekt in de grootboekexport ({fout}); aanwezig: {kop}") from None
+    rekening_naam = kolomnamen.get("rekening", "rekening").lower()
+    i_rekening = kop.index(rekening_naam) if rekening_naam in kop else None
+
+    # Datums herhalen zich per boekingsdag; het omzetten naar een maandlabel wordt onthouden
+    maand_van = {}
+    regels = {}
+    kosten = {}
+    verslag = {"regels": 0, "overgeslagen": 0, "niet_gekoppeld": Counter()}
+
+    for rij in rijen:
+        if not rij or rij[i_datum] in (None, ""):
+            continue
+        ruwe_datum = rij[i_datum]
+        maand = maand_van.get(ruwe_datum)
+        if maand is None:
+            maand = maand_van[ruwe_datum] = maand_label(_lees_datum(ruwe_datum))
+        if maanden is not None and maand not in maanden:
+            continue
+        verslag["regels"] += 1
+
+        omschrijving = str(rij[i_omschrijving] or "").strip()
+        rekening = str(rij[i_rekening] or "").strip() if i_rekening is not None else ""
+        koppeling = kies(rekening, omschrijving)
+        if koppeling is None:
+            verslag["overgeslagen"] += 1
+            verslag["niet_gekoppeld"][omschrijving] += 1
+            continue
+        categorie, kolom = koppeling
+        bedrag = _lees_bedrag(rij[i_bedrag], decimaalteken) * teken
+
+        per_categorie = regels.setdefault(maand, {}).setdefault(categorie, {})
+        per_categorie[omschrijving] = per_categorie.get(omschrijving, 0.0) + bedrag
+        if kolom:
+            per_kolom = kosten.setdefault(maand, {})
+            per_kolom[kolom] = per_kolom.get(kolom, 0.0) + bedrag
+
+    specificaties = {}
+    for maand, per_categorie in regels.items():
+        specificatie = {}
+        for categorie in categorie_volgorde:
+            if categorie in per_categorie:
+                specificatie[categorie] = round(sum(per_categorie[categorie].values()), 2)
+                specificatie.update((omschrijving, round(bedrag, 2)) for omschrijving, bedrag in per_categorie[categorie].items())
+        specificaties[maand] = specificatie
+    kosten = {maand: {kolom: round(bedrag, 2) for kolom, bedrag in per_kolom.items()} for maand, per_kolom in kosten.items()}
+    return specificaties, kosten, verslag
+
+
+# Schrijf een import weg. Specificaties vervangen die van dezelfde maand; kostenkolommen van maanden
+# die al in de historie staan worden bijgewerkt en het resultaat schuift met het verschil mee.
+# De bedragen uit de export hebben (na "teken" uit de mapping) het teken van de oorspronkelijke
+# historie, kosten negatief; ze worden omgezet naar het kostenteken dat bij de maand is opgeslagen
+# (berekening.KOSTEN_NEGATIEF of KOSTEN_POSITIEF).
+# Maanden zonder omzetgegevens worden niet aan de historie toegevoegd (alleen hun specificaties).
+def verwerk_import(opslag, specificaties, kosten):
+    bijgewerkt, zonder_historie = [], []
+    for maand, specificatie in specificaties.items():
+        opslag.bewaar_specificatie(maand, specificatie)
+    for maand, nieuwe_kosten in kosten.items():
+        huidig = opslag.laad_maand(maand)
+        if huidig is None:
+            zonder_historie.append(maand)
+            continue
+        teken = huidig["kostenteken"]
+        waarden = {kolom: round(-teken * bedrag, 2) for kolom, bedrag in nieuwe_kosten.items() if kolom in opslag.kolommen}
+        verschil = sum(bedrag - (huidig[kolom] or 0) for kolom, bedrag in waarden.items())
+        if "resultaat" in huidig:
+            waarden["resultaat"] = round(huidig["resultaat"] - teken * verschil, 2)
+        opslag.werk_maand_bij(maand, waarden)
+        bijgewerkt.append(maand)
+    return bijgewerkt, zonder_historie
@@ -0,0 +1,258 @@
+import ast
+import copy
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Het rekenmodel als declaratieve graaf van regels (omzetstromen, personeel, vaste kosten,
+# afschrijvingen en totalen), ingelezen uit een JSON-bestand. Elke regel heeft een formule over
+# invoer (de schuifregelaars, tarieven als tarief_<naam>) en andere regels; som('soort') telt alle
+# regels van die soort op, in de volgorde van het bestand. Met CONFIGURATOR_KOSTENMODEL kan een
+# ander bestand gekozen worden. Invoer die niet van de schuifregelaars komt (bijv. het aantal en de
+# tarieven van een nieuwe productsoort) krijgt zijn waarde uit "standaardinvoer" in het bestand; de
+# kolommen van de historie en van bereken_scenario_kolommen blijven wel vast (zie berekening.py).
+#
+# Het model wordt op twee manieren doorgerekend:
+# - Kostenmodel.bereken rekent alles in één keer uit met een eenmalig gegenereerde functie, met
+#   NumPy-arrays als invoer ook voor veel scenario's tegelijk (zo rekent berekening.py);
+# - een Evaluator onthoudt de vorige uitkomsten en rekent na gewijzigde invoer alleen de regels
+#   opnieuw uit die daarvan afhangen (voor interactief gebruik).
+# De formules volgen de volgorde van de bewerkingen in de oorspronkelijke code, zodat de uitkomsten
+# tot op de laatste bit gelijk blijven.
+
+STANDAARD_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kostenmodel.json")
+
+FUNCTIES = {"min": np.minimum, "max": np.maximum}
+_NAAMRUIMTE = {"__builtins__": {}, **{f"_{naam}": functie for naam, functie in FUNCTIES.items()}}
+
+_TOEGESTAAN = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd,
+)
+
+
+def laad_model(pad=None):
+    with open(pad or STANDAARD_MODEL, encoding="utf-8") as bestand:
+        return Kostenmodel(json.load(bestand))
+
+
+_standaard_model = None
+
+# Het model uit kostenmodel.json (of CONFIGURATOR_KOSTENMODEL), één keer ingelezen per proces
+def standaard_model():
+    global _standaard_model
+    if _standaard_model is None:
+        _standaard_model = laad_model(os.environ.get("CONFIGURATOR_KOSTENMODEL"))
+    return _standaard_model
+
+
+# Herschrijft een formule: som('soort') wordt een optelling van de regels van die soort,
+# min/max worden NumPy-functies die ook met arrays werken
+class _Herschrijver(ast.NodeTransformer):
+    def __init__(self, per_soort):
+        self.per_soort = per_soort
+
+    def visit_Call(self, knoop):
+        if not isinstance(knoop.func, ast.Name) or knoop.keywords:
+            raise ValueError("alleen som('soort'), min(...) en max(...) zijn toegestaan")
+        naam = knoop.func.id
+        if naam == "som":
+            if len(knoop.args) != 1 or not isinstance(knoop.args[0], ast.Constant) or not isinstance(knoop.args[0].value, str):
+                raise ValueError("som verwacht één soort, bijv. som('personeel')")
+            regels = self.per_soort.get(knoop.args[0].value, [])
+            if not regels:
+                return ast.Constant(0.0)
+            uitkomst = ast.Name(regels[0], ast.Load())
+            for regel in regels[1:]:
+                uitkomst = ast.BinOp(uitkomst, ast.Add(), ast.Name(regel, ast.Load()))
+            return uitkomst
+        if naam in FUNCTIES:
+            knoop.args = [self.visit(argument) for argument in knoop.args]
+            knoop.func = ast.Name(f"_{naam}", ast.Load())
+            return knoop
+        raise ValueError(f"onbekende functie {naam}")
+
+
+def _namen(boom):
+    return {knoop.id for knoop in ast.walk(boom) if isinstance(knoop, ast.Name) and not knoop.id.startswith("_")}
+
+
+# Voor de gegenereerde functie: elke naam wordt een opzoeking in de werkruimte _w
+class _NaarWerkruimte(ast.NodeTransformer):
+    def visit_Name(self, knoop):
+        if knoop.id.startswith("_"):
+            return knoop
+        return ast.Subscript(ast.Name("_w", ast.Load()), ast.Constant(knoop.id), ast.Load())
+
+
+class Regel:
+    def __init__(self, naam, soort, omschrijving, boom):
+        self.naam = naam
+        self.soort = soort
+        self.omschrijving = omschrijving
+        self.afhankelijk_van = _namen(boom)
+        self.code = compile(boom, f"<regel {naam}>", "eval")
+        self.bron = ast.unparse(_NaarWerkruimte().visit(copy.deepcopy(boom)).body)
+
+
+class Kostenmodel:
+    def __init__(self, definitie):
+        regels = definitie["regels"]
+        # Verandert met elke wijziging aan het model; voor caches van uitkomsten
+        self.vingerafdruk = hashlib.sha256(json.dumps(definitie, sort_keys=True).encode("utf-8")).hexdigest()
+        self.standaardinvoer = dict(definitie.get("standaardinvoer", {}))
+        namen = [regel["naam"] for regel in regels]
+        dubbel = {naam for naam in namen if namen.count(naam) > 1}
+        if dubbel:
+            raise ValueError(f"Dubbele regels in kostenmodel: {', '.join(sorted(dubbel))}")
+        per_soort = {}
+        for regel in regels:
+            per_soort.setdefault(regel.get("soort", ""), []).append(regel["naam"])
+
+        self.regels = {}
+        for regel in regels:
+            naam = regel["naam"]
+            try:
+                boom = ast.parse(str(regel["formule"]), mode="eval")
+                for knoop in ast.walk(boom):
+                    if not isinstance(knoop, _TOEGESTAAN) or (isinstance(knoop, ast.Constant) and not isinstance(knoop.value, (int, float, str))):
+                        raise ValueError(f"{type(knoop).__name__} is niet toegestaan")
+                boom = ast.fix_missing_locations(_Herschrijver(per_soort).visit(boom))
+            except (SyntaxError, ValueError) as fout:
+                raise ValueError(f"Ongeldige formule voor {naam}: {fout}") from None
+            self.regels[naam] = Regel(naam, regel.get("soort", ""), regel.get("omschrijving", naam), boom)
+
+        self.volgorde = self._sorteer()
+        self.invoer = sorted({afhankelijk for regel in self.regels.values() for afhankelijk in regel.afhankelijk_van} - set(self.regels))
+        self._positie = {naam: index for index, naam in enumerate(self.volgorde)}
+
+        # Per invoer en per regel alle regels die er (direct of indirect) van afhangen
+        afnemers = {}
+        for regel in self.regels.values():
+            for afhankelijk in regel.afhankelijk_van:
+                afnemers.setdefault(afhankelijk, set()).add(regel.naam)
+        self._stroomafwaarts = {}
+        for naam in list(reversed(self.volgorde)) + self.invoer:
+            geraakt = set()
+            for afnemer in afnemers.get(naam, ()):
+                geraakt |= {afnemer} | self._stroomafwaarts[afnemer]
+            self._stroomafwaarts[naam] = geraakt
+
+        self._bereken = self._genereer()
+
+    # Topologische volgorde; een kring in de regels is een fout in het model
+    def _sorteer(self):
+        volgorde, bezig, klaar = [], set(), set()
+
+        def bezoek(naam, pad):
+            if naam in klaar or naam not in self.regels:
+                return
+            if naam in bezig:
+                raise ValueError(f"Kring in kostenmodel: {' -> '.join(pad + [naam])}")
+            bezig.add(naam)
+            for afhankelijk in sorted(self.regels[naam].afhankelijk_van):
+                bezoek(afhankelijk, pad + [naam])
+            bezig.discard(naam)
+            klaar.add(naam)
+            volgorde.append(naam)
+
+        for naam in self.regels:
+            bezoek(naam, [])
+        return volgorde
+
+    # Eén functie met alle regels in volgorde, als Python-code gegenereerd en één keer gecompileerd.
+    # Een regel die al in de invoer staat wordt niet berekend (zo geeft de prognose een eigen
+    # afschrijvingsschema mee).
+    def _genereer(self):
+        regels = ["def bereken(_w):"]
+        for naam in self.volgorde:
+            regels.append(f"    if {naam!r} not in _w:")
+            regels.append(f"        _w[{naam!r}] = {self.regels[naam].bron}")
+        regels.append("    return _w")
+        naamruimte = dict(_NAAMRUIMTE)
+        exec(compile("\n".join(regels), "<kostenmodel>", "exec"), naamruimte)
+        return naamruimte["bereken"]
+
+    # Invoer met de tarieven als tarief_<naam> en de standaardinvoer voor wat niet is meegegeven
+    def _invoer(self, tarieven, invoer):
+        if tarieven is not None:
+            for naam, waarde in tarieven.items():
+                invoer[f"tarief_{naam}"] = waarde
+        for naam, waarde in self.standaardinvoer.items():
+            invoer.setdefault(naam, waarde)
+        return invoer
+
+    def _controleer(self, waarden):
+        ontbrekend = [naam for naam in self.invoer if naam not in waarden]
+        if ontbrekend:
+            raise ValueError(f"Invoer ontbreekt voor het kostenmodel: {', '.join(ontbrekend)}")
+
+    # Reken alle regels uit; geeft een dict met de invoer en de uitkomst van elke regel
+    def bereken(self, tarieven=None, **invoer):
+        waarden = self._invoer(tarieven, invoer)
+        try:
+            return self._bereken(waarden)
+        except KeyError:
+            self._controleer(waarden)
+            raise
+
+    def stroomafwaarts(self, namen):
+        geraakt = set()
+        for naam in namen:
+            geraakt |= self._stroomafwaarts.get(naam, set())
+        return sorted(geraakt, key=self._positie.__getitem__)
+
+    def evaluator(self):
+        return Evaluator(self)
+
+
+_ONBEKEND = object()
+
+
+def _gelijk(oud, nieuw):
+    if oud is _ONBEKEND:
+        return False
+    if isinstance(oud, np.ndarray) or isinstance(nieuw, np.ndarray):
+        return np.shape(oud) == np.shape(nieuw) and bool(np.all(oud == nieuw))
+    return oud == nieuw
+
+
+class Evaluator:
+    # Houdt de uitkomsten van alle regels bij. zet() rekent alleen de regels opnieuw uit die afhangen
+    # van invoer die echt veranderd is en geeft het aantal opnieuw berekende regels terug.
+    # Zoals bereken_scenario_kolommen rekent de evaluator met NumPy-getallen: een marge of aantal van 0
+    # geeft inf/nan in plaats van een ZeroDivisionError. De uitkomsten worden pas vervangen als alle
+    # regels berekend zijn, zodat een fout geen half bijgewerkte stand achterlaat.
+    def __init__(self, model):
+        self.model = model
+        self.waarden = {}
+        self.herberekend = 0
+
+    def zet(self, tarieven=None, **invoer):
+        invoer = {naam: np.asarray(waarde, dtype=float)[()] for naam, waarde in self.model._invoer(tarieven, invoer).items()}
+        if self.waarden:
+            gewijzigd = [naam for naam, waarde in invoer.items() if not _gelijk(self.waarden.get(naam, _ONBEKEND), waarde)]
+            te_berekenen = self.model.stroomafwaarts(gewijzigd)
+        else:
+            self.model._controleer(invoer)
+            te_berekenen = self.model.volgorde
+        waarden = dict(self.waarden)
+        waarden.update(invoer)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for naam in te_berekenen:
+                waarden[naam] = eval(self.model.regels[naam].code, _NAAMRUIMTE, waarden)
+        self.waarden = waarden
+        self.herberekend = len(te_berekenen)
+        return self.herberekend
+
+    def __getitem__(self, naam):
+        return self.waarden[naam]
+
+    # De regels met omschrijving en bedrag, in de volgorde van het model
+    def regeltabel(self):
+        return [
+            {"soort": regel.soort, "regel": regel.naam, "omschrijving": regel.omschrijving, "bedrag": self.waarden.get(regel.naam)}
+            for regel in self.model.regels.values()
+        ]
@@ -0,0 +1,151 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+
+# Lichtgewicht instrumentatie van de hoofdfasen (data laden, berekeningen, grafieken, rapporthoofdstukken).
+# Code markeert een fase met `with meting.meet("naam"):`. Zonder actieve Meter geeft meet een lege
+# contextmanager terug, zodat de instrumentatie uitgeschakeld vrijwel niets kost.
+
+_actief = contextvars.ContextVar("meting_meter", default=None)
+_UIT = contextlib.nullcontext()
+
+
+def meet(naam, categorie="app"):
+    meter = _actief.get()
+    if meter is None:
+        return _UIT
+    return meter.meet(naam, categorie)
+
+
+# Maak een meter actief voor de huidige thread/context (None schakelt de instrumentatie uit).
+# Geeft een token terug voor deactiveer, voor code die de vorige meter wil herstellen.
+def activeer(meter):
+    return _actief.set(meter)
+
+
+def deactiveer(token):
+    _actief.reset(token)
+
+
+def actieve_meter():
+    return _actief.get()
+
+
+class Meter:
+    # Verzamelt per fase de duur en, met geheugen=True, de netto en piek-allocaties via tracemalloc.
+    # Als contextmanager (`with Meter() as meter:`) is de meter actief binnen het blok.
+    def __init__(self, geheugen=False):
+        self.geheugen = geheugen
+        self.metingen = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._lokaal = threading.local()
+        self._token = None
+        # Een meter die tracemalloc zelf start, stopt het ook weer: met stop() of anders zodra de meter
+        # wordt opgeruimd (bijvoorbeeld een Streamlit-sessie die sluit midden in een run)
+        self._tracemalloc_stop = None
+        if geheugen and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_stop = weakref.finalize(self, tracemalloc.stop)
+
+    def __enter__(self):
+        self._token = activeer(self)
+        return self
+
+    def __exit__(self, *fout):
+        deactiveer(self._token)
+        self.stop()
+
+    def stop(self):
+        if self._tracemalloc_stop is not None:
+            self._tracemalloc_stop()
+
+    def _stapel(self):
+        stapel = getattr(self._lokaal, "stapel", None)
+        if stapel is None:
+            stapel = self._lokaal.stapel = []
+        return stapel
+
+    @contextlib.contextmanager
+    def meet(self, naam, categorie="app"):
+        stapel = self._stapel()
+        geheugen = self.geheugen and tracemalloc.is_tracing()
+        if geheugen:
+            # De piek sinds de vorige reset hoort bij de omringende fase; daarna telt de piek voor deze fase
+            huidig, piek = tracemalloc.get_traced_memory()
+            if stapel:
+                stapel[-1][1] = max(stapel[-1][1], piek)
+            tracemalloc.reset_peak()
+            begin_geheugen = huidig
+        fase = [naam, 0]
+        stapel.append(fase)
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            duur = time.perf_counter() - begin
+            stapel.pop()
+            meting = {
+                "naam": naam,
+                "categorie": categorie,
+                "begin": begin - self._start,
+                "duur": duur,
+                "diepte": len(stapel),
+                "thread": threading.get_ident(),
+            }
+            if geheugen:
+                huidig, piek = tracemalloc.get_traced_memory()
+                piek = max(fase[1], piek)
+                meting["geheugen_netto"] = huidig - begin_geheugen
+                meting["geheugen_piek"] = piek - begin_geheugen
+                if stapel:
+                    stapel[-1][1] = max(stapel[-1][1], piek)
+                tracemalloc.reset_peak()
+            with self._lock:
+                self.metingen.append(meting)
+
+    # Totalen per fase, de langzaamste eerst
+    def samenvatting(self):
+        per_naam = {}
+        with self._lock:
+            metingen = list(self.metingen)
+        for meting in metingen:
+            regel = per_naam.setdefault(meting["naam"], {"naam": meting["naam"], "categorie": meting["categorie"], "aantal": 0, "totaal_ms": 0.0, "max_ms": 0.0})
+            regel["aantal"] += 1
+            regel["totaal_ms"] += meting["duur"] * 1000
+            regel["max_ms"] = max(regel["max_ms"], meting["duur"] * 1000)
+            if "geheugen_piek" in meting:
+                regel["geheugen_piek_kb"] = max(regel.get("geheugen_piek_kb", 0.0), meting["geheugen_piek"] / 1024)
+                regel["geheugen_netto_kb"] = regel.get("geheugen_netto_kb", 0.0) + meting["geheugen_netto"] / 1024
+        return sorted(per_naam.values(), key=lambda regel: regel["totaal_ms"], reverse=True)
+
+    def naar_json(self):
+        with self._lock:
+            metingen = list(self.metingen)
+        return json.dumps({"metingen": metingen, "samenvatting": self.samenvatting()}, ensure_ascii=False, indent=2)
+
+    # Trace Event Format, te openen in chrome://tracing of https://ui.perfetto.dev
+    def naar_trace_events(self):
+        with self._lock:
+            metingen = list(self.metingen)
+        pid = os.getpid()
+        gebeurtenissen = []
+        for meting in metingen:
+            gebeurtenis = {
+                "name": meting["naam"],
+                "cat": meting["categorie"],
+                "ph": "X",
+                "ts": round(meting["begin"] * 1_000_000, 3),
+                "dur": round(meting["duur"] * 1_000_000, 3),
+                "pid": pid,
+                "tid": meting["thread"],
+            }
+            if "geheugen_piek" in meting:
+                gebeurtenis["args"] = {"geheugen_netto": meting["geheugen_netto"], "geheugen_piek": meting["geheugen_piek"]}
+            gebeurtenissen.append(gebeurtenis)
+        return json.dumps({"traceEvents": gebeurtenissen, "displayTimeUnit": "ms"}, ensure_ascii=False)
@@ -0,0 +1,293 @@
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+import pandas as pd
+
+from berekening import KOSTEN_NEGATIEF
+
+# Lokale opslag van de maandgegevens en specificaties in SQLite. Nieuwe maanden worden
+# toegevoegd in plaats van dat alles opnieuw geschreven wordt, en specificaties worden
+# pas per maand ingelezen als ze nodig zijn. Vestigingen hebben hun eigen parameters en een
+# historie met dezelfde kolommen, met (vestiging, maand) als sleutel. Scenario's zijn benoemde sets
+# invoerparameters met hun (onthouden) uitkomsten.
+# Elke maand in de historie heeft een kostenteken (berekening.KOSTEN_NEGATIEF of KOSTEN_POSITIEF) dat
+# bij het toevoegen wordt vastgelegd; het hoort niet bij de kolommen van de historie zelf.
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _kolomlijst(kolommen):
+    return ", ".join(f'"{kolom}"' for kolom in kolommen)
+
+
+def _sql_waarde(waarde):
+    # NumPy-getallen (bijv. uit een DataFrame) naar gewone Python-waarden voor sqlite3
+    return waarde.item() if hasattr(waarde, "item") else waarde
+
+
+class Opslag:
+    def __init__(self, pad):
+        self.pad = pad
+        # Streamlit bedient sessies vanuit meerdere threads; één verbinding met een lock volstaat
+        self._verbinding = sqlite3.connect(pad, check_same_thread=False)
+        self._verbinding.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self.kolommen = []
+
+    # Maak de tabellen aan op basis van de startgegevens en vul een lege database met die gegevens
+    def initialiseer(self, startdata, startspecificaties):
+        with self._lock, self._verbinding:
+            kolom_definities = ", ".join(f'"{kolom}" {_sql_type(dtype)}' for kolom, dtype in startdata.dtypes.items())
+            self._verbinding.execute(
+                f"CREATE TABLE IF NOT EXISTS maanden (volgnummer INTEGER PRIMARY KEY AUTOINCREMENT, {kolom_definities}, kostenteken INTEGER NOT NULL)"
+            )
+            kolommen = [rij[1] for rij in self._verbinding.execute("PRAGMA table_info(maanden)")]
+            if "kostenteken" not in kolommen:
+                # Databases van voor het kostenteken: de personeelskosten zijn in de oorspronkelijke historie
+                # altijd negatief en in maanden uit bereken_gegevens altijd positief
+                self._verbinding.execute("ALTER TABLE maanden ADD COLUMN kostenteken INTEGER")
+                self._verbinding.execute(f"UPDATE maanden SET kostenteken = CASE WHEN personeelskosten > 0 THEN 1 ELSE {KOSTEN_NEGATIEF} END")
+            self._verbinding.execute(
+                "CREATE TABLE IF NOT EXISTS specificaties ("
+                "maand TEXT NOT NULL, volgorde INTEGER NOT NULL, omschrijving TEXT NOT NULL, bedrag REAL NOT NULL, "
+                "PRIMARY KEY (maand, volgorde))"
+            )
+            self._verbinding.execute(
+                "CREATE TABLE IF NOT EXISTS specificatie_maanden (volgnummer INTEGER PRIMARY KEY AUTOINCREMENT, maand TEXT NOT NULL UNIQUE)"
+            )
+            vestiging_kolommen = ", ".join(f'"{kolom}" {_sql_type(dtype)}' for kolom, dtype in startdata.dtypes.items() if kolom != "maand")
+            self._verbinding.execute(
+                "CREATE TABLE IF NOT EXISTS vestigingen (volgnummer INTEGER PRIMARY KEY AUTOINCREMENT, naam TEXT NOT NULL UNIQUE, parameters TEXT NOT NULL)"
+            )
+            self._verbinding.execute(
+                f"CREATE TABLE IF NOT EXISTS vestiging_maanden (vestiging TEXT NOT NULL, maand TEXT NOT NULL, {vestiging_kolommen}, "
+                "PRIMARY KEY (vestiging, maand)) WITHOUT ROWID"
+            )
+            self._verbinding.execute(
+                "CREATE TABLE IF NOT EXISTS scenarios (volgnummer INTEGER PRIMARY KEY AUTOINCREMENT, naam TEXT NOT NULL UNIQUE, "
+                "parameters TEXT NOT NULL, rekensleutel TEXT, resultaat BLOB)"
+            )
+            self._verbinding.execute("CREATE TABLE IF NOT EXISTS revisie (id INTEGER PRIMARY KEY CHECK (id = 1), nummer INTEGER NOT NULL)")
+            self._verbinding.execute("INSERT OR IGNORE INTO revisie (id, nummer) VALUES (1, 0)")
+            self.kolommen = [kolom for kolom in kolommen if kolom not in ("volgnummer", "kostenteken")]
+            leeg = self._verbinding.execute("SELECT NOT EXISTS (SELECT 1 FROM maanden)").fetchone()[0]
+        if leeg:
+            self.voeg_maanden_toe(startdata.to_dict("records"), KOSTEN_NEGATIEF)
+            for maand, specificatie in startspecificaties.items():
+                self.bewaar_specificatie(maand, specificatie)
+
+    # Verandert bij elke wijziging; geschikt als cachesleutel zonder de gegevens zelf te lezen
+    def revisie(self):
+        with self._lock:
+            return self.pad, self._verbinding.execute("SELECT nummer FROM revisie").fetchone()[0]
+
+    def _verhoog_revisie(self):
+        self._verbinding.execute("UPDATE revisie SET nummer = nummer + 1")
+
+    def laad_data(self):
+        with self._lock:
+            return pd.read_sql_query(f"SELECT {_kolomlijst(self.kolommen)} FROM maanden ORDER BY volgnummer", self._verbinding)
+
+    def voeg_maand_toe(self, rij, kostenteken):
+        self.voeg_maanden_toe([rij], kostenteken)
+
+    # kostenteken geldt voor alle rijen: KOSTEN_NEGATIEF of KOSTEN_POSITIEF uit berekening
+    def voeg_maanden_toe(self, rijen, kostenteken):
+        rijen = list(rijen)
+        if not rijen:
+            return
+        kolommen = [kolom for kolom in self.kolommen if kolom in rijen[0]]
+        with self._lock, self._verbinding:
+            self._verbinding.executemany(
+                f"INSERT INTO maanden ({_kolomlijst(kolommen)}, kostenteken) VALUES ({', '.join('?' * (len(kolommen) + 1))})",
+                [[_sql_waarde(rij[kolom]) for kolom in kolommen] + [kostenteken] for rij in rijen],
+            )
+            self._verhoog_revisie()
+
+    # De kolommen van een maand plus zijn "kostenteken" (bij dubbele maanden de laatst ingevoerde)
+    def laad_maand(self, maand):
+        kolommen = self.kolommen + ["kostenteken"]
+        with self._lock:
+            rij = self._verbinding.execute(
+                f"SELECT {_kolomlijst(kolommen)} FROM maanden WHERE maand = ? ORDER BY volgnummer DESC LIMIT 1", (maand,)
+            ).fetchone()
+        return None if rij is None else dict(zip(kolommen, rij))
+
+    # Werk enkele kolommen van een bestaande maand bij (bij dubbele maanden de laatst ingevoerde)
+    def werk_maand_bij(self, maand, waarden):
+        kolommen = [kolom for kolom in waarden if kolom in self.kolommen]
+        toewijzingen = ", ".join(f'"{kolom}" = ?' for kolom in kolommen)
+        with self._lock, self._verbinding:
+            self._verbinding.execute(
+                f"UPDATE maanden SET {toewijzingen} "
+                "WHERE volgnummer = (SELECT MAX(volgnummer) FROM maanden WHERE maand = ?)",
+                [_sql_waarde(waarden[kolom]) for kolom in kolommen] + [maand],
+            )
+            self._verhoog_revisie()
+
+    def maanden_met_specificatie(self):
+        with self._lock:
+            return [rij[0] for rij in self._verbinding.execute("SELECT maand FROM specificatie_maanden ORDER BY volgnummer")]
+
+    def laad_specificatie(self, maand):
+        with self._lock:
+            rijen = self._verbinding.execute(
+                "SELECT omschrijving, bedrag FROM specificaties WHERE maand = ? ORDER BY volgorde", (maand,)
+            ).fetchall()
+        return dict(rijen)
+
+    # Vervangt de specificatie van één maand; de volgorde van de regels blijft behouden
+    def bewaar_specificatie(self, maand, specificatie):
+        with self._lock, self._verbinding:
+            self._verbinding.execute("INSERT OR IGNORE INTO specificatie_maanden (maand) VALUES (?)", (maand,))
+            self._verbinding.execute("DELETE FROM specificaties WHERE maand = ?", (maand,))
+            self._verbinding.executemany(
+                "INSERT INTO specificaties (maand, volgorde, omschrijving, bedrag) VALUES (?, ?, ?, ?)",
+                [(maand, volgorde, omschrijving, _sql_waarde(bedrag)) for volgorde, (omschrijving, bedrag) in enumerate(specificatie.items())],
+            )
+            self._verhoog_revisie()
+
+    def verwijder_specificatie(self, maand):
+        with self._lock, self._verbinding:
+            self._verbinding.execute("DELETE FROM specificaties WHERE maand = ?", (maand,))
+            self._verbinding.execute("DELETE FROM specificatie_maanden WHERE maand = ?", (maand,))
+            self._verhoog_revisie()
+
+    # Vestigingen in volgorde van aanmaken, met hun parameters (invoer zoals bij bereken_gegevens)
+    def vestigingen(self):
+        with self._lock:
+            rijen = self._verbinding.execute("SELECT naam, parameters FROM vestigingen ORDER BY volgnummer").fetchall()
+        return {naam: json.loads(parameters) for naam, parameters in rijen}
+
+    def bewaar_vestiging(self, naam, parameters):
+        with self._lock, self._verbinding:
+            self._verbinding.execute(
+                "INSERT INTO vestigingen (naam, parameters) VALUES (?, ?) ON CONFLICT (naam) DO UPDATE SET parameters = excluded.parameters",
+                (naam, json.dumps({sleutel: _sql_waarde(waarde) for sleutel, waarde in parameters.items()})),
+            )
+            self._verhoog_revisie()
+
+    def verwijder_vestiging(self, naam):
+        with self._lock, self._verbinding:
+            self._verbinding.execute("DELETE FROM vestiging_maanden WHERE vestiging = ?", (naam,))
+            self._verbinding.execute("DELETE FROM vestigingen WHERE naam = ?", (naam,))
+            self._verhoog_revisie()
+
+    # Een nieuwe naam voor een vestiging, met haar parameters en historie
+    def hernoem_vestiging(self, naam, nieuwe_naam):
+        with self._lock, self._verbinding:
+            self._verbinding.execute("UPDATE vestigingen SET naam = ? WHERE naam = ?", (nieuwe_naam, naam))
+            self._verbinding.execute("UPDATE vestiging_maanden SET vestiging = ? WHERE vestiging = ?", (nieuwe_naam, naam))
+            self._verhoog_revisie()
+
+    # Rijen met "vestiging", "maand" en de historiekolommen; een bestaande maand van een vestiging wordt
+    # vervangen. Onbekende vestigingen worden aangemaakt zonder eigen parameters.
+    def bewaar_vestiging_maanden(self, rijen):
+        rijen = list(rijen)
+        if not rijen:
+            return
+        kolommen = ["vestiging"] + [kolom for kolom in self.kolommen if kolom in rijen[0]]
+        with self._lock, self._verbinding:
+            self._verbinding.executemany(
+                "INSERT OR IGNORE INTO vestigingen (naam, parameters) VALUES (?, '{}')",
+                [(naam,) for naam in dict.fromkeys(str(rij["vestiging"]) for rij in rijen)],
+            )
+            self._verbinding.executemany(
+                f"INSERT OR REPLACE INTO vestiging_maanden ({_kolomlijst(kolommen)}) VALUES ({', '.join('?' * len(kolommen))})",
+                [[str(rij["vestiging"])] + [_sql_waarde(rij[kolom]) for kolom in kolommen[1:]] for rij in rijen],
+            )
+            self._verhoog_revisie()
+
+    # De historie van alle vestigingen als één lange tabel (vestiging, maand, kolommen...)
+    def laad_vestiging_data(self):
+        kolommen = ", ".join(f'm."{kolom}"' for kolom in self.kolommen)
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT m.vestiging, {kolommen} "
+                "FROM vestiging_maanden AS m JOIN vestigingen AS v ON v.naam = m.vestiging ORDER BY v.volgnummer",
+                self._verbinding,
+            )
+
+    # Scenario's in volgorde van aanmaken, met hun parameters (invoer zoals bij bereken_gegevens)
+    def scenarios(self):
+        with self._lock:
+            rijen = self._verbinding.execute("SELECT naam, parameters FROM scenarios ORDER BY volgnummer").fetchall()
+        return {naam: json.loads(parameters) for naam, parameters in rijen}
+
+    # Nieuwe of gewijzigde parameters; een eerder onthouden uitkomst vervalt
+    def bewaar_scenario(self, naam, parameters):
+        with self._lock, self._verbinding:
+            self._verbinding.execute(
+                "INSERT INTO scenarios (naam, parameters) VALUES (?, ?) "
+                "ON CONFLICT (naam) DO UPDATE SET parameters = excluded.parameters, rekensleutel = NULL, resultaat = NULL",
+                (naam, json.dumps({sleutel: _sql_waarde(waarde) for sleutel, waarde in parameters.items()})),
+            )
+            self._verhoog_revisie()
+
+    def verwijder_scenario(self, naam):
+        with self._lock, self._verbinding:
+            self._verbinding.execute("DELETE FROM scenarios WHERE naam = ?", (naam,))
+            self._verhoog_revisie()
+
+    # Onthouden uitkomsten: per scenario (rekensleutel, bytes), alleen voor scenario's met een uitkomst
+    def laad_scenario_resultaten(self):
+        with self._lock:
+            rijen = self._verbinding.execute("SELECT naam, rekensleutel, resultaat FROM scenarios WHERE resultaat IS NOT NULL").fetchall()
+        return {naam: (rekensleutel, resultaat) for naam, rekensleutel, resultaat in rijen}
+
+    # Uitkomsten zijn afgeleid van de parameters en verhogen de revisie niet
+    def bewaar_scenario_resultaten(self, resultaten):
+        with self._lock, self._verbinding:
+            self._verbinding.executemany(
+                "UPDATE scenarios SET rekensleutel = ?, resultaat = ? WHERE naam = ?",
+                [(rekensleutel, resultaat, naam) for naam, (rekensleutel, resultaat) in resultaten.items()],
+            )
+
+
+# Gedraagt zich als de oorspronkelijke specificaties-dict, maar leest een maand pas in
+# wanneer die wordt opgevraagd en schrijft wijzigingen direct naar de opslag
+class Specificaties(MutableMapping):
+    def __init__(self, opslag):
+        self._opslag = opslag
+        self._maanden = opslag.maanden_met_specificatie()
+        self._bekend = set(self._maanden)
+        self._geladen = {}
+
+    def __getitem__(self, maand):
+        if maand not in self._geladen:
+            if maand not in self._bekend:
+                raise KeyError(maand)
+            self._geladen[maand] = self._opslag.laad_specificatie(maand)
+        return self._geladen[maand]
+
+    def __setitem__(self, maand, specificatie):
+        self._opslag.bewaar_specificatie(maand, specificatie)
+        if maand not in self._bekend:
+            self._maanden.append(maand)
+            self._bekend.add(maand)
+        self._geladen[maand] = dict(specificatie)
+
+    def __delitem__(self, maand):
+        if maand not in self._bekend:
+            raise KeyError(maand)
+        self._opslag.verwijder_specificatie(maand)
+        self._maanden.remove(maand)
+        self._bekend.discard(maand)
+        self._geladen.pop(maand, None)
+
+    def __contains__(self, maand):
+        return maand in self._bekend
+
+    def __iter__(self):
+        return iter(list(self._maanden))
+
+    def __len__(self):
+        return len(self._maanden)
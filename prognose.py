@@ -0,0 +1,115 @@
+import numpy as np
+
+from berekening import SCENARIO_PARAMETERS, bereken_scenario_kolommen, maand_labels, maandnummer
+
+# Meerjarenprognose: bereken_scenario_kolommen over 12 tot 60 maanden vooruit, met groei van de volumes,
+# wijzigingen in de bezetting vanaf een bepaalde maand en afschrijvingsschema's per activum.
+# Alle reeksen hebben de maanden als laatste as, zodat een prognose van vijf jaar voor veel
+# scenario's tegelijk als arrays wordt doorgerekend, zonder Python-lus per maand.
+
+# Activaregister, afgeleid van de afschrijvingen in de specificaties van apr-24 t/m jun-24.
+# Bedragen zijn positief, de looptijd is in maanden. Lineair schrijft elke maand hetzelfde bedrag af,
+# degressief elke maand een vast percentage van de boekwaarde (het restant in de laatste maand).
+STANDAARD_ACTIVA = [
+    {"omschrijving": "Service auto", "aanschafwaarde": 48000.0, "restwaarde": 0.0, "aanschafmaand": "apr-24", "looptijd": 24, "methode": "lineair"},
+    {"omschrijving": "Combo", "aanschafwaarde": 4400.0, "restwaarde": 0.0, "aanschafmaand": "apr-24", "looptijd": 60, "methode": "degressief", "percentage": 20.0},
+    {"omschrijving": "Demo-unit", "aanschafwaarde": 18000.0, "restwaarde": 0.0, "aanschafmaand": "apr-24", "looptijd": 24, "methode": "lineair"},
+]
+
+# Groeifactor per maand ten opzichte van de uitgangswaarde in de eerste maand. groei is een percentage
+# per maand: een getal, een reeks per maand, of per scenario met de maanden als laatste as (bijv. vorm (S, 1)).
+# De groei van maand k geldt voor de overgang naar maand k + 1.
+def groeifactor(groei, aantal_maanden):
+    groei = np.asarray(groei, dtype=float)
+    if groei.ndim == 0:
+        groei = groei[None]
+    groei = np.broadcast_to(groei, groei.shape[:-1] + (aantal_maanden,))
+    factoren = np.cumprod(1 + groei[..., :-1] / 100, axis=-1)
+    return np.concatenate([np.ones(groei.shape[:-1] + (1,)), factoren], axis=-1)
+
+# Wijzigingen als (maand, invoer, verandering), bijv. ("sep-24", "aantal_installeurs", 1): vanaf die maand
+# verandert de invoer met dat aantal. Geeft per gewijzigde invoer de opgetelde verandering per maand.
+def wijzigingen_per_maand(wijzigingen, startmaand, aantal_maanden):
+    begin = maandnummer(startmaand)
+    impulsen = {}
+    for maand, invoer, verandering in wijzigingen:
+        if invoer not in SCENARIO_PARAMETERS:
+            raise ValueError(f"Onbekende invoer in wijziging: {invoer!r}")
+        index = maandnummer(maand) - begin
+        impuls = impulsen.setdefault(invoer, np.zeros(aantal_maanden))
+        if index < aantal_maanden:
+            impuls[max(index, 0)] += float(verandering)
+    return {invoer: np.cumsum(impuls) for invoer, impuls in impulsen.items()}
+
+# Afschrijving en boekwaarde (aan het eind van de maand) per activum per maand, beide van vorm
+# (activa, maanden). Activa die voor de startmaand zijn aangeschaft beginnen met hun opgebouwde boekwaarde;
+# activa die nog niet zijn aangeschaft hebben boekwaarde 0.
+def afschrijvingsschema(activa, startmaand, aantal_maanden):
+    if not activa:
+        return np.zeros((0, aantal_maanden)), np.zeros((0, aantal_maanden))
+    begin = maandnummer(startmaand)
+    veld = lambda naam, standaard=None: np.array([activum.get(naam, standaard) for activum in activa], dtype=float)
+    aanschafwaarde, restwaarde = veld("aanschafwaarde")[:, None], veld("restwaarde", 0.0)[:, None]
+    looptijd, percentage = veld("looptijd")[:, None], veld("percentage", 0.0)[:, None]
+    if np.any(looptijd < 1):
+        raise ValueError("De looptijd van een activum moet minimaal 1 maand zijn")
+    degressief = np.array([activum.get("methode", "lineair") == "degressief" for activum in activa])[:, None]
+    aanschaf = np.array([maandnummer(activum["aanschafmaand"]) for activum in activa]) - begin
+
+    # Reken vanaf de vroegste aanschaf, zodat de cumulatieve afschrijving de voorgaande maanden meeneemt
+    eerste = min(0, int(aanschaf.min()))
+    leeftijd = np.arange(eerste, aantal_maanden)[None, :] - aanschaf[:, None]
+    lopend = (leeftijd >= 0) & (leeftijd < looptijd)
+
+    lineair = np.broadcast_to((aanschafwaarde - restwaarde) / looptijd, leeftijd.shape)
+    boekwaarde_begin = aanschafwaarde * (1 - percentage / 100) ** np.maximum(leeftijd, 0)
+    afschrijfbaar = boekwaarde_begin - restwaarde
+    degressief_bedrag = np.clip(np.minimum(boekwaarde_begin * percentage / 100, afschrijfbaar), 0, None)
+    degressief_bedrag = np.where(leeftijd == looptijd - 1, np.clip(afschrijfbaar, 0, None), degressief_bedrag)
+
+    afschrijving = np.where(lopend, np.where(degressief, degressief_bedrag, lineair), 0.0)
+    boekwaarde = np.where(leeftijd >= 0, aanschafwaarde - np.cumsum(afschrijving, axis=1), 0.0)
+    return afschrijving[:, -aantal_maanden:], boekwaarde[:, -aantal_maanden:]
+
+# Prognose vanaf startmaand. De invoer (zoals bij bereken_scenario_kolommen) geldt voor de eerste maand en
+# mag per scenario een array zijn; de uitkomsten hebben dan vorm (scenario's..., maanden).
+# Geeft een dict met de maandlabels, de kolommen van bereken_scenario_kolommen plus het cumulatieve
+# resultaat, en het afschrijvingsschema per activum.
+def bereken_prognose(startmaand, aantal_maanden=12, groei_laadpalen=0.0, groei_zonnepanelen=0.0, wijzigingen=(), activa=None, tarieven=None, **invoer):
+    ontbrekend = set(SCENARIO_PARAMETERS) - set(invoer)
+    if ontbrekend:
+        raise TypeError(f"bereken_prognose mist invoer: {', '.join(sorted(ontbrekend))}")
+    if activa is None:
+        activa = STANDAARD_ACTIVA
+
+    waarden = {naam: np.asarray(invoer[naam], dtype=float)[..., None] for naam in SCENARIO_PARAMETERS}
+    waarden["aantal_laadpalen"] = waarden["aantal_laadpalen"] * groeifactor(groei_laadpalen, aantal_maanden)
+    waarden["aantal_zonnepanelen"] = waarden["aantal_zonnepanelen"] * groeifactor(groei_zonnepanelen, aantal_maanden)
+    for naam, verandering in wijzigingen_per_maand(wijzigingen, startmaand, aantal_maanden).items():
+        waarden[naam] = np.maximum(waarden[naam] + verandering, 0)
+
+    afschrijving, boekwaarde = afschrijvingsschema(activa, startmaand, aantal_maanden)
+    # Het kostenmodel telt afschrijving_kosten op bij de (positieve) vaste kosten: het schema gaat er dus
+    # als positief bedrag in, zodat meer activa het resultaat verlagen
+    kolommen = bereken_scenario_kolommen(**waarden, tarieven=tarieven, afschrijving_kosten=afschrijving.sum(axis=0))
+    kolommen["cumulatief_resultaat"] = np.cumsum(kolommen["resultaat"], axis=-1)
+    return {
+        "maanden": maand_labels(startmaand, aantal_maanden),
+        "kolommen": kolommen,
+        "activa": [activum["omschrijving"] for activum in activa],
+        "afschrijving": afschrijving,
+        "boekwaarde": boekwaarde,
+    }
+
+# De prognose als DataFrame met één rij per maand (en per scenario, met een kolom "scenario")
+def prognose_tabel(prognose):
+    import pandas as pd
+
+    maanden = prognose["maanden"]
+    vorm = np.broadcast_shapes(*(np.shape(reeks) for reeks in prognose["kolommen"].values()))
+    tabel = pd.DataFrame({naam: np.broadcast_to(reeks, vorm).reshape(-1) for naam, reeks in prognose["kolommen"].items()})
+    aantal_scenarios = len(tabel) // len(maanden)
+    tabel.insert(0, "maand", np.tile(maanden, aantal_scenarios))
+    if len(vorm) > 1:
+        tabel.insert(0, "scenario", np.repeat(np.arange(aantal_scenarios), len(maanden)))
+    return tabel
@@ -0,0 +1,500 @@
+import copy
+import heapq
+import itertools
+import json
+import os
+import threading
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+from fpdf.fonts import SubsetMap
+
+import grafieken
+from berekening import SCENARIO_PARAMETERS, STANDAARD_INVOER
+from meting import meet
+from rapportcache import InhoudCache, historie_sleutel, inhoud_sleutel
+
+# PDF-rapportage van de configurator. Deze module laadt fpdf en (via grafieken) matplotlib en seaborn,
+# en wordt daarom pas geïmporteerd als er daadwerkelijk een rapport gemaakt wordt.
+
+FONT_PAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DejaVSanus.ttf")
+
+_lettertype = None
+_lettertype_lock = threading.Lock()
+
+# Voeg het lettertype DejaVu toe aan pdf. Het inlezen van de metriek (tekenbreedtes, glyph-ids) gebeurt
+# één keer per proces; elk document krijgt een kopie van dat sjabloon. fpdf2 embedt alleen de gebruikte
+# tekens en maakt die subset bij het wegschrijven in het fontTools-object zelf, daarom krijgt elk
+# document een eigen, lui ingelezen fontTools-object uit de bytes van het bestand in het geheugen.
+# Dit gebruikt de interne velden van fpdf2 (TTFFont, SubsetMap); getest met 2.8, zie requirements.txt.
+def voeg_lettertype_toe(pdf):
+    global _lettertype
+    with _lettertype_lock:
+        if _lettertype is None:
+            sjabloon = FPDF()
+            sjabloon.add_font("DejaVu", "", FONT_PAD)
+            with open(FONT_PAD, "rb") as bestand:
+                _lettertype = (sjabloon.fonts["dejavu"], bestand.read())
+    sjabloon, inhoud = _lettertype
+    lettertype = copy.copy(sjabloon)
+    lettertype.i = len(pdf.fonts) + 1
+    lettertype.ttfont = ttLib.TTFont(BytesIO(inhoud), recalcTimestamp=False, lazy=True)
+    lettertype.subset = SubsetMap(lettertype)
+    lettertype.missing_glyphs = []
+    lettertype.biggest_size_pt = 0
+    pdf.fonts[lettertype.fontkey] = lettertype
+
+EURO = "€{:,.2f}".format
+
+# Celteksten van een hele kolom in één keer: floats (en in object-kolommen Python-getallen) als bedrag,
+# de rest als tekst. Dezelfde uitkomst als de opmaak per cel met isinstance(waarde, (int, float)).
+def formatteer_kolom(kolom):
+    soort = kolom.dtype.kind
+    if soort == "f":
+        return list(map(EURO, kolom.tolist()))
+    if soort in "iub":
+        return list(map(str, kolom.tolist()))
+    if soort == "O":
+        return [EURO(waarde) if isinstance(waarde, (int, float)) else str(waarde) for waarde in kolom.tolist()]
+    return [str(waarde) for waarde in kolom]
+
+class PDF(FPDF):
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("DejaVu", size=8)
+        self.cell(0, 10, f"Pagina {self.page_no()}", 0, align="C")
+
+    def title_page(self):
+        self.add_page()
+        self.set_font("DejaVu", size=24)
+        self.cell(0, 60, "Bedrijfsconfigurator Rapport", 0, align="C", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.set_font("DejaVu", size=18)
+        self.cell(0, 10, "Overzicht van financiële prestaties", 0, align="C", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(10)
+        self.set_font("DejaVu", size=14)
+        self.cell(0, 10, f"Datum: {datetime.now().strftime('%d-%m-%Y')}", 0, align="C", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(20)
+
+    def chapter_title(self, num, title):
+        self.set_font("DejaVu", size=16)
+        self.cell(0, 10, f"Hoofdstuk {num}: {title}", 0, align='L', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(5)
+
+    def chapter_subtitle(self, subtitle):
+        self.set_font("DejaVu", size=12)
+        self.cell(0, 10, subtitle, 0, align='L', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(3)
+
+    # Tabel met de kolommen opgemaakt per kolom en de breedtes één keer gemeten. Past de tabel niet in de
+    # paginabreedte, dan volgt ze in groepen van kolommen, met de eerste vaste_kolommen (bijv. de maand)
+    # in elke groep. Lange tabellen lopen door over meerdere pagina's met de kop bovenaan elke pagina.
+    def add_table(self, data, col_widths=None, vaste_kolommen=0):
+        self.set_font("DejaVu", size=10)
+        row_height = self.font_size + 3
+        koppen = [str(column) for column in data.columns]
+        cellen = [formatteer_kolom(data.iloc[:, index]) for index in range(len(koppen))]
+        if not col_widths:
+            col_widths = self.meet_kolombreedtes(koppen, cellen)
+
+        for groep_nummer, kolommen in enumerate(self.kolomgroepen(col_widths, vaste_kolommen)):
+            if groep_nummer:
+                self.ln(row_height)
+            self.tabel_deel([koppen[i] for i in kolommen], [cellen[i] for i in kolommen], [col_widths[i] for i in kolommen], row_height)
+
+    # Breedte per kolom op basis van de kop en de langste celteksten. Als alles past blijft de oude
+    # opmaak met gelijke kolommen van een vast deel van de paginabreedte.
+    def meet_kolombreedtes(self, koppen, cellen):
+        gelijk = self.w / (len(koppen) + 1)
+        marge = 2 * self.c_margin + 1
+        breedtes = []
+        for kop, kolom in zip(koppen, cellen):
+            # Bij een proportioneel lettertype is de langste tekst niet altijd de breedste; meet er een paar
+            kandidaten = heapq.nlargest(3, set(kolom), key=len)
+            breedtes.append(max(self.get_string_width(tekst) for tekst in [kop, *kandidaten]) + marge)
+        if max(breedtes, default=0) <= gelijk and gelijk * len(breedtes) <= self.epw:
+            return [gelijk] * len(breedtes)
+        return breedtes
+
+    # Verdeel de kolommen over groepen die elk binnen de paginabreedte passen
+    def kolomgroepen(self, breedtes, vaste_kolommen=0):
+        vast = list(range(min(vaste_kolommen, len(breedtes))))
+        groepen, groep = [], list(vast)
+        breedte = sum(breedtes[i] for i in vast)
+        for index in range(len(vast), len(breedtes)):
+            if len(groep) > len(vast) and breedte + breedtes[index] > self.epw:
+                groepen.append(groep)
+                groep, breedte = list(vast), sum(breedtes[i] for i in vast)
+            groep.append(index)
+            breedte += breedtes[index]
+        if len(groep) > len(vast) or not groepen:
+            groepen.append(groep)
+        return groepen
+
+    # Eén groep kolommen, rij voor rij. In plaats van cell() per cel (met randen) wordt alleen de tekst
+    # geplaatst, gecentreerd met de breedtes per teken; de randen zijn een lijn per rij plus de verticale
+    # lijnen per pagina. Zo blijft de tijd per rij klein en gelijk, hoe lang de tabel ook is.
+    def tabel_deel(self, koppen, kolommen, breedtes, row_height):
+        tekenbreedtes = {}
+
+        def tekstbreedte(tekst):
+            totaal = 0.0
+            for teken in tekst:
+                breedte = tekenbreedtes.get(teken)
+                if breedte is None:
+                    breedte = tekenbreedtes[teken] = self.get_string_width(teken)
+                totaal += breedte
+            return totaal
+
+        randen = list(itertools.accumulate(breedtes, initial=self.l_margin))
+        basislijn = 0.5 * row_height + 0.3 * self.font_size
+
+        def rij(teksten):
+            y = self.y
+            for links, breedte, tekst in zip(randen, breedtes, teksten):
+                self.text(links + (breedte - tekstbreedte(tekst)) / 2, y + basislijn, tekst)
+            self.line(randen[0], y + row_height, randen[-1], y + row_height)
+            self.set_xy(self.l_margin, y + row_height)
+
+        def sluit_blok(begin):
+            self.line(randen[0], begin, randen[-1], begin)
+            for rand in randen:
+                self.line(rand, begin, rand, self.y)
+
+        # Geen losse kop onderaan een pagina
+        if self.will_page_break(2 * row_height):
+            self.add_page()
+        begin = self.y
+        rij(koppen)
+        for teksten in zip(*kolommen):
+            if self.will_page_break(row_height):
+                sluit_blok(begin)
+                self.add_page()
+                begin = self.y
+                rij(koppen)
+            rij(teksten)
+        sluit_blok(begin)
+
+    def add_content_table(self, chapters):
+        self.set_font("DejaVu", size=14)
+        self.cell(0, 10, "Inhoudsopgave", 0, align='L', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(5)
+        self.set_font("DejaVu", size=12)
+        for chapter_num, chapter_title in chapters.items():
+            self.cell(0, 10, f"Hoofdstuk {chapter_num}: {chapter_title}", 0, align='L', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(10)
+
+    def add_specifications(self, specifications):
+        self.set_font("DejaVu", size=12)
+        for month, spec in specifications.items():
+            self.chapter_subtitle(f"Specificaties voor {month}")
+            for key, value in spec.items():
+                self.cell(0, 10, f"{key}: €{value:,.2f}", 0, align='L', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            self.ln(5)
+
+# Tabel "Financiële Overzicht" van één maand (een rij van de historie), met bedragen per persoon
+def financieel_overzicht(rij, personen):
+    return pd.DataFrame({
+        "Categorie": ["Totale Omzet", "Totale Marge", "Totale Kosten", "Resultaat", "Omzet per Persoon", "Marge per Persoon"],
+        "Bedrag": [
+            f"€{rij['omzet']:,.2f}",
+            f"€{rij['brutomarge']:,.2f}",
+            f"€{rij['kostprijs'] * -1:,.2f}",
+            f"€{rij['resultaat']:,.2f}",
+            f"€{rij['omzet'] / personen:,.2f}",
+            f"€{rij['brutomarge'] / personen:,.2f}"
+        ]
+    })
+
+_caches = None
+
+# Caches voor grafieken en complete rapporten, gedeeld door alle rapporten in dit proces. Met de
+# omgevingsvariabele CONFIGURATOR_CACHE_MAP blijven ze ook op schijf bewaard en overleven ze een herstart.
+def standaard_caches():
+    global _caches
+    if _caches is None:
+        cache_map = os.environ.get("CONFIGURATOR_CACHE_MAP")
+        _caches = {
+            "grafieken": InhoudCache(64 * 1024 * 1024, map=os.path.join(cache_map, "grafieken") if cache_map else None),
+            "rapporten": InhoudCache(128 * 1024 * 1024, map=os.path.join(cache_map, "rapporten") if cache_map else None),
+        }
+    return _caches
+
+# Verhoog bij wijzigingen aan de opmaak van de rapporten, zodat eerder gecachte rapporten niet meer gebruikt worden
+RAPPORT_VERSIE = 1
+
+# Het rapport hangt af van de historie, de specificaties, het personeel, de datum op de titelpagina en
+# de opmaak (RAPPORT_VERSIE, en de grafieken via GRAFIEK_VERSIE en GRAFIEK_DPI).
+# data_sleutel is de inhoudshash van df (rapportcache.historie_sleutel); als die al bekend is hoeft df
+# niet opnieuw gehasht te worden.
+def bereken_rapport_sleutel(df, specificaties, aantal_installeurs, aantal_verkopers, fulltime_verkopers, data_sleutel=None, scenarios=None):
+    return inhoud_sleutel(
+        "rapport",
+        RAPPORT_VERSIE,
+        grafieken.GRAFIEK_VERSIE,
+        grafieken.GRAFIEK_DPI,
+        datetime.now().strftime('%d-%m-%Y'),
+        data_sleutel or historie_sleutel(df),
+        json.dumps(dict(specificaties), ensure_ascii=False),
+        aantal_installeurs,
+        aantal_verkopers,
+        fulltime_verkopers,
+        None if scenarios is None else historie_sleutel(scenarios),
+    )
+
+# Scenariovergelijking (scenarios.vergelijk_scenarios) als teksttabel: parameters als aantallen,
+# de overige grootheden als bedragen
+def scenario_tabel(vergelijking):
+    bedrag = ~vergelijking.index.isin(SCENARIO_PARAMETERS)
+    tabel = pd.DataFrame({"Grootheid": vergelijking["Grootheid"].to_numpy()})
+    for kolom in vergelijking.columns[1:]:
+        tabel[kolom] = [EURO(waarde) if is_bedrag else f"{waarde:,.0f}" for waarde, is_bedrag in zip(vergelijking[kolom].to_numpy(), bedrag)]
+    return tabel
+
+# Genereer het PDF-rapport over de historie df met de specificaties per maand. Met voortgang wordt na elke
+# maand en elk afsluitend hoofdstuk voortgang(gedaan, totaal, stap) aangeroepen; een uitzondering uit
+# voortgang breekt het rapport af (zo annuleert de rapportwachtrij een taak). Met scenarios (een
+# vergelijking uit scenarios.vergelijk_scenarios) volgt een hoofdstuk Scenariovergelijking.
+def genereer_rapport(df, specificaties, aantal_installeurs, aantal_verkopers, fulltime_verkopers, data_sleutel=None, caches=None, voortgang=None, scenarios=None):
+    if caches is None:
+        caches = standaard_caches()
+    if voortgang is None:
+        voortgang = lambda gedaan, totaal, stap: None
+
+    rapport_sleutel = bereken_rapport_sleutel(df, specificaties, aantal_installeurs, aantal_verkopers, fulltime_verkopers, data_sleutel, scenarios)
+    with meet("rapport: cache opzoeken", "rapport"):
+        pdf_content = caches["rapporten"].get(rapport_sleutel)
+    if pdf_content is not None:
+        return pdf_content
+
+    with meet("rapport: titelpagina en inhoudsopgave", "rapport"):
+        pdf = PDF()
+        voeg_lettertype_toe(pdf)
+        pdf.set_font("DejaVu", size=12)
+
+        # Titelpagina
+        pdf.title_page()
+
+        # Inhoudsopgave op pagina 2
+        pdf.add_page()
+        chapters = {
+            1: "Inleiding",
+            2: "Financiële Overzichten",
+            3: "Detailgegevens",
+            4: "Specificaties"
+        }
+        if scenarios is not None:
+            chapters[5] = "Scenariovergelijking"
+        pdf.add_content_table(chapters)
+    
+    # Inleiding
+    with meet("rapport: hoofdstuk 1 Inleiding", "rapport"):
+        pdf.add_page()
+        pdf.chapter_title(1, "Inleiding")
+        pdf.set_font("DejaVu", size=10)
+        inleiding_tekst = (
+            "Dit rapport geeft een uitgebreid overzicht van de financiële prestaties van het bedrijf "
+            "over de afgelopen maanden. Het doel van dit rapport is om inzicht te geven in de omzet, "
+            "marges, kosten en resultaten per maand, evenals de vaste maandelijkse kosten. "
+            "De informatie in dit rapport is bedoeld om beslissingsondersteuning te bieden en om een "
+            "duidelijk beeld te geven van de financiële gezondheid van het bedrijf.\n\n"
+            "In het hoofdstuk 'Financiële Overzichten' worden de maandelijkse financiële gegevens "
+            "gepresenteerd, inclusief omzet, marges en kosten. Daarnaast worden er grafieken getoond "
+            "om trends en verhoudingen te visualiseren. Het hoofdstuk 'Detailgegevens' bevat een gedetailleerde "
+            "tabel met alle financiële gegevens van de afgelopen maanden.\n\n"
+            "We hopen dat dit rapport u helpt bij het nemen van geïnformeerde beslissingen en het verbeteren "
+            "van de financiële prestaties van het bedrijf."
+        )
+        pdf.multi_cell(0, 10, inleiding_tekst)
+        pdf.ln(10)
+
+    # Grafieken worden parallel en in het geheugen gerenderd; de trendgrafiek is voor elke maand
+    # gelijk en wordt daarom maar één keer gemaakt
+    with meet("rapport: grafieken", "rapport"):
+        maanden = df['maand'].unique()
+        grafiek_opdrachten = [_trend_opdracht(df)]
+        for maand in maanden:
+            maand_data = df[df['maand'] == maand]
+            grafiek_opdrachten.append(("financieel_overzicht", (maand_data['omzet'].values[0], maand_data['brutomarge'].values[0], maand_data['resultaat'].values[0])))
+        grafiek_pngs = grafieken.render_grafieken(grafiek_opdrachten, cache=caches["grafieken"])
+        with meet("rapport: trendgrafiek", "grafiek"):
+            trend_png = BytesIO(next(grafiek_pngs))
+    # Stappen voor de voortgang: elke maand, de detailgegevens, de specificaties, de scenario's en het wegschrijven
+    totaal_stappen = len(maanden) + 3 + (scenarios is not None)
+    voortgang(0, totaal_stappen, "Grafieken")
+
+    # Financiële Overzichten
+    with meet("rapport: hoofdstuk 2 Financiële Overzichten", "rapport"):
+        pdf.chapter_title(2, "Financiële Overzichten")
+        for stap, maand in enumerate(maanden, start=1):
+            with meet("rapport: financieel overzicht per maand", "grafiek"):
+                overzicht_png = next(grafiek_pngs)
+            maand_data = df[df['maand'] == maand]
+
+            pdf.chapter_subtitle(f"Maand: {maand}")
+
+            pdf.set_font("DejaVu", size=12)
+            pdf.cell(0, 10, "Financiële Overzicht", 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.ln(5)
+            financial_overview = financieel_overzicht(maand_data.iloc[0], aantal_installeurs + aantal_verkopers + fulltime_verkopers + 1)
+            pdf.add_table(financial_overview)
+            pdf.ln(10)
+
+            pdf.cell(0, 10, "Omzet en Marges", 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.ln(5)
+            omzet_marges = pd.DataFrame({
+                "Categorie": ["Omzet Laadpalen", "Marge Laadpalen", "Omzet Zonnepanelen", "Marge Zonnepanelen"],
+                "Bedrag": [
+                    f"€{maand_data['omzet_laadpalen'].values[0]:,.2f}",
+                    f"€{maand_data['brutomarge_laadpalen'].values[0]:,.2f}",
+                    f"€{maand_data['omzet_zonnepanelen'].values[0]:,.2f}",
+                    f"€{maand_data['brutomarge_zonnepanelen'].values[0]:,.2f}"
+                ]
+            })
+            pdf.add_table(omzet_marges)
+            pdf.ln(10)
+
+            pdf.cell(0, 10, "Kostenoverzicht", 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.ln(5)
+            kostenoverzicht = pd.DataFrame({
+                "Categorie": ["Totale Personeelskosten", "IT Kosten", "Solar Kosten", "Contributie Installatiebedrijf", "Autokosten", "Afschrijving Vervoersmiddelen"],
+                "Bedrag": [
+                    f"€{maand_data['personeelskosten'].values[0]:,.2f}",
+                    f"€{-maand_data['it_kosten'].values[0]:,.2f}",
+                    f"€{-maand_data['solar_kosten'].values[0]:,.2f}",
+                    f"€{-maand_data['contributie_kosten'].values[0]:,.2f}",
+                    f"€{-maand_data['autokosten'].values[0]:,.2f}",
+                    f"€{-maand_data['afschrijving_kosten'].values[0]:,.2f}"
+                ]
+            })
+            pdf.add_table(kostenoverzicht)
+            pdf.ln(10)
+
+            # Voeg grafieken toe met mooiere layout
+            pdf.image(BytesIO(overzicht_png), x=10, y=None, w=180)
+            pdf.ln(10)
+
+            pdf.image(trend_png, x=10, y=None, w=180)
+            pdf.add_page()
+            voortgang(stap, totaal_stappen, f"Maand {maand}")
+
+    # Detailgegevens
+    with meet("rapport: hoofdstuk 3 Detailgegevens", "rapport"):
+        pdf.chapter_title(3, "Detailgegevens")
+        pdf.ln(5)
+        pdf.add_table(df, vaste_kolommen=1)
+    voortgang(len(maanden) + 1, totaal_stappen, "Detailgegevens")
+
+    # Add specifications
+    with meet("rapport: hoofdstuk 4 Specificaties", "rapport"):
+        pdf.chapter_title(4, "Specificaties")
+        pdf.add_specifications(specificaties)
+    voortgang(len(maanden) + 2, totaal_stappen, "Specificaties")
+
+    if scenarios is not None:
+        with meet("rapport: hoofdstuk 5 Scenariovergelijking", "rapport"):
+            pdf.add_page()
+            pdf.chapter_title(5, "Scenariovergelijking")
+            pdf.set_font("DejaVu", size=10)
+            pdf.multi_cell(0, 8, f"Opgeslagen scenario's naast elkaar, met per scenario het verschil (Δ) met het basisscenario {scenarios.columns[1]}.")
+            pdf.ln(5)
+            pdf.add_table(scenario_tabel(scenarios), vaste_kolommen=1)
+        voortgang(len(maanden) + 3, totaal_stappen, "Scenariovergelijking")
+
+    with meet("rapport: pdf.output", "rapport"):
+        pdf_content = bytes(pdf.output())
+    caches["rapporten"].put(rapport_sleutel, pdf_content)
+    voortgang(totaal_stappen, totaal_stappen, "Klaar")
+    return pdf_content
+
+# Trendgrafiek (omzet, kosten, resultaat per maand) als grafiekopdracht
+def _trend_opdracht(data):
+    return ("trends", (list(data["maand"]), list(data["omzet"]), list(-data["kostprijs"]), list(data["resultaat"])))
+
+def bereken_vestigingsrapport_sleutel(tabel, parameters, data_sleutel=None, standaardinvoer=None):
+    return inhoud_sleutel(
+        "vestigingsrapport",
+        RAPPORT_VERSIE,
+        grafieken.GRAFIEK_VERSIE,
+        grafieken.GRAFIEK_DPI,
+        datetime.now().strftime('%d-%m-%Y'),
+        data_sleutel or historie_sleutel(tabel),
+        json.dumps(parameters, ensure_ascii=False, sort_keys=True),
+        json.dumps(standaardinvoer, sort_keys=True),
+    )
+
+# Geconsolideerd rapport over alle vestigingen. tabel is de lange historie (vestiging, maand, kolommen),
+# parameters de parameters per vestiging (voor het personeel per vestiging), aangevuld met standaardinvoer
+# (bijv. de schuifregelaars, anders STANDAARD_INVOER). Na het geconsolideerde overzicht volgt per
+# vestiging een hoofdstuk met de laatste maand, de trend en de historie.
+def genereer_vestigingsrapport(tabel, parameters, data_sleutel=None, caches=None, voortgang=None, standaardinvoer=None):
+    from vestigingen import consolideer
+
+    if caches is None:
+        caches = standaard_caches()
+    if voortgang is None:
+        voortgang = lambda gedaan, totaal, stap: None
+
+    rapport_sleutel = bereken_vestigingsrapport_sleutel(tabel, parameters, data_sleutel, standaardinvoer)
+    if standaardinvoer is None:
+        standaardinvoer = STANDAARD_INVOER
+    with meet("vestigingsrapport: cache opzoeken", "rapport"):
+        pdf_content = caches["rapporten"].get(rapport_sleutel)
+    if pdf_content is not None:
+        return pdf_content
+
+    geconsolideerd = consolideer(tabel)
+    per_vestiging = {naam: data.drop(columns="vestiging").reset_index(drop=True) for naam, data in tabel.groupby("vestiging", sort=False)}
+    totaal_stappen = len(per_vestiging) + 2
+
+    with meet("vestigingsrapport: titelpagina en inhoudsopgave", "rapport"):
+        pdf = PDF()
+        voeg_lettertype_toe(pdf)
+        pdf.set_font("DejaVu", size=12)
+        pdf.title_page()
+        pdf.add_page()
+        chapters = {1: "Geconsolideerd overzicht"}
+        for nummer, naam in enumerate(per_vestiging, start=2):
+            chapters[nummer] = f"Vestiging {naam}"
+        pdf.add_content_table(chapters)
+
+    with meet("vestigingsrapport: grafieken", "rapport"):
+        grafiek_opdrachten = [_trend_opdracht(geconsolideerd)] + [_trend_opdracht(data) for data in per_vestiging.values()]
+        grafiek_pngs = grafieken.render_grafieken(grafiek_opdrachten, cache=caches["grafieken"])
+    voortgang(0, totaal_stappen, "Grafieken")
+
+    with meet("vestigingsrapport: geconsolideerd overzicht", "rapport"):
+        pdf.add_page()
+        pdf.chapter_title(1, "Geconsolideerd overzicht")
+        pdf.image(BytesIO(next(grafiek_pngs)), x=10, y=None, w=180)
+        pdf.ln(5)
+        laatste_maand = geconsolideerd["maand"].iloc[-1]
+        pdf.chapter_subtitle(f"Resultaat per vestiging in {laatste_maand}")
+        pdf.add_table(tabel.loc[tabel["maand"] == laatste_maand, ["vestiging", "omzet", "brutomarge", "kostprijs", "resultaat"]])
+        pdf.ln(5)
+        pdf.chapter_subtitle("Totalen per maand")
+        pdf.add_table(geconsolideerd[["maand", "vestigingen", "laadpalen", "zonnepanelen", "omzet", "brutomarge", "kostprijs", "resultaat"]], vaste_kolommen=1)
+    voortgang(1, totaal_stappen, "Geconsolideerd overzicht")
+
+    for nummer, (naam, data) in enumerate(per_vestiging.items(), start=2):
+        with meet("vestigingsrapport: hoofdstuk per vestiging", "rapport"):
+            instellingen = parameters.get(naam, {})
+            personen = sum(instellingen.get(sleutel, standaardinvoer[sleutel]) for sleutel in ("aantal_installeurs", "aantal_verkopers", "fulltime_verkopers")) + 1
+            pdf.add_page()
+            pdf.chapter_title(nummer, f"Vestiging {naam}")
+            pdf.chapter_subtitle(f"Maand: {data['maand'].iloc[-1]}")
+            pdf.add_table(financieel_overzicht(data.iloc[-1], personen))
+            pdf.ln(5)
+            pdf.image(BytesIO(next(grafiek_pngs)), x=10, y=None, w=180)
+            pdf.ln(5)
+            pdf.add_table(data, vaste_kolommen=1)
+        voortgang(nummer, totaal_stappen, f"Vestiging {naam}")
+
+    with meet("vestigingsrapport: pdf.output", "rapport"):
+        pdf_content = bytes(pdf.output())
+    caches["rapporten"].put(rapport_sleutel, pdf_content)
+    voortgang(totaal_stappen, totaal_stappen, "Klaar")
+    return pdf_content
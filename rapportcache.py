@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Inhoud-geadresseerde cache voor gerenderde grafieken en complete rapporten.
+# De sleutel is een hash van alles waar de inhoud van afhangt, dus een sleutel hoeft nooit
+# ongeldig gemaakt te worden: gewijzigde invoer levert vanzelf een andere sleutel op.
+
+
+def _json_waarde(waarde):
+    # NumPy-getallen en -arrays (bijv. uit een DataFrame) naar gewone Python-waarden
+    if hasattr(waarde, "tolist"):
+        return waarde.tolist()
+    return str(waarde)
+
+
+def inhoud_sleutel(*delen):
+    inhoud = json.dumps(delen, default=_json_waarde, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(inhoud.encode("utf-8")).hexdigest()
+
+
+# Inhoudelijke hash van een DataFrame met de historie
+def historie_sleutel(data):
+    inhoud = hashlib.sha256("|".join(data.columns).encode())
+    inhoud.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return inhoud.hexdigest()
+
+
+class InhoudCache:
+    # LRU-cache van bytes met een maximale totale grootte. Met een map erbij worden de items ook
+    # op schijf bewaard (eveneens begrensd in grootte), zodat de cache een herstart overleeft.
+    def __init__(self, max_bytes=64 * 1024 * 1024, map=None, max_schijf_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_schijf_bytes = max_schijf_bytes
+        self.map = map
+        self.treffers = 0
+        self.missers = 0
+        self._items = OrderedDict()
+        self._grootte = 0
+        self._schijf_grootte = 0
+        self._lock = threading.Lock()
+        if map is not None:
+            os.makedirs(map, exist_ok=True)
+            self._schijf_grootte = sum(entry.stat().st_size for entry in os.scandir(map) if entry.name.endswith(".bin"))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, sleutel):
+        return sleutel in self._items or (self.map is not None and os.path.exists(self._pad(sleutel)))
+
+    @property
+    def grootte(self):
+        return self._grootte
+
+    def _pad(self, sleutel):
+        return os.path.join(self.map, f"{sleutel}.bin")
+
+    def get(self, sleutel):
+        with self._lock:
+            waarde = self._items.get(sleutel)
+            if waarde is not None:
+                self._items.move_to_end(sleutel)
+                self.treffers += 1
+                return waarde
+        waarde = self._lees_schijf(sleutel)
+        with self._lock:
+            if waarde is None:
+                self.missers += 1
+                return None
+            self.treffers += 1
+            self._bewaar(sleutel, waarde)
+        return waarde
+
+    def put(self, sleutel, waarde):
+        waarde = bytes(waarde)
+        with self._lock:
+            self._bewaar(sleutel, waarde)
+        self._schrijf_schijf(sleutel, waarde)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._grootte = 0
+
+    def _bewaar(self, sleutel, waarde):
+        if len(waarde) > self.max_bytes:
+            return
+        vorige = self._items.pop(sleutel, None)
+        if vorige is not None:
+            self._grootte -= len(vorige)
+        self._items[sleutel] = waarde
+        self._grootte += len(waarde)
+        while self._grootte > self.max_bytes:
+            _, oudste = self._items.popitem(last=False)
+            self._grootte -= len(oudste)
+
+    def _lees_schijf(self, sleutel):
+        if self.map is None:
+            return None
+        pad = self._pad(sleutel)
+        try:
+            with open(pad, "rb") as bestand:
+                waarde = bestand.read()
+            os.utime(pad)  # Laatst gebruikt, voor de LRU-volgorde op schijf
+        except OSError:
+            return None
+        return waarde
+
+    def _schrijf_schijf(self, sleutel, waarde):
+        if self.map is None or len(waarde) > self.max_schijf_bytes:
+            return
+        pad = self._pad(sleutel)
+        if os.path.exists(pad):
+            return
+        tijdelijk = f"{pad}.{threading.get_ident()}.tmp"
+        with open(tijdelijk, "wb") as bestand:
+            bestand.write(waarde)
+        os.replace(tijdelijk, pad)
+        with self._lock:
+            self._schijf_grootte += len(waarde)
+            if self._schijf_grootte > self.max_schijf_bytes:
+                self._ruim_schijf_op()
+
+    def _ruim_schijf_op(self):
+        # Verwijder de minst recent gebruikte bestanden tot de map weer binnen de limiet valt
+        bestanden = sorted(
+            (entry for entry in os.scandir(self.map) if entry.name.endswith(".bin")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        self._schijf_grootte = sum(entry.stat().st_size for entry in bestanden)
+        for entry in bestanden:
+            if self._schijf_grootte <= self.max_schijf_bytes:
+                break
+            try:
+                grootte = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._schijf_grootte -= grootte
@@ -0,0 +1,194 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import meting
+
+# Wachtrij voor PDF-rapporten. genereer_rapport (of genereer_vestigingsrapport) draait in een kleine pool van achtergrondthreads, zodat
+# de Streamlit-sessie die het rapport aanvraagt (en die van andere gebruikers) bruikbaar blijft.
+# Elke aanvraag krijgt een taak met een id, voortgang en status; identieke aanvragen die nog lopen
+# (dezelfde rapportsleutel, ook vanuit een andere sessie) delen één taak. Een taak wordt pas echt
+# geannuleerd als alle aanvragers hem hebben geannuleerd.
+# rapport (fpdf, matplotlib) wordt pas geïmporteerd bij de eerste aanvraag.
+# Is bij het indienen een meter actief (debugmodus), dan krijgt de taak een eigen meting.Meter: de
+# metingen van de sessie stoppen aan het eind van de run, het rapport loopt daarna nog door.
+
+WACHTEND = "wachtend"
+BEZIG = "bezig"
+KLAAR = "klaar"
+FOUT = "fout"
+GEANNULEERD = "geannuleerd"
+
+
+class RapportGeannuleerd(Exception):
+    pass
+
+
+class RapportTaak:
+    def __init__(self, sleutel):
+        self.id = uuid.uuid4().hex
+        self.sleutel = sleutel
+        self.status = WACHTEND
+        self.gedaan = 0
+        self.totaal = 0
+        self.stap = "In de wachtrij"
+        self.pdf = None
+        self.fout = None
+        self.aanvragers = 1
+        self.aangemaakt = time.time()
+        self.gereed = None
+        self.meter = None
+        self._annuleren = threading.Event()
+
+    @property
+    def actief(self):
+        return self.status in (WACHTEND, BEZIG)
+
+    # Fractie tussen 0 en 1, voor st.progress
+    @property
+    def voortgang(self):
+        if self.status == KLAAR:
+            return 1.0
+        return self.gedaan / self.totaal if self.totaal else 0.0
+
+    # Voortgangsfunctie voor genereer_rapport; breekt het rapport af zodra de taak geannuleerd is
+    def _meld(self, gedaan, totaal, stap):
+        if self._annuleren.is_set():
+            raise RapportGeannuleerd(self.id)
+        self.gedaan, self.totaal, self.stap = gedaan, totaal, stap
+
+
+class Rapportwachtrij:
+    # max_workers rapporten worden tegelijk gemaakt, de rest wacht. Van afgeronde taken worden de
+    # laatste max_bewaard bewaard, zodat de download ook na een rerun nog beschikbaar is. Dat geldt voor
+    # alle sessies samen: een oudere taak kan dus verdwijnen en taak() geeft dan None.
+    def __init__(self, max_workers=2, max_bewaard=32, caches=None):
+        self.max_bewaard = max_bewaard
+        self._caches = caches
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rapport")
+        self._taken = OrderedDict()
+        self._lopend = {}
+        self._lock = threading.Lock()
+
+    def _rapportcaches(self):
+        if self._caches is None:
+            from rapport import standaard_caches
+
+            self._caches = standaard_caches()
+        return self._caches
+
+    # Vraag een rapport aan (zelfde argumenten als genereer_rapport) en geef de taak terug. Staat het
+    # rapport al in de rapportcache, dan is de taak meteen klaar; loopt er al een identieke aanvraag,
+    # dan wordt die taak teruggegeven.
+    def dien_in(self, df, specificaties, aantal_installeurs, aantal_verkopers, fulltime_verkopers, data_sleutel=None, scenarios=None):
+        from rapport import bereken_rapport_sleutel, genereer_rapport
+
+        # De achtergrondthread krijgt eigen kopieën: de sessie kan de historie en de specificaties
+        # (een lazy view op de database) intussen wijzigen
+        specificaties = {maand: dict(specificatie) for maand, specificatie in specificaties.items()}
+        sleutel = bereken_rapport_sleutel(df, specificaties, aantal_installeurs, aantal_verkopers, fulltime_verkopers, data_sleutel, scenarios)
+        if scenarios is not None:
+            scenarios = scenarios.copy()
+        return self._dien_in(sleutel, partial(genereer_rapport, scenarios=scenarios), lambda: (df.copy(), specificaties, aantal_installeurs, aantal_verkopers, fulltime_verkopers, data_sleutel))
+
+    # Het geconsolideerde rapport over de vestigingen (zie rapport.genereer_vestigingsrapport)
+    def dien_in_vestigingen(self, tabel, parameters, data_sleutel=None, standaardinvoer=None):
+        from rapport import bereken_vestigingsrapport_sleutel, genereer_vestigingsrapport
+
+        parameters = {naam: dict(instellingen) for naam, instellingen in parameters.items()}
+        if standaardinvoer is not None:
+            standaardinvoer = dict(standaardinvoer)
+        sleutel = bereken_vestigingsrapport_sleutel(tabel, parameters, data_sleutel, standaardinvoer)
+        return self._dien_in(sleutel, partial(genereer_vestigingsrapport, standaardinvoer=standaardinvoer), lambda: (tabel.copy(), parameters, data_sleutel))
+
+    # argumenten is een functie die de argumenten voor functie geeft; die worden alleen gemaakt
+    # (gekopieerd) als er echt een nieuwe taak gestart wordt
+    def _dien_in(self, sleutel, functie, argumenten):
+        caches = self._rapportcaches()
+        with self._lock:
+            taak = self._lopend.get(sleutel)
+            if taak is not None:
+                taak.aanvragers += 1
+                return taak
+            taak = RapportTaak(sleutel)
+            self._taken[taak.id] = taak
+            pdf = caches["rapporten"].get(sleutel)
+            if pdf is not None:
+                taak.pdf = pdf
+                self._rond_af(taak, KLAAR)
+                return taak
+            self._lopend[sleutel] = taak
+        sessiemeter = meting.actieve_meter()
+        if sessiemeter is not None:
+            taak.meter = meting.Meter(geheugen=sessiemeter.geheugen)
+        # De pool neemt de contextvariabelen van de aanvrager niet over; de taak draait in een eigen
+        # kopie met zijn eigen meter (of geen)
+        context = contextvars.copy_context()
+        context.run(meting.activeer, taak.meter)
+        self._pool.submit(context.run, self._voer_uit, taak, functie, argumenten(), caches)
+        return taak
+
+    def _voer_uit(self, taak, functie, argumenten, caches):
+        try:
+            taak._meld(0, 0, "Rapport wordt opgebouwd")
+            taak.status = BEZIG
+            with meting.meet("rapporttaak", "rapport"):
+                pdf = functie(*argumenten, caches=caches, voortgang=taak._meld)
+        except RapportGeannuleerd:
+            status = GEANNULEERD
+        except Exception as fout:
+            taak.fout = f"{type(fout).__name__}: {fout}"
+            status = FOUT
+        else:
+            taak.pdf = pdf
+            status = KLAAR
+        finally:
+            if taak.meter is not None:
+                taak.meter.stop()
+        with self._lock:
+            self._rond_af(taak, GEANNULEERD if taak._annuleren.is_set() else status)
+
+    # Aanroepen met self._lock vast
+    def _rond_af(self, taak, status):
+        taak.status = status
+        taak.gereed = time.time()
+        if self._lopend.get(taak.sleutel) is taak:
+            del self._lopend[taak.sleutel]
+        afgerond = [id for id, bewaard in self._taken.items() if not bewaard.actief]
+        for id in afgerond[:max(len(afgerond) - self.max_bewaard, 0)]:
+            del self._taken[id]
+
+    def taak(self, taak_id):
+        with self._lock:
+            return self._taken.get(taak_id)
+
+    # Trek de aanvraag van één aanvrager in; zonder overige aanvragers stopt het rapport na de
+    # lopende maand (of start het niet meer als het nog in de wachtrij stond)
+    def annuleer(self, taak_id):
+        with self._lock:
+            taak = self._taken.get(taak_id)
+            if taak is None or not taak.actief:
+                return
+            taak.aanvragers -= 1
+            if taak.aanvragers > 0:
+                return
+            taak._annuleren.set()
+            taak.stap = "Wordt geannuleerd"
+            if self._lopend.get(taak.sleutel) is taak:
+                # Een nieuwe, identieke aanvraag moet niet bij deze geannuleerde taak aansluiten
+                del self._lopend[taak.sleutel]
+
+    def taken(self):
+        with self._lock:
+            return list(self._taken.values())
+
+    def sluit(self, wacht=True):
+        with self._lock:
+            for taak in self._taken.values():
+                if taak.actief:
+                    taak._annuleren.set()
+        self._pool.shutdown(wait=wacht)
@@ -0,0 +1,115 @@
+import numpy as np
+
+from berekening import SCENARIO_PARAMETERS, bereken_scenario_kolommen, standaard_tarieven
+from kostenmodel import standaard_model
+from rapportcache import inhoud_sleutel
+from vestigingen import parameter_arrays
+
+# Benoemde scenario's: sets invoerparameters die in de opslag bewaard worden (Opslag.bewaar_scenario),
+# los van de historie. De uitkomsten worden voor alle scenario's die ze nog niet hebben in één batch
+# berekend (bereken_scenario_kolommen) en compact per scenario bewaard: de kolommen van
+# RESULTAAT_KOLOMMEN als float64-bytes, met de rekensleutel (kostenmodel en tarieven) waarmee ze berekend
+# zijn. Vergelijken van opgeslagen scenario's rekent dus niets opnieuw zolang model en tarieven gelijk zijn.
+
+RESULTAAT_KOLOMMEN = (
+    "omzet",
+    "kostprijs",
+    "brutomarge",
+    "omzet_laadpalen",
+    "kostprijs_laadpalen",
+    "brutomarge_laadpalen",
+    "omzet_zonnepanelen",
+    "kostprijs_zonnepanelen",
+    "brutomarge_zonnepanelen",
+    "personeelskosten",
+    "it_kosten",
+    "solar_kosten",
+    "contributie_kosten",
+    "autokosten",
+    "afschrijving_kosten",
+    "totale_kosten",
+    "resultaat",
+    "totale_personen",
+    "omzet_per_persoon",
+    "marge_per_persoon",
+)
+
+# Grootheden in een vergelijking, met hun omschrijving; de parameters zijn aantallen, de rest bedragen
+VERGELIJK_GROOTHEDEN = {
+    "aantal_laadpalen": "Aantal laadpalen",
+    "aantal_zonnepanelen": "Aantal zonnepanelen",
+    "marge_laadpalen": "Marge laadpalen (%)",
+    "marge_zonnepanelen": "Marge zonnepanelen (%)",
+    "aantal_installeurs": "Fulltime installateurs",
+    "aantal_verkopers": "Parttime verkopers",
+    "fulltime_verkopers": "Fulltime verkopers",
+    "marketing_budget": "Marketingbudget",
+    "omzet": "Omzet",
+    "brutomarge": "Brutomarge",
+    "kostprijs": "Kostprijs",
+    "personeelskosten": "Personeelskosten",
+    "totale_kosten": "Totale kosten",
+    "resultaat": "Resultaat",
+    "omzet_per_persoon": "Omzet per persoon",
+    "marge_per_persoon": "Marge per persoon",
+}
+
+
+# Onthouden uitkomsten zijn geldig zolang het kostenmodel, de tarieven en de resultaatkolommen gelijk zijn
+def rekensleutel(tarieven):
+    return inhoud_sleutel("scenario", standaard_model().vingerafdruk, RESULTAAT_KOLOMMEN, tarieven)
+
+
+# Alle scenario's (of alleen namen) als tabel met één rij per scenario: de naam, de parameters en
+# RESULTAAT_KOLOMMEN. Scenario's zonder geldige onthouden uitkomst worden samen berekend en de uitkomsten
+# bewaard. Geeft de tabel en het aantal berekende scenario's.
+def laad_scenarioresultaten(opslag, tarieven=None, namen=None):
+    import pandas as pd
+
+    if tarieven is None:
+        tarieven = standaard_tarieven()
+    parameters = opslag.scenarios()
+    if namen is not None:
+        parameters = {naam: parameters[naam] for naam in namen if naam in parameters}
+    sleutel = rekensleutel(tarieven)
+    onthouden = opslag.laad_scenario_resultaten()
+
+    resultaten = np.empty((len(parameters), len(RESULTAAT_KOLOMMEN)))
+    te_berekenen = []
+    for rij, naam in enumerate(parameters):
+        bewaard = onthouden.get(naam)
+        if bewaard is not None and bewaard[0] == sleutel:
+            resultaten[rij] = np.frombuffer(bewaard[1], dtype=np.float64)
+        else:
+            te_berekenen.append(rij)
+
+    invoer = parameter_arrays(parameters)
+    if te_berekenen:
+        kolommen = bereken_scenario_kolommen(**{naam: waarden[te_berekenen] for naam, waarden in invoer.items()}, tarieven=tarieven)
+        nieuw = np.column_stack([kolommen[kolom] for kolom in RESULTAAT_KOLOMMEN])
+        resultaten[te_berekenen] = nieuw
+        scenarionamen = list(parameters)
+        opslag.bewaar_scenario_resultaten({scenarionamen[rij]: (sleutel, uitkomst.tobytes()) for rij, uitkomst in zip(te_berekenen, nieuw)})
+
+    tabel = pd.DataFrame({"scenario": list(parameters), **{naam: invoer[naam] for naam in SCENARIO_PARAMETERS}})
+    tabel[list(RESULTAAT_KOLOMMEN)] = resultaten
+    return tabel, len(te_berekenen)
+
+
+# Scenario's naast elkaar: per grootheid een rij met de waarde van het basisscenario, en voor elk ander
+# scenario de waarde en het verschil met de basis ("Δ naam"). De index bevat de namen van de grootheden.
+def vergelijk_scenarios(tabel, namen, basis, grootheden=None):
+    import pandas as pd
+
+    if grootheden is None:
+        grootheden = VERGELIJK_GROOTHEDEN
+    namen = [basis] + [naam for naam in namen if naam != basis]
+    waarden = tabel.set_index("scenario").loc[namen, list(grootheden)].to_numpy(dtype=float)
+    verschillen = waarden - waarden[0]
+
+    vergelijking = pd.DataFrame({"Grootheid": list(grootheden.values())}, index=list(grootheden))
+    vergelijking[basis] = waarden[0]
+    for rij, naam in enumerate(namen[1:], start=1):
+        vergelijking[naam] = waarden[rij]
+        vergelijking[f"Δ {naam}"] = verschillen[rij]
+    return vergelijking
@@ -0,0 +1,107 @@
+import csv
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from berekening import KOSTEN_NEGATIEF, KOSTEN_POSITIEF, STANDAARD_INVOER, bereken_gegevens, historische_data, specificaties, standaard_tarieven
+from grootboek import importeer_grootboek, laad_mapping, verwerk_import
+from opslag import Opslag
+
+# Regressiecontroles voor het wegschrijven van een grootboekimport. Uitvoeren met: python -m pytest
+
+# Alle kostenkolommen waar de standaardmapping naar boekt, als bedragen uit een export (kosten negatief)
+IMPORT_KOSTEN = {
+    "personeelskosten": -16315.0,
+    "it_kosten": -284.03,
+    "solar_kosten": -704.5,
+    "contributie_kosten": -154.74,
+    "afschrijving_kosten": -3449.16,
+}
+
+
+def _opslag(tmp_path):
+    opslag = Opslag(str(tmp_path / "configurator.db"))
+    opslag.initialiseer(pd.DataFrame(historische_data), specificaties)
+    return opslag
+
+
+def _ingevoerde_maand(opslag, maand):
+    rij, _ = bereken_gegevens(**STANDAARD_INVOER, maand=maand, tarieven=standaard_tarieven())
+    opslag.voeg_maand_toe(rij, KOSTEN_POSITIEF)
+    return opslag.laad_maand(maand)
+
+
+def test_mapping_dekt_alle_importkolommen():
+    assert {regel["kolom"] for regel in laad_mapping()["regels"]} == set(IMPORT_KOSTEN)
+
+
+def test_import_in_oorspronkelijke_historie(tmp_path):
+    opslag = _opslag(tmp_path)
+    oud = opslag.laad_maand("apr-24")
+    assert oud["kostenteken"] == KOSTEN_NEGATIEF
+    assert verwerk_import(opslag, {}, {"apr-24": IMPORT_KOSTEN}) == (["apr-24"], [])
+    nieuw = opslag.laad_maand("apr-24")
+    assert all(nieuw[kolom] == bedrag for kolom, bedrag in IMPORT_KOSTEN.items())
+    verschil = sum(bedrag - oud[kolom] for kolom, bedrag in IMPORT_KOSTEN.items())
+    assert nieuw["resultaat"] == pytest.approx(oud["resultaat"] + verschil, abs=0.01)
+
+
+def test_import_van_alle_kosten_in_ingevoerde_maand(tmp_path):
+    opslag = _opslag(tmp_path)
+    oud = _ingevoerde_maand(opslag, "jul-24")
+    # Afschrijving en autokosten uit het kostenmodel zijn negatief, de overige kosten positief
+    assert oud["personeelskosten"] > 0 and oud["afschrijving_kosten"] < 0
+    assert verwerk_import(opslag, {}, {"jul-24": IMPORT_KOSTEN}) == (["jul-24"], [])
+    nieuw = opslag.laad_maand("jul-24")
+    assert all(nieuw[kolom] == -bedrag for kolom, bedrag in IMPORT_KOSTEN.items())
+    verschil = sum(-bedrag - oud[kolom] for kolom, bedrag in IMPORT_KOSTEN.items())
+    assert nieuw["resultaat"] == pytest.approx(oud["resultaat"] - verschil, abs=0.01)
+    assert nieuw["kostenteken"] == KOSTEN_POSITIEF
+
+
+def test_kostenteken_bij_bestaande_database(tmp_path):
+    opslag = _opslag(tmp_path)
+    _ingevoerde_maand(opslag, "jul-24")
+    # Zoals een database van voor het kostenteken: de kolom ontbreekt
+    verbinding = sqlite3.connect(opslag.pad)
+    verbinding.execute("ALTER TABLE maanden DROP COLUMN kostenteken")
+    verbinding.commit()
+    verbinding.close()
+    opnieuw = Opslag(opslag.pad)
+    opnieuw.initialiseer(pd.DataFrame(historische_data), specificaties)
+    assert opnieuw.laad_maand("apr-24")["kostenteken"] == KOSTEN_NEGATIEF
+    assert opnieuw.laad_maand("jul-24")["kostenteken"] == KOSTEN_POSITIEF
+    assert "kostenteken" not in opnieuw.laad_data()
+
+
+def _export(tmp_path, regels):
+    pad = tmp_path / "export.csv"
+    pad.write_text("datum;rekening;omschrijving;bedrag\n" + "".join(f"{regel}\n" for regel in regels), encoding="utf-8")
+    return str(pad)
+
+
+def test_bedragen_volgens_decimaalteken(tmp_path):
+    pad = _export(tmp_path, ["2024-05-31;40;Loonjournaal;-16.315,00", "2024-05-31;45;KPN;-284,03"])
+    _, kosten, _ = importeer_grootboek(pad)
+    assert kosten == {"mei-24": {"personeelskosten": -16315.0, "it_kosten": -284.03}}
+    pad = _export(tmp_path, ["2024-05-31;40;Loonjournaal;-16,315.00", "2024-05-31;45;KPN;-284.03"])
+    _, kosten, _ = importeer_grootboek(pad, {**laad_mapping(), "decimaalteken": "."})
+    assert kosten == {"mei-24": {"personeelskosten": -16315.0, "it_kosten": -284.03}}
+
+
+def test_decimaalpunt_bij_decimaalkomma_geweigerd(tmp_path):
+    # Zou anders als -31129 ingelezen worden
+    with pytest.raises(ValueError, match="decimaalteken"):
+        importeer_grootboek(_export(tmp_path, ["2024-05-31;45;KPN;-311.29"]))
+
+
+def test_onleesbare_export_geeft_valueerror(tmp_path):
+    with pytest.raises(ValueError, match="Kolom ontbreekt"):
+        importeer_grootboek(_export(tmp_path, []), {**laad_mapping(), "kolommen": {"datum": "boekdatum"}})
+    with pytest.raises(ValueError, match="datumformaat"):
+        importeer_grootboek(_export(tmp_path, ["31 mei;40;Loonjournaal;-16.315,00"]))
+    leeg = tmp_path / "leeg.csv"
+    leeg.write_text("", encoding="utf-8")
+    with pytest.raises((ValueError, csv.Error)):
+        importeer_grootboek(str(leeg))
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from berekening import STANDAARD_INVOER, standaard_tarieven
+from kostenmodel import Kostenmodel, standaard_model
+
+# Regressiecontroles voor de evaluator van het kostenmodel. Uitvoeren met: python -m pytest
+
+
+def test_evaluator_marge_en_aantal_nul():
+    evaluator = standaard_model().evaluator()
+    evaluator.zet(standaard_tarieven(), **STANDAARD_INVOER)
+    evaluator.zet(aantal_zonnepanelen=0, marge_laadpalen=0)
+    assert math.isnan(evaluator["kostprijs_zonnepanelen"])
+    assert math.isinf(evaluator["kostprijs_laadpalen"])
+    assert math.isfinite(evaluator["resultaat"])
+
+
+def test_evaluator_gelijk_aan_volledige_berekening():
+    model = standaard_model()
+    evaluator = model.evaluator()
+    evaluator.zet(standaard_tarieven(), **STANDAARD_INVOER)
+    invoer = {**STANDAARD_INVOER, "aantal_laadpalen": 40, "marketing_budget": 8000}
+    evaluator.zet(aantal_laadpalen=40, marketing_budget=8000)
+    volledig = model.bereken(standaard_tarieven(), **invoer)
+    assert all(evaluator[naam] == volledig[naam] for naam in model.regels)
+
+
+def test_evaluator_fout_laat_stand_ongewijzigd():
+    model = Kostenmodel({"regels": [
+        {"naam": "a", "formule": "x * 2"},
+        {"naam": "b", "formule": "a ** y"},
+    ]})
+    evaluator = model.evaluator()
+    evaluator.zet(x=1, y=2)
+    with pytest.raises(ValueError):
+        evaluator.zet(x=[1, 2, 3], y=[1, 2])
+    assert evaluator["x"] == 1 and evaluator["a"] == 2 and evaluator["b"] == 4
+    assert evaluator.zet(x=3) == 2 and evaluator["b"] == 36
+
+
+def test_standaardinvoer_voor_nieuwe_productsoort():
+    model = Kostenmodel({
+        "standaardinvoer": {"aantal_warmtepompen": 0, "tarief_omzet_per_warmtepomp": 5000},
+        "regels": [
+            {"naam": "omzet_laadpalen", "soort": "omzet", "formule": "aantal_laadpalen * 1000"},
+            {"naam": "omzet_warmtepompen", "soort": "omzet", "formule": "aantal_warmtepompen * tarief_omzet_per_warmtepomp"},
+            {"naam": "totale_omzet", "formule": "som('omzet')"},
+        ],
+    })
+    assert model.bereken(aantal_laadpalen=2)["totale_omzet"] == 2000
+    assert model.bereken(aantal_laadpalen=2, aantal_warmtepompen=1)["totale_omzet"] == 7000
+
+
+def test_configurator_met_schuifregelaars_op_nul(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.setenv("CONFIGURATOR_DATABASE", str(tmp_path / "configurator.db"))
+    app = AppTest.from_file("configurator.py", default_timeout=120).run()
+    for slider in app.sidebar.slider:
+        if slider.label in ("Aantal verkochte zonnepanelen", "Marge Laadpalen (%)", "Marge Zonnepanelen (%)"):
+            slider.set_value(0)
+    app.run()
+    assert not app.exception
+    assert any(metric.label == "Totale Omzet" for metric in app.metric)
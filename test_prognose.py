@@ -0,0 +1,21 @@
+import numpy as np
+
+from berekening import STANDAARD_INVOER
+from prognose import STANDAARD_ACTIVA, bereken_prognose
+
+# Regressiecontroles voor de meerjarenprognose. Uitvoeren met: python -m pytest
+
+
+def test_meer_activa_verlagen_het_resultaat():
+    extra = {"omschrijving": "Bedrijfswagen", "aanschafwaarde": 120000.0, "aanschafmaand": "jul-24", "looptijd": 12}
+    zonder = bereken_prognose("jul-24", 12, activa=STANDAARD_ACTIVA, **STANDAARD_INVOER)["kolommen"]
+    met = bereken_prognose("jul-24", 12, activa=STANDAARD_ACTIVA + [extra], **STANDAARD_INVOER)["kolommen"]
+    assert np.all(met["resultaat"] < zonder["resultaat"])
+    assert np.isclose(zonder["cumulatief_resultaat"][-1] - met["cumulatief_resultaat"][-1], 120000.0)
+
+
+def test_zonder_activa_geen_afschrijving():
+    kolommen = bereken_prognose("jul-24", 12, activa=[], **STANDAARD_INVOER)["kolommen"]
+    met = bereken_prognose("jul-24", 12, activa=STANDAARD_ACTIVA, **STANDAARD_INVOER)["kolommen"]
+    assert np.all(kolommen["afschrijving_kosten"] == 0)
+    assert np.all(met["cumulatief_resultaat"] < kolommen["cumulatief_resultaat"])
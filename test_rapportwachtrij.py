@@ -0,0 +1,50 @@
+import gc
+import time
+import tracemalloc
+
+import meting
+from rapportwachtrij import KLAAR, Rapportwachtrij
+
+# Regressiecontroles voor de rapportwachtrij. Uitvoeren met: python -m pytest
+
+
+def _rapport(naam, caches=None, voortgang=None):
+    with meting.meet("rapport: hoofdstuk", "rapport"):
+        voortgang(1, 1, "Hoofdstuk")
+    return naam.encode()
+
+
+def _wacht(taak):
+    for _ in range(500):
+        if not taak.actief:
+            return taak
+        time.sleep(0.01)
+    raise TimeoutError(taak.id)
+
+
+def test_taak_meet_met_eigen_meter():
+    wachtrij = Rapportwachtrij(caches={"rapporten": {}})
+    sessiemeter = meting.Meter()
+    with sessiemeter:
+        taak = wachtrij._dien_in("a", _rapport, lambda: ("a",))
+    # De sessie is klaar voordat het rapport loopt; de metingen horen bij de taak
+    assert _wacht(taak).status == KLAAR and taak.pdf == b"a"
+    assert {m["naam"] for m in taak.meter.metingen} == {"rapporttaak", "rapport: hoofdstuk"}
+    assert not sessiemeter.metingen
+    wachtrij.sluit()
+
+
+def test_taak_zonder_debug_meet_niet():
+    wachtrij = Rapportwachtrij(caches={"rapporten": {}})
+    taak = _wacht(wachtrij._dien_in("b", _rapport, lambda: ("b",)))
+    assert taak.status == KLAAR and taak.meter is None
+    wachtrij.sluit()
+
+
+def test_meter_stopt_tracemalloc_ook_zonder_stop():
+    # Zoals een Streamlit-run die door st.rerun() wordt afgebroken voordat de meter gestopt is
+    meter = meting.Meter(geheugen=True)
+    assert tracemalloc.is_tracing()
+    del meter
+    gc.collect()
+    assert not tracemalloc.is_tracing()
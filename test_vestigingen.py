@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from berekening import STANDAARD_INVOER, bereken_eenheidstarieven, bereken_scenario_kolommen, historische_data, maand_labels, specificaties
+from opslag import Opslag
+from vestigingen import Vestigingsdata, bereken_maand, consolideer, eenheidstarieven_per_vestiging
+
+# Regressiecontroles voor de vestigingen. Uitvoeren met: python -m pytest
+
+
+# Historie met de kolommen van historische_data, uit willekeurige invoer, vanaf jan-20
+def synthetische_historie(aantal, seed=0):
+    rng = np.random.default_rng(seed)
+    kolommen = bereken_scenario_kolommen(
+        rng.integers(10, 60, aantal), rng.integers(1, 6, aantal), rng.uniform(20, 45, aantal), rng.uniform(20, 45, aantal),
+        rng.integers(1, 5, aantal), rng.integers(0, 4, aantal), rng.integers(0, 3, aantal), rng.integers(0, 10, aantal) * 1000,
+    )
+    data = {"maand": maand_labels("jan-20", aantal)}
+    for naam in historische_data:
+        if naam != "maand":
+            data[naam] = kolommen[naam].astype(int) if naam in ("laadpalen", "zonnepanelen") else np.round(kolommen[naam], 2)
+    return pd.DataFrame(data)
+
+
+def test_tarieven_gelijk_aan_bereken_eenheidstarieven():
+    historie = synthetische_historie(36, seed=5)
+    tarieven = eenheidstarieven_per_vestiging(Vestigingsdata.van_tabel(historie.assign(vestiging="A")))
+    verwacht = bereken_eenheidstarieven(historie)
+    assert all(tarieven[naam][0] == verwacht[naam] for naam in verwacht)
+
+
+def test_onbekend_maandlabel_achteraan():
+    historie = synthetische_historie(3, seed=1)
+    tabel = pd.concat([historie.assign(vestiging="A"), historie.iloc[:1].assign(vestiging="B", maand="juli 2024")])
+    assert Vestigingsdata.van_tabel(tabel).maanden[-1] == "juli 2024"
+    assert consolideer(tabel)["maand"].iloc[-1] == "juli 2024"
+
+
+def test_vestiging_zonder_parameters_krijgt_standaardinvoer():
+    historie = synthetische_historie(3, seed=2)
+    data = Vestigingsdata.van_tabel(historie.assign(vestiging="A"))
+    invoer = {**STANDAARD_INVOER, "aantal_laadpalen": 40}
+    maand = bereken_maand(data, {"A": {}}, "jul-30", standaardinvoer=invoer)
+    assert maand["laadpalen"].iloc[0] == 40
+    assert bereken_maand(data, {"A": {}}, "jul-30")["laadpalen"].iloc[0] == STANDAARD_INVOER["aantal_laadpalen"]
+
+
+def test_hernoemen_houdt_historie(tmp_path):
+    opslag = Opslag(str(tmp_path / "configurator.db"))
+    opslag.initialiseer(pd.DataFrame(historische_data), specificaties)
+    opslag.bewaar_vestiging_maanden(synthetische_historie(3, seed=3).assign(vestiging="A").to_dict("records"))
+    opslag.bewaar_vestiging("A", {"aantal_installeurs": 3})
+    opslag.hernoem_vestiging("A", "Noord")
+    assert opslag.vestigingen() == {"Noord": {"aantal_installeurs": 3}}
+    assert set(opslag.laad_vestiging_data()["vestiging"]) == {"Noord"}
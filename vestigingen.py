@@ -0,0 +1,155 @@
+import numpy as np
+
+from berekening import SCENARIO_PARAMETERS, STANDAARD_INVOER, bereken_scenario_kolommen, historische_data, maandnummer, standaard_tarieven
+
+# Meerdere vestigingen: elke vestiging heeft eigen parameters (de invoer van bereken_gegevens) en een
+# eigen historie met dezelfde kolommen als de historie van het bedrijf. De historie staat per kolom in
+# een array van vorm (vestigingen, maanden), zodat tarieven en resultaten voor alle vestigingen in één
+# keer met NumPy berekend worden, zonder Python-lus per vestiging. Pandas wordt alleen geladen door
+# functies die een DataFrame maken of lezen.
+
+HISTORIE_KOLOMMEN = [kolom for kolom in historische_data if kolom != "maand"]
+
+
+# Maandlabels in volgorde: herkenbare labels (bijv. jul-24) op datum, andere labels (vrije tekst uit
+# oudere invoer of een import) daarna in de volgorde waarin ze voorkomen
+def sorteer_maanden(maanden):
+    def sleutel(maand):
+        try:
+            return 0, maandnummer(maand)
+        except ValueError:
+            return 1, 0
+
+    return sorted(dict.fromkeys(maanden), key=sleutel)
+
+
+class Vestigingsdata:
+    # kolommen: per historiekolom een array (vestigingen, maanden); NaN waar een vestiging die maand
+    # geen gegevens heeft
+    def __init__(self, vestigingen, maanden, kolommen):
+        self.vestigingen = list(vestigingen)
+        self.maanden = list(maanden)
+        self.kolommen = kolommen
+        if "omzet" in kolommen:
+            self.aanwezig = ~np.isnan(kolommen["omzet"])
+        else:
+            self.aanwezig = np.zeros((len(self.vestigingen), len(self.maanden)), dtype=bool)
+
+    # Uit een lange tabel met kolommen vestiging, maand en de historiekolommen (zoals
+    # Opslag.laad_vestiging_data). Met vestigingen erbij komen die vestigingen in die volgorde in de
+    # data, ook als ze nog geen historie hebben; rijen van andere vestigingen vallen weg.
+    @classmethod
+    def van_tabel(cls, tabel, vestigingen=None):
+        import pandas as pd
+
+        if vestigingen is None:
+            vestigingen = list(dict.fromkeys(tabel["vestiging"]))
+        maanden = sorteer_maanden(tabel["maand"])
+        rij = pd.Index(vestigingen).get_indexer(tabel["vestiging"])
+        kolom = pd.Index(maanden).get_indexer(tabel["maand"])
+        bekend = rij >= 0
+        rij, kolom = rij[bekend], kolom[bekend]
+
+        kolommen = {}
+        for naam in HISTORIE_KOLOMMEN:
+            if naam in tabel:
+                reeks = np.full((len(vestigingen), len(maanden)), np.nan)
+                reeks[rij, kolom] = tabel[naam].to_numpy(dtype=float)[bekend]
+                kolommen[naam] = reeks
+        return cls(vestigingen, maanden, kolommen)
+
+    # Terug naar een lange tabel, per vestiging op volgorde van de maanden
+    def naar_tabel(self):
+        import pandas as pd
+
+        rij, kolom = np.nonzero(self.aanwezig)
+        tabel = pd.DataFrame({
+            "vestiging": np.array(self.vestigingen, dtype=object)[rij],
+            "maand": np.array(self.maanden, dtype=object)[kolom],
+        })
+        for naam, reeks in self.kolommen.items():
+            tabel[naam] = reeks[rij, kolom]
+            if naam in ("laadpalen", "zonnepanelen"):
+                tabel[naam] = tabel[naam].round().astype(int)
+        return tabel
+
+
+# Historische gemiddelden per eenheid per vestiging, zoals bereken_eenheidstarieven maar als arrays van
+# vorm (vestigingen,). Maanden zonder gegevens (of zonder verkochte eenheden) tellen niet mee; een
+# vestiging zonder bruikbare historie krijgt de tarieven van het bedrijf (of standaard).
+def eenheidstarieven_per_vestiging(data, standaard=None):
+    if standaard is None:
+        standaard = standaard_tarieven()
+    kolommen = data.kolommen
+
+    # np.cumsum telt maand voor maand op, in dezelfde volgorde als de som in bereken_eenheidstarieven, zodat
+    # een vestiging met volledige historie exact dezelfde tarieven krijgt (np.nanmean telt paarsgewijs op)
+    def gemiddelde(reeks):
+        geldig = np.isfinite(reeks)
+        if not reeks.shape[1]:
+            return np.full(reeks.shape[0], np.nan)
+        return np.cumsum(np.where(geldig, reeks, 0.0), axis=1)[:, -1] / geldig.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tarieven = {
+            "omzet_per_laadpaal": gemiddelde(kolommen["omzet_laadpalen"] / kolommen["laadpalen"]),
+            "marge_per_laadpaal": gemiddelde(kolommen["brutomarge_laadpalen"] / kolommen["laadpalen"]),
+            "omzet_per_zonnepaneel": gemiddelde(kolommen["omzet_zonnepanelen"] / kolommen["zonnepanelen"]),
+            "marge_per_zonnepaneel": gemiddelde(kolommen["brutomarge_zonnepanelen"] / kolommen["zonnepanelen"]),
+            "it_kosten": -gemiddelde(kolommen["it_kosten"]),
+            "solar_kosten": -gemiddelde(kolommen["solar_kosten"]),
+            "contributie_kosten": -gemiddelde(kolommen["contributie_kosten"]),
+        }
+    return {naam: np.where(np.isnan(waarden), standaard[naam], waarden) for naam, waarden in tarieven.items()}
+
+
+# Parameters per vestiging (dict naam -> dict) als arrays van vorm (vestigingen,), met de standaardinvoer
+# voor parameters die een vestiging niet heeft
+def parameter_arrays(parameters, standaard=None):
+    if standaard is None:
+        standaard = STANDAARD_INVOER
+    return {
+        naam: np.array([float(vestiging.get(naam, standaard[naam])) for vestiging in parameters.values()])
+        for naam in SCENARIO_PARAMETERS
+    }
+
+
+# Batchversie van bereken_gegevens voor alle vestigingen tegelijk. parameters en tarieven zijn arrays
+# met de vestigingen als eerste as; parameters mogen ook een maandas hebben (vorm (vestigingen, maanden)).
+def bereken_vestigingen(parameters, tarieven):
+    vorm = np.broadcast_shapes(*(np.shape(waarde) for waarde in parameters.values()))
+    extra = (1,) * max(len(vorm) - 1, 0)
+    tarieven = {naam: np.reshape(waarden, np.shape(waarden) + extra) for naam, waarden in tarieven.items()}
+    return bereken_scenario_kolommen(**{naam: parameters[naam] for naam in SCENARIO_PARAMETERS}, tarieven=tarieven)
+
+
+# De nieuwe maand voor elke vestiging met haar eigen parameters en tarieven, als lange tabel met
+# dezelfde kolommen als de historie (geschikt voor Opslag.bewaar_vestiging_maanden). data moet dezelfde
+# vestigingen in dezelfde volgorde hebben als parameters (Vestigingsdata.van_tabel(tabel, list(parameters))).
+# standaard zijn de tarieven en standaardinvoer de parameters (bijv. de schuifregelaars) voor vestigingen
+# zonder eigen historie of parameters.
+def bereken_maand(data, parameters, maand, standaard=None, standaardinvoer=None):
+    import pandas as pd
+
+    if data.vestigingen != list(parameters):
+        raise ValueError("De vestigingen in de historie en in de parameters verschillen")
+    kolommen = bereken_vestigingen(parameter_arrays(parameters, standaardinvoer), eenheidstarieven_per_vestiging(data, standaard))
+    tabel = pd.DataFrame({"vestiging": data.vestigingen, "maand": maand})
+    for naam in HISTORIE_KOLOMMEN:
+        tabel[naam] = kolommen[naam]
+    tabel["laadpalen"] = tabel["laadpalen"].astype(int)
+    tabel["zonnepanelen"] = tabel["zonnepanelen"].astype(int)
+    return tabel
+
+
+# Geconsolideerde historie: per maand de som over alle vestigingen (groupby), met het aantal
+# vestigingen met gegevens in die maand. Heeft dezelfde kolommen als de historie van het bedrijf.
+def consolideer(tabel):
+    kolommen = [kolom for kolom in HISTORIE_KOLOMMEN if kolom in tabel]
+    groepen = tabel.groupby("maand", sort=False)
+    totaal = groepen[kolommen].sum()
+    totaal["vestigingen"] = groepen.size()
+    totaal = totaal.reset_index()
+    positie = {maand: index for index, maand in enumerate(sorteer_maanden(totaal["maand"]))}
+    volgorde = np.argsort([positie[maand] for maand in totaal["maand"]], kind="stable")
+    return totaal.iloc[volgorde].reset_index(drop=True)